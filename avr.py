@@ -1,14 +1,76 @@
 import re
+import json
+import time
+import hexfile
+import threading
+import statistics
 import subprocess
 from pathlib import Path
 from packaging.version import LegacyVersion
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
+# End of the ATxmega128A4U's flash: 128 kB application section followed by
+# the 8 kB boot section.
+FLASH_END = 0x22000
+
+# Seconds an atprogram command may run before it has any timing history.
+DEFAULT_DEADLINE = 120
+# Learned deadlines are this multiple of the typical run time, and never
+# shorter than MIN_DEADLINE seconds.
+DEADLINE_FACTOR = 3
+MIN_DEADLINE = 10
+# Run times kept per command.
+HISTORY = 20
+# Extra attempts for a command that was killed at its deadline.
+RETRIES = 1
+# Command : command run before retrying it. A program step killed part way
+# through leaves the flash half written, so the chip is erased again.
+BEFORE_RETRY = {"prog_image": "chip_erase"}
+TIMINGS_FILE = "atprogram_timings.json"
+
+
+class CommandTimings:
+    """Run times of past atprogram commands, used to decide when a command
+    has hung. The times are kept in a JSON file so every run of the utility
+    learns from the previous ones.
+
+    Instance methods:
+    deadline  --  Returns the seconds a command may take.
+    record    --  Adds a successful command's run time.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.times = {}
+        if self.path and self.path.is_file():
+            try:
+                self.times = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self.times = {}
+
+    def deadline(self, cmd_text: str) -> float:
+        times = self.times.get(cmd_text)
+        if not times:
+            return DEFAULT_DEADLINE
+        return max(MIN_DEADLINE, DEADLINE_FACTOR * statistics.median(times))
+
+    def record(self, cmd_text: str, seconds: float):
+        times = self.times.setdefault(cmd_text, [])
+        times.append(round(seconds, 3))
+        del times[:-HISTORY]
+        if self.path:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text(json.dumps(self.times))
+            except OSError:
+                pass
+
 
 class FlashThreadlink(QObject):
     """Class that flashes the D505 board with hex files."""
     command_succeeded = pyqtSignal(str)
     command_failed = pyqtSignal(str)
+    command_progress = pyqtSignal(str, str)
     flash_finished = pyqtSignal()
     process_error_signal = pyqtSignal()
     file_not_found_signal = pyqtSignal(str)
@@ -18,16 +80,21 @@ class FlashThreadlink(QObject):
     def __init__(self):
         super().__init__()
 
-        # Hide console window
-        self.si = subprocess.STARTUPINFO()
-        self.si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        # Hide console window. Startup info only exists on Windows.
+        self.si = None
+        if hasattr(subprocess, "STARTUPINFO"):
+            self.si = subprocess.STARTUPINFO()
+            self.si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
-    def set_files(self, atprogram_path, hex_files_path):
+    def set_files(self, atprogram_path, hex_files_path, cache_dir=None):
         self.atprogram_path = atprogram_path
         self.hex_files_path = hex_files_path
+        self.cache_dir = cache_dir or hex_files_path
         self.boot_file = Path.joinpath(hex_files_path, "boot-section.hex")
         self.app_file = Path.joinpath(hex_files_path, "app-section.hex")
         self.main_file = None
+        self.image_file = None
+        self.timings = CommandTimings(Path(self.cache_dir, TIMINGS_FILE))
         self.one_wire_file = None
         self.commands = None
 
@@ -52,6 +119,16 @@ class FlashThreadlink(QObject):
             self.file_not_found_signal.emit("main-app")
             return
 
+        # The three files are programmed as one image, so the board is only
+        # attached, written and verified once.
+        try:
+            self.image_file = hexfile.merged_file(
+                [self.boot_file, self.app_file, self.main_file],
+                self.cache_dir, FLASH_END)
+        except (OSError, ValueError, hexfile.HexError) as e:
+            self.generic_error_signal.emit(f"Can't merge the hex files: {e}")
+            return
+
         one_wire_files = list(self.hex_files_path.glob("1-wire-master*.hex"))
         self.one_wire_file, one_wire_ver = FlashThreadlink.get_latest_version(
                                                 one_wire_files)
@@ -65,30 +142,14 @@ class FlashThreadlink(QObject):
                       "-i", "pdi",
                       "-d", "atxmega128a4u",
                       "chiperase"]
-        prog_boot = [self.atprogram_path,
-                     "-t", "avrispmk2",
-                     "-i", "pdi",
-                     "-d", "atxmega128a4u",
-                     "program",
-                     "--flash", "-f", str(self.boot_file),
-                     "--format", "hex",
-                     "--verify"]
-        prog_app = [self.atprogram_path,
-                    "-t", "avrispmk2",
-                    "-i", "pdi",
-                    "-d", "atxmega128a4u",
-                    "program",
-                    "--flash", "-f", str(self.app_file),
-                    "--format", "hex",
-                    "--verify"]
-        prog_main = [self.atprogram_path,
-                     "-t", "avrispmk2",
-                     "-i", "pdi",
-                     "-d", "atxmega128a4u",
-                     "program",
-                     "--flash", "-f", str(self.main_file),
-                     "--format", "hex",
-                     "--verify"]
+        prog_image = [self.atprogram_path,
+                      "-t", "avrispmk2",
+                      "-i", "pdi",
+                      "-d", "atxmega128a4u",
+                      "program",
+                      "--flash", "-f", str(self.image_file),
+                      "--format", "hex",
+                      "--verify"]
         write_fuses = [self.atprogram_path,
                        "-t", "avrispmk2",
                        "-i", "pdi",
@@ -104,9 +165,7 @@ class FlashThreadlink(QObject):
 
         # Command status is for the subsequent step
         self.commands = {"chip_erase": chip_erase,
-                         "prog_boot": prog_boot,
-                         "prog_app": prog_app,
-                         "prog_main": prog_main,
+                         "prog_image": prog_image,
                          "write_fuses": write_fuses,
                          "write_lockbits": write_lockbits}
 
@@ -119,8 +178,17 @@ class FlashThreadlink(QObject):
 
         for cmd_text, cmd in self.commands.items():
             try:
-                status = subprocess.check_output(cmd,
-                                                 startupinfo=self.si).decode()
+                status = None
+                for attempt in range(RETRIES + 1):
+                    if attempt and not self.prepare_retry(cmd_text):
+                        break
+                    status = self.run_command(cmd_text, cmd)
+                    if status is not None:
+                        break
+                if status is None:
+                    # Every attempt hung, or the retry couldn't be prepared.
+                    self.command_failed.emit(cmd_text)
+                    return
 
                 if "Firmware check OK" in status:
                     self.command_succeeded.emit(cmd_text)
@@ -135,13 +203,63 @@ class FlashThreadlink(QObject):
                 self.process_error_signal.emit()
                 return
             except FileNotFoundError:
-                self.file_not_found_signal.emit(cmd[10])
+                self.file_not_found_signal.emit(cmd[0])
                 return
             except Exception as e:
-                self.generic_error_signal.emit(e)
+                self.generic_error_signal.emit(str(e))
                 return
         self.flash_finished.emit()
 
+    def prepare_retry(self, cmd_text: str) -> bool:
+        """Runs the command a killed command needs before it's retried.
+        Returns False if that didn't succeed."""
+        before = BEFORE_RETRY.get(cmd_text)
+        if before is None:
+            return True
+        status = self.run_command(before, self.commands[before])
+        return status is not None and "Firmware check OK" in status
+
+    def run_command(self, cmd_text: str, cmd: list):
+        """Runs an atprogram command, emitting each line of its output as it
+        appears. Returns the whole output, or None if the command was killed
+        for running past its deadline. Raises CalledProcessError if it
+        exits with an error."""
+        deadline = self.timings.deadline(cmd_text)
+        start = time.monotonic()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT,
+                                   startupinfo=self.si, text=True,
+                                   errors="replace")
+        # Reading blocks until the programmer prints, so a timer kills a
+        # command still running at its deadline, a limit on its total run
+        # time that output doesn't extend.
+        killed = threading.Event()
+
+        def kill():
+            killed.set()
+            process.kill()
+
+        killer = threading.Timer(deadline, kill)
+        killer.start()
+        output = []
+        try:
+            for line in process.stdout:
+                output.append(line)
+                if line.strip():
+                    self.command_progress.emit(cmd_text, line.strip())
+            process.wait()
+        finally:
+            killer.cancel()
+            process.stdout.close()
+
+        if killed.is_set():
+            return None
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd,
+                                                "".join(output))
+        self.timings.record(cmd_text, time.monotonic() - start)
+        return "".join(output)
+
     @staticmethod
     def get_latest_version(filenames: list) -> (str, str):
         current_version = None
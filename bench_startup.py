@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Runs in a fresh interpreter for every sample, so each one pays the full
+# import cost the way a tester launching the utility does.
+CHILD = """
+import time
+t0 = time.perf_counter()
+import sys
+import json
+import views
+from PyQt5.QtWidgets import QApplication, QMessageBox
+t_import = time.perf_counter()
+
+app = QApplication([])
+app.setStyle("fusion")
+window = views.ThreadlinkUtility()
+window.show()
+t_shown = time.perf_counter()
+
+while window.sm is None:
+    app.processEvents()
+t_ready = time.perf_counter()
+
+QMessageBox.question = lambda *args: QMessageBox.Yes
+window.close()
+print(json.dumps({"import": t_import - t0, "shown": t_shown - t0,
+                  "ready": t_ready - t0}))
+"""
+
+STAGES = ("import", "shown", "ready", "total")
+
+
+def sample(env) -> dict:
+    """Times one startup. Total is the wall time of the whole process,
+    including the interpreter starting and exiting."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True,
+                            text=True).stdout
+    times = json.loads(output.strip().splitlines()[-1])
+    times["total"] = time.perf_counter() - start
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the Threadlink Test Utility startup time.")
+    parser.add_argument("-n", "--runs", type=int, default=10,
+                        help="Number of startups to time.")
+    parser.add_argument("-o", "--output", help="Also write results here.")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    if sys.platform.startswith("linux") and "DISPLAY" not in env:
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    samples = [sample(env) for _ in range(args.runs)]
+    lines = [f"Startup over {args.runs} runs (median / min, ms):"]
+    for stage in STAGES:
+        values = [s[stage] * 1000 for s in samples]
+        lines.append(f"  {stage:<7}{statistics.median(values):8.1f}"
+                     f"{min(values):8.1f}")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
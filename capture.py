@@ -0,0 +1,269 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime as dt
+
+MAGIC = b"TLCP"
+FORMAT_VERSION = 1
+# Header format: magic | format version | write offset
+HEADER = struct.Struct("<4sIQ")
+# Record format: timestamp | direction | payload length, followed by payload
+RECORD = struct.Struct("<dcH")
+
+TX = b"T"
+RX = b"R"
+MARK = b"M"
+
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+DEFAULT_SEGMENTS = 8
+
+
+class CaptureError(Exception):
+    pass
+
+
+class SerialCapture:
+    """Always-on raw capture of the serial traffic on one port.
+
+    Every transmitted and received byte is appended, with a timestamp, to a
+    fixed-size memory-mapped segment file. When the segment is full it is
+    rotated to a numbered backup and a fresh segment is started, so the
+    capture directory never holds more than `segments` files per port.
+
+    Instance variables:
+    path          --  Path of the active segment file.
+    segment_size  --  Size in bytes of each segment file.
+    segments      --  Number of segment files kept per port.
+
+    Instance methods:
+    tx      --  Record transmitted bytes.
+    rx      --  Record received bytes.
+    mark    --  Record the start of a board session.
+    close   --  Unmap and close the active segment.
+    """
+
+    def __init__(self, directory, port, segment_size=DEFAULT_SEGMENT_SIZE,
+                 segments=DEFAULT_SEGMENTS):
+        if segment_size <= HEADER.size + RECORD.size:
+            raise CaptureError("Segment size too small.")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = segment_path(self.directory, port, 0)
+        self.port = port
+        self.segment_size = segment_size
+        self.segments = segments
+        self.lock = threading.Lock()
+        self.file = None
+        self.map = None
+        self.offset = HEADER.size
+        self._open_segment()
+
+    def tx(self, data: bytes):
+        """Record bytes written to the port."""
+        if data:
+            self._append(TX, data)
+
+    def rx(self, data: bytes):
+        """Record bytes read from the port."""
+        if data:
+            self._append(RX, data)
+
+    def mark(self, serial_num: str):
+        """Record a session marker so a board's traffic can be sliced out
+        later by its serial number."""
+        self._append(MARK, serial_num.encode())
+
+    def close(self):
+        with self.lock:
+            self._close_segment()
+
+    def _open_segment(self):
+        """Maps the active segment, continuing after the last record if the
+        file already holds a valid capture."""
+        exists = (self.path.is_file() and
+                  self.path.stat().st_size == self.segment_size)
+        self.file = open(self.path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(self.segment_size)
+        self.map = mmap.mmap(self.file.fileno(), self.segment_size)
+
+        magic, version, offset = HEADER.unpack_from(self.map, 0)
+        if (magic == MAGIC and version == FORMAT_VERSION and
+                HEADER.size <= offset <= self.segment_size):
+            self.offset = offset
+        else:
+            self.offset = HEADER.size
+            HEADER.pack_into(self.map, 0, MAGIC, FORMAT_VERSION, self.offset)
+
+    def _close_segment(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _rotate(self):
+        """Shifts the segment files down by one, dropping the oldest, and
+        starts a new active segment."""
+        self._close_segment()
+        for i in range(self.segments - 1, 0, -1):
+            older = segment_path(self.directory, self.port, i - 1)
+            if older.is_file():
+                os.replace(older, segment_path(self.directory, self.port, i))
+        self._open_segment()
+
+    def _append(self, kind, data):
+        timestamp = dt.now().timestamp()
+        capacity = self.segment_size - HEADER.size - RECORD.size
+        chunk_size = min(capacity, 0xFFFF)
+
+        with self.lock:
+            if self.map is None:
+                return
+            for i in range(0, len(data), chunk_size):
+                chunk = data[i:i + chunk_size]
+                end = self.offset + RECORD.size + len(chunk)
+                if end > self.segment_size:
+                    self._rotate()
+                    end = self.offset + RECORD.size + len(chunk)
+                RECORD.pack_into(self.map, self.offset, timestamp, kind,
+                                 len(chunk))
+                self.map[self.offset + RECORD.size:end] = chunk
+                self.offset = end
+                HEADER.pack_into(self.map, 0, MAGIC, FORMAT_VERSION,
+                                 self.offset)
+
+
+def segment_path(directory, port, index) -> Path:
+    """Returns the file path of a port's capture segment. Index 0 is the
+    active segment, higher indexes are older."""
+    name = Path(port).name or "port"
+    suffix = ".cap" if index == 0 else f".cap.{index}"
+    return Path(directory).joinpath(name + suffix)
+
+
+def read_segment(path):
+    """Yields (timestamp, direction, payload) tuples from a segment file."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        return
+    magic, version, offset = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise CaptureError(f"{path} is not a capture file.")
+
+    pos = HEADER.size
+    end = min(offset, len(data))
+    while pos + RECORD.size <= end:
+        timestamp, kind, length = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        yield (timestamp, kind, data[pos:pos + length])
+        pos += length
+
+
+def read_records(directory, port):
+    """Yields every record captured for a port, oldest first."""
+    index = 0
+    paths = []
+    while segment_path(directory, port, index).is_file():
+        paths.append(segment_path(directory, port, index))
+        index += 1
+
+    for path in reversed(paths):
+        yield from read_segment(path)
+
+
+def write_session(records, path) -> int:
+    """Writes records to a compact capture file holding just them, e.g. a
+    board's session for replay. Returns the number of records written."""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        for timestamp, kind, payload in records:
+            f.write(RECORD.pack(timestamp, kind, len(payload)))
+            f.write(payload)
+            offset += RECORD.size + len(payload)
+            count += 1
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, offset))
+    return count
+
+
+def slice_session(records, serial_num=None, start=None, end=None):
+    """Filters records down to a board's session and a time range.
+
+    A session starts at the marker for the serial number and runs until the
+    next marker. Start and end are POSIX timestamps; either may be None.
+    """
+    in_session = serial_num is None
+    for timestamp, kind, payload in records:
+        if kind == MARK:
+            in_session = (serial_num is None or
+                          payload.decode(errors="replace") == serial_num)
+        if not in_session:
+            continue
+        if start is not None and timestamp < start:
+            continue
+        if end is not None and timestamp > end:
+            continue
+        yield (timestamp, kind, payload)
+
+
+def format_record(record) -> str:
+    """Formats a record as a single human-readable line."""
+    timestamp, kind, payload = record
+    ts = dt.fromtimestamp(timestamp).isoformat(timespec="milliseconds")
+    names = {TX: "TX", RX: "RX", MARK: "--"}
+    return f"{ts} {names.get(kind, '??')} {payload!r}"
+
+
+def parse_time(value):
+    if value is None:
+        return None
+    return dt.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export a board session from the raw serial capture.")
+    parser.add_argument("directory", help="Capture directory.")
+    parser.add_argument("port", help="Serial port name, e.g. COM3.")
+    parser.add_argument("--sn", help="Board serial number.")
+    parser.add_argument("--start", help="ISO start time.")
+    parser.add_argument("--end", help="ISO end time.")
+    parser.add_argument("--raw", help="Write received bytes to this file.")
+    parser.add_argument("--out", help="Write the records to a session file "
+                        "for replay.")
+    args = parser.parse_args(argv)
+
+    records = slice_session(read_records(args.directory, args.port),
+                            args.sn, parse_time(args.start),
+                            parse_time(args.end))
+
+    if args.out:
+        count = write_session(records, args.out)
+        print(f"Wrote {count} records to {args.out}.")
+        return
+
+    if args.raw:
+        with open(args.raw, "wb") as f:
+            for _, kind, payload in records:
+                if kind == RX:
+                    f.write(payload)
+        return
+
+    for record in records:
+        print(format_record(record))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from datetime import datetime as dt, timedelta
+from PyQt5.QtWidgets import QGroupBox, QLabel, QVBoxLayout, QApplication
+from PyQt5.QtGui import QFont
+
+SHIFT_HOURS = 8
+PARETO_SIZE = 5
+
+
+def summarize(report, phase_times: dict, skipped=()) -> dict:
+    """Summarises a finalized report as a shift index entry. Skipped are the
+    phases the fail-fast policy didn't run."""
+    return {
+        "time": time.time(),
+        "sn": report.data.value("pcba_sn"),
+        "tester_id": report.data.value("tester_id"),
+        "result": report.test_result,
+        "failed": report.data.failed_keys(),
+        "phases": dict(phase_times),
+        "skipped": list(skipped),
+    }
+
+
+class ShiftStats:
+    """Running aggregates for a shift, updated one board at a time.
+
+    Instance methods:
+    add                --  Adds a board's index entry to the aggregates.
+    yield_percent      --  Percentage of boards that passed.
+    boards_per_hour    --  Throughput between the first and last board.
+    pareto             --  Most frequent failures by report key.
+    phase_means        --  Mean time in seconds spent in each phase.
+    boards_per_hour_saved  --  Throughput gained by skipping phases.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.passed = 0
+        self.failures = Counter()
+        self.phase_totals = Counter()
+        self.phase_counts = Counter()
+        self.skipped = Counter()
+        self.first_time = None
+        self.last_time = None
+
+    def add(self, entry: dict):
+        self.total += 1
+        if entry["result"] == "PASS":
+            self.passed += 1
+        self.failures.update(entry["failed"])
+        for phase, seconds in entry["phases"].items():
+            self.phase_totals[phase] += seconds
+            self.phase_counts[phase] += 1
+        self.skipped.update(entry.get("skipped", ()))
+
+        if self.first_time is None or entry["time"] < self.first_time:
+            self.first_time = entry["time"]
+        if self.last_time is None or entry["time"] > self.last_time:
+            self.last_time = entry["time"]
+
+    def yield_percent(self) -> float:
+        return 100.0 * self.passed / self.total if self.total else 0.0
+
+    def boards_per_hour(self) -> float:
+        if self.total < 2:
+            return 0.0
+        hours = (self.last_time - self.first_time) / 3600
+        # The first board's own test time isn't in the span.
+        return (self.total - 1) / hours if hours else 0.0
+
+    def boards_per_hour_saved(self) -> float:
+        """Boards per hour gained by the fail-fast policy: the shift's rate
+        against the rate it would have had if the skipped phases had run
+        for their mean time."""
+        rate = self.boards_per_hour()
+        means = self.phase_means()
+        saved = sum(count * means.get(phase, 0)
+                    for phase, count in self.skipped.items())
+        if not rate or not saved:
+            return 0.0
+        hours = (self.total - 1) / rate
+        return rate - (self.total - 1) / (hours + saved / 3600)
+
+    def pareto(self, size=PARETO_SIZE) -> list:
+        return self.failures.most_common(size)
+
+    def phase_means(self) -> dict:
+        return {phase: self.phase_totals[phase] / count
+                for phase, count in self.phase_counts.items()}
+
+
+class ShiftIndex:
+    """Append-only index of finalized boards, one JSON line per board and
+    one file per day, so the last shift loads without reading any
+    reports."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path(self, day) -> Path:
+        return self.directory.joinpath(f"shift-{day:%Y-%m-%d}.jsonl")
+
+    def append(self, entry: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        day = dt.fromtimestamp(entry["time"])
+        with open(self.path(day), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def load(self, since: float) -> list:
+        """Returns the entries from the given time onwards."""
+        entries = []
+        day = dt.fromtimestamp(since).date()
+        while day <= dt.now().date():
+            path = self.path(day)
+            day += timedelta(days=1)
+            if not path.is_file():
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry["time"] >= since:
+                        entries.append(entry)
+        return entries
+
+    def load_shift(self, stats: ShiftStats, hours=SHIFT_HOURS):
+        """Adds the entries of the last shift to the aggregates."""
+        for entry in self.load(time.time() - hours * 3600):
+            stats.add(entry)
+
+
+class DashboardWidget(QGroupBox):
+    """Shows the shift aggregates."""
+
+    def __init__(self):
+        super().__init__("Shift Dashboard")
+        self.system_font = QApplication.font().family()
+        self.label_font = QFont(self.system_font, 12)
+
+        self.yield_lbl = QLabel()
+        self.rate_lbl = QLabel()
+        self.pareto_lbl = QLabel()
+        self.phases_lbl = QLabel()
+
+        layout = QVBoxLayout()
+        for lbl in (self.yield_lbl, self.rate_lbl, self.pareto_lbl,
+                    self.phases_lbl):
+            lbl.setFont(self.label_font)
+            layout.addWidget(lbl)
+            layout.addSpacing(20)
+        layout.addStretch()
+        self.setLayout(layout)
+
+    def update_stats(self, stats: ShiftStats):
+        self.yield_lbl.setText(
+            f"Yield: {stats.yield_percent():.1f}% "
+            f"({stats.passed}/{stats.total})")
+        rate = f"Boards/hour: {stats.boards_per_hour():.1f}"
+        saved = stats.boards_per_hour_saved()
+        if saved:
+            rate += f" (+{saved:.1f} from fail-fast)"
+        self.rate_lbl.setText(rate)
+
+        pareto = "\n".join(f"  {key}: {count}"
+                           for key, count in stats.pareto())
+        self.pareto_lbl.setText(f"Failures:\n{pareto or '  None'}")
+
+        phases = "\n".join(f"  {phase}: {seconds:.0f} s"
+                           for phase, seconds in stats.phase_means().items())
+        self.phases_lbl.setText(f"Mean phase time:\n{phases or '  None'}")
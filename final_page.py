@@ -1,4 +1,5 @@
 import os.path
+from pathlib import Path
 from PyQt5.QtWidgets import (
     QWizardPage, QWizard, QLabel, QVBoxLayout, QCheckBox, QGridLayout,
     QLineEdit, QProgressBar, QPushButton, QMessageBox, QHBoxLayout,
@@ -10,6 +11,10 @@ from PyQt5.QtCore import Qt, pyqtSignal, QThread
 
 class FinalPage(QWizardPage):
     """Final QWizard page, displays test result."""
+
+    # The serial port is idle on this page, so the fixture can be polled.
+    watch_fixture = True
+
     def __init__(self, threadlink, test_utility, report):
         self.system_font = QApplication.font().family()
         self.label_font = QFont(self.system_font, 12)
@@ -19,31 +24,12 @@ class FinalPage(QWizardPage):
         self.threadlink = threadlink
         self.tu = test_utility
         self.report = report
+        self.report_name = None
 
-    def initializePage(self):
-        self.report.file_not_found_signal.connect(self.file_not_found)
-        self.report.generic_error_signal.connect(self.generic_error)
-
-        # Disable abort button
-        self.threadlink.button(QWizard.CustomButton1).setEnabled(False)
-
-        # Check test result
-        report_dir_path = self.tu.settings.value("report_dir_path")
-        self.report.set_file_location(report_dir_path)
-        report_file_path = self.report.generate_report()
-
-        test_result = self.report.test_result
-
-        if test_result == "PASS":
-            self.test_status = "Successful"
-        else:
-            self.test_status = "Failed"
-
-        self.test_status_lbl = QLabel(f"Test {self.test_status}!")
+        self.test_status_lbl = QLabel()
         self.test_status_lbl.setFont(self.label_font)
 
-        self.report_location_lbl = QLabel(
-            f"Report available at: {report_file_path}.")
+        self.report_location_lbl = QLabel()
         self.report_location_lbl.setWordWrap(True)
         self.report_location_lbl.setFont(self.label_font)
 
@@ -62,13 +48,42 @@ class FinalPage(QWizardPage):
         self.setLayout(self.layout)
         self.setTitle("Test Completed")
 
-    def file_not_found(self):
-        QMessageBox.warning(self, "Warning", "Report directory does not "
-                            "exist!\n Please specify directory.")
-        report_dir = QFileDialog.getExistingDirectory(self,
-            "Select report save location.")
-        self.tu.settings.setValue("report_dir_path", report_dir)
-        self.initializePage()
+    def initializePage(self):
+        # Disable abort button
+        self.threadlink.button(QWizard.CustomButton1).setEnabled(False)
+
+        # Check test result and queue the report. It is written to the
+        # spool straight away and replicated to the report directory in
+        # the background.
+        report_dir_path = self.tu.settings.value("report_dir_path")
+        self.report.set_file_location(report_dir_path)
+        name, rows = self.report.finalize()
+        self.report_name = name
+        self.tu.submit_report(name, rows)
+        report_file_path = Path(report_dir_path).joinpath(name)
+        self.threadlink.close_phase()
+        self.tu.report_finalized(self.report, report_file_path,
+                                 dict(self.threadlink.phase_times),
+                                 self.threadlink.stopped_phases)
+
+        test_result = self.report.test_result
+
+        if test_result == "PASS":
+            self.test_status = "Successful"
+        else:
+            self.test_status = "Failed"
+
+        self.test_status_lbl.setText(f"Test {self.test_status}!")
+        if self.threadlink.stopped_phases:
+            skipped = ", ".join(self.threadlink.stopped_phases)
+            self.test_status_lbl.setText(f"Test {self.test_status}! "
+                                         f"Stopped early, skipped: {skipped}.")
+        self.report_location_lbl.setText(
+            f"Report available at: {report_file_path}.")
 
-    def generic_error(self, error):
-        QMessageBox.warning(self, "Warning", error)
+    def report_error(self, name: str, error: str):
+        """Shows that the report couldn't be written."""
+        if name == self.report_name:
+            self.report_location_lbl.setText(f"Report not written: {error}")
+        QMessageBox.warning(self, "Warning", f"Report {name} not written: "
+                            f"{error}")
@@ -0,0 +1,212 @@
+import os
+import hashlib
+from pathlib import Path
+
+# Data bytes per record written by the toolchain, and the longer records
+# the upload can be repacked into. The upload pays a fixed delay per record,
+# but the 1-wire master's bootloader limit isn't confirmed, so files are
+# only repacked when a station is set to a longer size.
+TOOLCHAIN_RECORD_BYTES = 16
+RECORD_SIZES = [16, 32]
+MAX_RECORD_BYTES = RECORD_SIZES[-1]
+
+# Record types
+DATA = 0
+EOF = 1
+EXT_SEGMENT = 2
+START_SEGMENT = 3
+EXT_LINEAR = 4
+START_LINEAR = 5
+
+EOF_RECORD = ":00000001FF"
+
+
+class HexError(Exception):
+    pass
+
+
+def parse_record(line: str) -> (int, int, bytes):
+    """Returns the type, address and data of an Intel hex record. Raises
+    HexError if the record is malformed or its checksum is wrong."""
+    line = line.strip()
+    if not line.startswith(":"):
+        raise HexError(f"Not a hex record: {line!r}")
+    try:
+        raw = bytes.fromhex(line[1:])
+    except ValueError:
+        raise HexError(f"Not a hex record: {line!r}")
+
+    if len(raw) < 5 or len(raw) != raw[0] + 5:
+        raise HexError(f"Bad record length: {line!r}")
+    if sum(raw) & 0xFF:
+        raise HexError(f"Bad checksum: {line!r}")
+    return raw[3], int.from_bytes(raw[1:3], "big"), raw[4:-1]
+
+
+def make_record(record_type: int, address: int, data: bytes) -> str:
+    """Returns an Intel hex record with its checksum."""
+    raw = bytes([len(data)]) + address.to_bytes(2, "big") + \
+        bytes([record_type]) + data
+    checksum = -sum(raw) & 0xFF
+    return ":" + (raw + bytes([checksum])).hex().upper()
+
+
+class HexImage:
+    """The memory contents described by a hex file.
+
+    Instance variables:
+    memory   --  Absolute address : byte.
+    start    --  The start address records, kept as they are.
+    linear   --  True if the file used extended linear addresses rather than
+                 extended segment addresses.
+
+    Instance methods:
+    load     --  Adds the records of a hex file.
+    ranges   --  Returns the contiguous address ranges.
+    records  --  Returns the image as hex records.
+    """
+
+    def __init__(self):
+        self.memory = {}
+        self.start = []
+        self.linear = True
+
+    def load(self, lines, name="image"):
+        """Adds the data records of a hex file. Raises HexError if they
+        overwrite different data already in the image."""
+        base = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            record_type, address, data = parse_record(line)
+
+            if record_type == DATA:
+                for i, byte in enumerate(data):
+                    location = base + address + i
+                    if self.memory.get(location, byte) != byte:
+                        raise HexError(f"{name} overwrites address "
+                                       f"0x{location:X}.")
+                    self.memory[location] = byte
+            elif record_type == EOF:
+                break
+            elif record_type == EXT_SEGMENT:
+                base = int.from_bytes(data, "big") << 4
+                self.linear = False
+            elif record_type == EXT_LINEAR:
+                base = int.from_bytes(data, "big") << 16
+            elif record_type in (START_SEGMENT, START_LINEAR):
+                record = make_record(record_type, address, data)
+                if record not in self.start:
+                    self.start.append(record)
+            else:
+                raise HexError(f"Unknown record type {record_type}.")
+        return self
+
+    def ranges(self) -> list:
+        """Returns (start, end) for each contiguous run of data, end
+        exclusive."""
+        ranges = []
+        for address in sorted(self.memory):
+            if ranges and ranges[-1][1] == address:
+                ranges[-1][1] = address + 1
+            else:
+                ranges.append([address, address + 1])
+        return [tuple(r) for r in ranges]
+
+    def records(self, size=MAX_RECORD_BYTES) -> list:
+        """Returns the image as records of up to size data bytes. Records
+        are aligned to size and never cross a 64 kB boundary, and an
+        extended address record is only written when the upper address
+        changes."""
+        lines = []
+        upper = 0
+        for start, end in self.ranges():
+            address = start
+            while address < end:
+                stop = min(end, (address // size + 1) * size,
+                           (address | 0xFFFF) + 1)
+                if address >> 16 != upper:
+                    upper = address >> 16
+                    if self.linear:
+                        lines.append(make_record(
+                            EXT_LINEAR, 0, upper.to_bytes(2, "big")))
+                    else:
+                        lines.append(make_record(
+                            EXT_SEGMENT, 0, (upper << 12).to_bytes(2, "big")))
+                data = bytes(self.memory[a] for a in range(address, stop))
+                lines.append(make_record(DATA, address & 0xFFFF, data))
+                address = stop
+        return lines + self.start + [EOF_RECORD]
+
+
+def repack(lines, size=MAX_RECORD_BYTES) -> list:
+    """Merges the data of a hex file into as few records as possible,
+    dropping redundant records."""
+    return HexImage().load(lines).records(size)
+
+
+def repacked_file(path, cache_dir, size=MAX_RECORD_BYTES) -> Path:
+    """Returns the path of the repacked copy of a hex file, creating it in
+    the cache directory the first time this firmware version is used. The
+    file names carry the version; the content hash keeps a rebuilt file
+    with the same name from using a stale copy."""
+    path = Path(path)
+    source = path.read_bytes()
+    digest = hashlib.sha1(source).hexdigest()[:12]
+    cache_dir = Path(cache_dir)
+    cached = cache_dir.joinpath(f"{path.stem}-{digest}-{size}.hex")
+    if cached.is_file():
+        return cached
+
+    write_records(cached, repack(source.decode("ascii").splitlines(), size))
+    return cached
+
+
+def merged_file(paths, cache_dir, end=None) -> Path:
+    """Merges hex files into a single image and returns its path in the
+    cache directory, reusing the image while the files are unchanged.
+    Raises HexError if two files share an address or any data lies at or
+    beyond end.
+
+    The files' start address records are dropped: a file may only have
+    one, the sections each carry their own, and flash programming doesn't
+    use them."""
+    paths = [Path(p) for p in paths]
+    sources = [p.read_bytes() for p in paths]
+    digest = hashlib.sha1()
+    for path, source in zip(paths, sources):
+        digest.update(path.name.encode() + b"\0" + source + b"\0")
+    cache_dir = Path(cache_dir)
+    cached = cache_dir.joinpath(f"flash-{digest.hexdigest()[:12]}.hex")
+    if cached.is_file():
+        return cached
+
+    image = HexImage()
+    owners = []
+    for path, source in zip(paths, sources):
+        part = HexImage().load(source.decode("ascii").splitlines(), path.name)
+        ranges = part.ranges()
+        for start, stop in ranges:
+            if end is not None and stop > end:
+                raise HexError(f"{path.name} has data beyond 0x{end:X}.")
+            for name, other in owners:
+                for other_start, other_stop in other:
+                    if start < other_stop and other_start < stop:
+                        raise HexError(
+                            f"{path.name} overlaps {name} at "
+                            f"0x{max(start, other_start):X}.")
+        owners.append((path.name, ranges))
+
+        image.memory.update(part.memory)
+        image.linear = image.linear and part.linear
+
+    write_records(cached, image.records())
+    return cached
+
+
+def write_records(path, records):
+    """Writes hex records to a file, replacing it only once complete."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix(".tmp")
+    temp.write_bytes("".join(r + "\r\n" for r in records).encode("ascii"))
+    os.replace(temp, path)
@@ -0,0 +1,256 @@
+import random
+import serial
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+import scanner
+
+
+class InstrumentError(Exception):
+    pass
+
+
+class SerialTransport:
+    """Line based SCPI transport over a serial port."""
+
+    def __init__(self, port: str, baudrate: int = 9600, timeout: float = 5.0):
+        try:
+            self.ser = serial.Serial(port, baudrate, timeout=timeout)
+        except serial.serialutil.SerialException:
+            raise InstrumentError(f"Can't open instrument port {port}!")
+
+    def write(self, command: str):
+        self.ser.write(command.encode() + b"\n")
+
+    def query(self, command: str) -> str:
+        self.write(command)
+        response = self.ser.read_until(b"\n")
+        if not response.endswith(b"\n"):
+            raise InstrumentError(f"No response to {command}!")
+        return response.decode(errors="replace").strip()
+
+    def close(self):
+        self.ser.close()
+
+
+class ScpiDmm:
+    """Driver for a SCPI digital multimeter. With a scanner card fitted,
+    several channels of the same function are read in a single scan.
+
+    Instance methods:
+    measure       --  Take one reading.
+    measure_scan  --  Take one reading per channel in a single scan.
+    """
+
+    FUNCTIONS = {"voltage": "VOLT:DC", "current": "CURR:DC"}
+
+    def __init__(self, transport, scanner_card: bool = False):
+        self.transport = transport
+        self.scanner_card = scanner_card
+
+    def measure(self, function: str, channel=None) -> float:
+        command = f"MEAS:{self.FUNCTIONS[function]}?"
+        if channel is not None:
+            command += f" (@{channel})"
+        return parse_value(self.transport.query(command))
+
+    def measure_scan(self, function: str, channels: list) -> list:
+        if not self.scanner_card:
+            return [self.measure(function, c) for c in channels]
+
+        channel_list = ",".join(str(c) for c in channels)
+        self.transport.write(
+            f"CONF:{self.FUNCTIONS[function]} (@{channel_list})")
+        self.transport.write(f"ROUT:SCAN (@{channel_list})")
+        values = [parse_value(v)
+                  for v in self.transport.query("READ?").split(",")]
+        if len(values) != len(channels):
+            raise InstrumentError("Scan returned the wrong number of readings!")
+        return values
+
+    def close(self):
+        self.transport.close()
+
+
+class ScpiPowerSupply:
+    """Driver for a SCPI bench power supply, used for its output voltage
+    and current readback."""
+
+    FUNCTIONS = {"voltage": "VOLT", "current": "CURR"}
+    scanner_card = False
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def measure(self, function: str, channel=None) -> float:
+        command = f"MEAS:{self.FUNCTIONS[function]}?"
+        if channel is not None:
+            command += f" CH{channel}"
+        return parse_value(self.transport.query(command))
+
+    def measure_scan(self, function: str, channels: list) -> list:
+        return [self.measure(function, c) for c in channels]
+
+    def close(self):
+        self.transport.close()
+
+
+class SimulatedInstrument:
+    """Instrument stand-in returning a nominal reading, plus noise, for each
+    function and channel."""
+
+    def __init__(self, readings: dict, noise: float = 0.002,
+                 scanner_card: bool = True):
+        self.readings = readings
+        self.noise = noise
+        self.scanner_card = scanner_card
+
+    def measure(self, function: str, channel=None) -> float:
+        try:
+            value = self.readings[(function, channel)]
+        except KeyError:
+            raise InstrumentError(f"No simulated {function} on {channel}!")
+        return value * (1 + random.uniform(-self.noise, self.noise))
+
+    def measure_scan(self, function: str, channels: list) -> list:
+        return [self.measure(function, c) for c in channels]
+
+    def close(self):
+        pass
+
+
+def parse_value(response: str) -> float:
+    try:
+        return scanner.parse_reading(response)[0]
+    except ValueError:
+        raise InstrumentError(f"Bad instrument response: {response!r}")
+
+
+# Limit key : [instrument, function, channel, scale to the report unit]
+MEASUREMENT_PLAN = {
+    "input_i": ["psu", "current", None, 1000.0],
+    "5v_supply": ["dmm", "voltage", 101, 1.0],
+    "2p5v": ["dmm", "voltage", 102, 1.0],
+    "1p8v": ["dmm", "voltage", 103, 1.0],
+}
+
+SIMULATED_READINGS = {
+    "psu": {("current", None): 0.004},
+    "dmm": {("voltage", 101): 0.877,
+            ("voltage", 102): 2.5,
+            ("voltage", 103): 1.8},
+}
+
+
+class Bench:
+    """A set of instruments and a plan of which instrument takes each
+    measurement. Each instrument works through its share of the plan on its
+    own thread, so separate instruments measure in parallel.
+
+    Instance methods:
+    measure_all  --  Take every measurement in the plan.
+    """
+
+    def __init__(self, instruments: dict, plan: dict = MEASUREMENT_PLAN):
+        self.instruments = instruments
+        self.plan = plan
+        self.executor = ThreadPoolExecutor(max_workers=len(instruments) or 1)
+
+    def measure_all(self) -> dict:
+        """Returns a dictionary of limit key to measured value."""
+        jobs = {}
+        for key, (name, function, channel, scale) in self.plan.items():
+            if name not in self.instruments:
+                raise InstrumentError(f"Instrument {name} not configured!")
+            jobs.setdefault(name, []).append((key, function, channel, scale))
+
+        futures = [self.executor.submit(self.measure_instrument, name, job)
+                   for name, job in jobs.items()]
+
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+
+    def measure_instrument(self, name: str, job: list) -> dict:
+        """Takes one instrument's measurements, scanning channels that share
+        a function in one pass."""
+        instrument = self.instruments[name]
+        by_function = {}
+        for key, function, channel, scale in job:
+            by_function.setdefault(function, []).append((key, channel, scale))
+
+        results = {}
+        for function, entries in by_function.items():
+            channels = [channel for _, channel, _ in entries]
+            if len(channels) > 1:
+                values = instrument.measure_scan(function, channels)
+            else:
+                values = [instrument.measure(function, channels[0])]
+            for (key, _, scale), value in zip(entries, values):
+                results[key] = value * scale
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for instrument in self.instruments.values():
+            instrument.close()
+
+
+def create_bench(backend: str, dmm_port: str = "", psu_port: str = ""):
+    """Creates the bench for a backend name: "Simulated" or "SCPI". Returns
+    None for manual entry."""
+    if backend == "Simulated":
+        return Bench({name: SimulatedInstrument(readings)
+                      for name, readings in SIMULATED_READINGS.items()})
+
+    if backend == "SCPI":
+        dmm = ScpiDmm(SerialTransport(dmm_port), scanner_card=True)
+        try:
+            psu = ScpiPowerSupply(SerialTransport(psu_port))
+        except InstrumentError:
+            dmm.close()
+            raise
+        return Bench({"dmm": dmm, "psu": psu})
+
+    return None
+
+
+class BenchWorker(QObject):
+    """Runs bench measurements off the GUI thread."""
+    measurements_ready = pyqtSignal(dict)
+    bench_error_signal = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.bench = None
+
+    @pyqtSlot(str, str, str)
+    def set_backend(self, backend, dmm_port, psu_port):
+        """Replaces the bench with the configured backend."""
+        if self.bench:
+            self.bench.close()
+            self.bench = None
+        try:
+            self.bench = create_bench(backend, dmm_port, psu_port)
+        except Exception as e:
+            self.bench_error_signal.emit(str(e))
+
+    @pyqtSlot()
+    def measure(self):
+        if not self.bench:
+            self.bench_error_signal.emit("No instruments configured!")
+            return
+        try:
+            values = self.bench.measure_all()
+        except Exception as e:
+            # Anything unhandled in a slot would abort the application.
+            self.bench_error_signal.emit(str(e))
+            return
+        self.measurements_ready.emit(values)
+
+    @pyqtSlot()
+    def close(self):
+        if self.bench:
+            self.bench.close()
+            self.bench = None
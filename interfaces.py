@@ -1,4 +1,4 @@
-import re
+import sequence
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QWizardPage, QWizard, QLabel, QVBoxLayout, QCheckBox, QGridLayout,
@@ -9,12 +9,33 @@ from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, pyqtSignal, QThread
 
 
+# The interface tests. The serial tests share the port and run in turn while
+# the operator does the manual checks.
+STEPS = [
+    sequence.Step("internal_5v", command="5v", pattern=r"([0-9]+\.[0-9]+)",
+                  limit="internal_5v", report="internal_5v", timeout=30),
+    # A line of exactly five IDs, the first of them port 1's. The value is
+    # the last, the EEPROM serial number.
+    sequence.Step("tac", command="tac-get-info",
+                  pattern=r"(?m)^[ \t]*(?=[0-9a-f]{{8}}[ \t]){port1_tac_id}"
+                          r"(?:[ \t]+[0-9a-f]{{8}}){{3}}"
+                          r"[ \t]+([0-9a-f]{{8}})[ \t\r]*$",
+                  report="eeprom_sn", timeout=30),
+    sequence.Step("hall_effect", resource=None, report="hall_effect"),
+    sequence.Step("led_test", resource=None, report="led_test"),
+]
+# Operator results kept when the tests are repeated.
+MANUAL_STEPS = ("hall_effect", "led_test")
+
+
 class Interfaces(QWizardPage):
     """QWizard page. Handles interface and LED testing and generating the
     output report."""
 
-    command_signal = pyqtSignal(str)
+    phase = "interfaces"
+
     complete_signal = pyqtSignal()
+    clear_cache_signal = pyqtSignal()
 
     def __init__(self, threadlink, test_utility, serial_manager, model, report):
         super().__init__()
@@ -25,7 +46,12 @@ class Interfaces(QWizardPage):
         self.report = report
         self.model = model
 
-        self.command_signal.connect(self.sm.send_command)
+        self.sequence = sequence.Sequence(STEPS, self.sm, model)
+        self.sequence.step_started.connect(self.step_started)
+        self.sequence.step_finished.connect(self.step_finished)
+        self.sequence.finished.connect(self.finished)
+
+        self.clear_cache_signal.connect(self.sm.clear_cache)
         self.complete_signal.connect(self.completeChanged)
 
         self.system_font = QApplication.font().family()
@@ -40,7 +66,7 @@ class Interfaces(QWizardPage):
         self.repeat_tests.setMaximumWidth(150)
         self.repeat_tests.setFont(self.label_font)
         self.repeat_tests.setStyleSheet("background-color: grey")
-        self.repeat_tests.clicked.connect(self.initializePage)
+        self.repeat_tests.clicked.connect(self.repeat)
 
         # Interfaces layout
         self.tests_layout = QVBoxLayout()
@@ -81,7 +107,7 @@ class Interfaces(QWizardPage):
         self.setLayout(self.grid)
         self.setTitle("Interfaces and LED Test")
 
-    def initializePage(self):
+    def initializePage(self, keep=()):
         self.is_complete = False
 
         self.repeat_tests.setEnabled(False)
@@ -91,98 +117,88 @@ class Interfaces(QWizardPage):
         self.tests_pbar.setValue(self.pbar_value)
 
         self.tests_lbl.setText("Testing 5v...")
-        self.sm.data_ready.connect(self.handle_5v_data)
-        self.command_signal.emit("5v")
-
-    def handle_5v_data(self, data):
-        self.sm.data_ready.disconnect()
-        p = r"([0-9]+\.[0-9]+)"
-        result = re.search(p, data)
-
-        if result:
-            value = float(result.group())
-            self.tu.internal_5v_status.setText(f"Internal 5V: {value} V")
-            if self.model.compare_to_limit("internal_5v", value):
-                self.report.write_data("internal_5v", value, "PASS")
-                self.tu.internal_5v_status.setStyleSheet(
+        self.sequence.start(
+            self.report,
+            {"port1_tac_id": self.tu.settings.value("port1_tac_id")}, keep)
+
+    def repeat(self):
+        """Repeats the serial tests with fresh responses from the board, e.g.
+        after the operator reseats the TAC. The operator's results stand."""
+        self.clear_cache_signal.emit()
+        self.initializePage(MANUAL_STEPS)
+
+    def step_started(self, name):
+        if name == "hall_effect":
+            self.hall_effect_pass_btn.setEnabled(True)
+            self.hall_effect_fail_btn.setEnabled(True)
+        elif name == "led_test":
+            self.led_test_pass_btn.setEnabled(True)
+            self.led_test_fail_btn.setEnabled(True)
+
+    def step_finished(self, name, passed, value):
+        if name == "internal_5v":
+            if value is not None:
+                self.tu.internal_5v_status.setText(f"Internal 5V: {value} V")
+            else:
+                QMessageBox.warning(self, "Warning!", "Bad 5 V data!")
+                self.tu.internal_5v_status.setText("Internal 5V: NO DATA")
+            self.tu.internal_5v_status.setStyleSheet(
+                self.threadlink.status_style_pass if passed
+                else self.threadlink.status_style_fail)
+
+            self.pbar_value += 1
+            self.tests_pbar.setValue(self.pbar_value)
+            self.tests_lbl.setText("Testing TAC ID...")
+
+        elif name == "tac":
+            if passed:
+                self.report.write_data("tac_connected", "", "PASS")
+                self.tu.tac_id_status.setText("TAC ID: PASS")
+                self.tu.tac_id_status.setStyleSheet(
                     self.threadlink.status_style_pass)
             else:
-                self.report.write_data("internal_5v", value, "FAIL")
-                self.tu.internal_5v_status.setStyleSheet(
+                self.report.write_data("tac_connected", "", "FAIL")
+                self.tu.tac_id_status.setText("TAC ID: FAIL")
+                self.tu.tac_id_status.setStyleSheet(
                     self.threadlink.status_style_fail)
-        else:
-            QMessageBox.warning(self, "Warning!", "Bad 5 V data!")
-            self.report.write_data("internal_5v", "", "FAIL")
-            self.tu.internal_5v_status.setText(f"Internal 5V: NO DATA")
-            self.tu.internal_5v_status.setStyleSheet(
-                self.threadlink.status_style_fail)
 
-        self.pbar_value +=1
-        self.tests_pbar.setValue(self.pbar_value)
-        self.tests_lbl.setText("Testing TAC ID...")
-        self.sm.data_ready.connect(self.handle_tac_data)
-        self.command_signal.emit("tac-get-info")
-
-    def handle_tac_data(self, data):
-        self.sm.data_ready.disconnect()
-        p = "([0-9a-f]{8})"
-        results = re.findall(p, data)
-
-        if (results 
-            and len(results) == 5
-            and results[0] == self.tu.settings.value("port1_tac_id")):
-            self.report.write_data("tac_connected", "", "PASS")
-            self.report.write_data("eeprom_sn", results[-1], "PASS")
-            self.tu.tac_id_status.setText("TAC ID: PASS")
-            self.tu.tac_id_status.setStyleSheet(
-                self.threadlink.status_style_pass)
-        else:
-            self.report.write_data("tac_connected", "", "FAIL")
-            self.report.write_data("eeprom_sn", "", "FAIL")
-            self.tu.tac_id_status.setText("TAC ID: FAIL")
-            self.tu.tac_id_status.setStyleSheet(
-                self.threadlink.status_style_fail)
-
-        self.pbar_value += 1
-        self.tests_pbar.setValue(self.pbar_value)
-        self.tests_lbl.setText("Complete.")
-        self.repeat_tests.setEnabled(True)
+            self.pbar_value += 1
+            self.tests_pbar.setValue(self.pbar_value)
+            self.tests_lbl.setText("Complete.")
+            self.repeat_tests.setEnabled(True)
+
+        elif name == "hall_effect":
+            result = "PASS" if passed else "FAIL"
+            self.tu.hall_effect_status.setText(
+                f"Hall Effect Sensor Test: {result}")
+            self.tu.hall_effect_status.setStyleSheet(
+                self.threadlink.status_style_pass if passed
+                else self.threadlink.status_style_fail)
+            self.hall_effect_pass_btn.setEnabled(False)
+            self.hall_effect_fail_btn.setEnabled(False)
+
+        elif name == "led_test":
+            result = "PASS" if passed else "FAIL"
+            self.tu.led_test_status.setText(f"LED Test: {result}")
+            self.tu.led_test_status.setStyleSheet(
+                self.threadlink.status_style_pass if passed
+                else self.threadlink.status_style_fail)
+            self.led_test_pass_btn.setEnabled(False)
+            self.led_test_fail_btn.setEnabled(False)
 
     def hall_pass(self):
-        self.report.write_data("hall_effect", "", "PASS")
-        self.tu.hall_effect_status.setText("Hall Effect Sensor Test: PASS")
-        self.tu.hall_effect_status.setStyleSheet(
-            self.threadlink.status_style_pass)
-        self.hall_effect_pass_btn.setEnabled(False)
-        self.hall_effect_fail_btn.setEnabled(False)
+        self.sequence.complete("hall_effect", True)
 
     def hall_fail(self):
-        self.report.write_data("hall_effect", "", "FAIL")
-        self.tu.hall_effect_status.setText("Hall Effect Sensor Test: FAIL")
-        self.tu.hall_effect_status.setStyleSheet(
-            self.threadlink.status_style_fail)
-        self.hall_effect_pass_btn.setEnabled(False)
-        self.hall_effect_fail_btn.setEnabled(False)
+        self.sequence.complete("hall_effect", False)
 
     def led_pass(self):
-        self.report.write_data("led_test", "", "PASS")
-        self.tu.led_test_status.setText("LED Test: PASS")
-        self.tu.led_test_status.setStyleSheet(
-            self.threadlink.status_style_pass)
-        self.led_test_pass_btn.setEnabled(False)
-        self.led_test_fail_btn.setEnabled(False)
-        self.finished()
+        self.sequence.complete("led_test", True)
 
     def led_fail(self):
-        self.report.write_data("led_test", "", "FAIL")
-        self.tu.led_test_status.setText("LED Test: FAIL")
-        self.tu.led_test_status.setStyleSheet(
-            self.threadlink.status_style_fail)
-        self.led_test_pass_btn.setEnabled(False)
-        self.led_test_fail_btn.setEnabled(False)
-        self.finished()
-
-    def finished(self):
+        self.sequence.complete("led_test", False)
+
+    def finished(self, passed):
         self.is_complete = True
         self.complete_signal.emit()
 
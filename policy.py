@@ -0,0 +1,35 @@
+import retest
+import results
+
+# Fail-fast modes. Off runs every phase. Stop goes straight to the report
+# once a board has failed. Diagnose only skips the expensive phases and the
+# phases that depend on them, so the cheap tests still record what else is
+# wrong with the board.
+MODES = ["Off", "Stop", "Diagnose"]
+
+# Phases that take minutes and tell nothing about why a board failed.
+EXPENSIVE_PHASES = ["program"]
+
+
+def phases_to_skip(record: results.ResultRecord, phase: str,
+                   mode: str) -> list:
+    """Returns the phases after the given one that can't change the
+    board's verdict and are skipped under the mode. Later phases only add
+    results, so once any result has failed the report fails whatever they
+    find."""
+    if mode not in MODES[1:] or phase not in retest.PHASES:
+        return []
+    if record.result() != results.Status.FAIL:
+        return []
+
+    later = retest.PHASES[retest.PHASES.index(phase) + 1:]
+    if mode == "Diagnose":
+        # A phase can't run without the phases it depends on, e.g. the
+        # interfaces need the firmware the program phase loads.
+        skipped = []
+        for p in later:
+            if p in EXPENSIVE_PHASES or any(
+                    dep in skipped for dep in retest.DEPENDS_ON[p]):
+                skipped.append(p)
+        return skipped
+    return later
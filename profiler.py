@@ -0,0 +1,93 @@
+import sys
+import time
+import threading
+from collections import Counter
+
+# Environment variable that starts profiling at launch. Its value is the
+# number of boards to profile.
+PROFILE_ENV = "THREADLINK_PROFILE"
+# Seconds between samples.
+INTERVAL = 0.005
+
+
+def frame_label(frame) -> str:
+    """Names a stack frame as module:function. Semicolons separate frames
+    in the folded format, so they never appear in a label."""
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}:{name}".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler. A background thread periodically
+    records the Python stack of every other thread, so time spent in the
+    GUI, serial and flash threads shows up without instrumenting them.
+
+    Stacks are kept as counts in the folded format used by flamegraph
+    tools: one line per distinct stack, outermost frame first, with the
+    thread name as the root.
+
+    Instance methods:
+    start   --  Starts sampling.
+    stop    --  Stops sampling.
+    folded  --  Returns the samples in the folded format.
+    write   --  Writes the folded samples to a file.
+    """
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self.run,
+                                       name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.thread.join()
+        self.elapsed += time.monotonic() - self.started
+
+    def run(self):
+        while self.running:
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        """Records the current stack of every thread but the profiler's."""
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        names[threading.main_thread().ident] = "gui"
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            # Qt threads aren't known to threading; the slot they are
+            # running names them in the stack.
+            stack.append(names.get(ident, "worker"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n"
+                       for stack, count in sorted(self.stacks.items()))
+
+    def write(self, path):
+        with open(path, "w") as f:
+            f.write(self.folded())
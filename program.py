@@ -1,5 +1,6 @@
-import re
 import avr
+import hexfile
+import sequence
 from packaging.version import LegacyVersion
 from pathlib import Path
 from PyQt5.QtWidgets import (
@@ -11,18 +12,43 @@ from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, pyqtSignal, QThread
 
 
+# The programming sequence. The Xmega is only flashed and the 1-wire master
+# only reprogrammed when the files are newer than what the board runs.
+STEPS = [
+    sequence.Step("board_version", command="version",
+                  pattern=r"([0-9]+\.[0-9]+[a-z])", required=False,
+                  timeout=30),
+    sequence.Step("flash", resource="programmer", depends=["board_version"],
+                  when="needs_flash"),
+    sequence.Step("watchdog", command="watchdog",
+                  pattern=r'firmware version "RS485 BRIDGE MAIN APP '
+                          r'([0-9]+\.[0-9]+[a-z])"',
+                  report="xmega_app", depends=["flash"], timeout=30),
+    sequence.Step("one_wire_version", slot="one_wire_test",
+                  pattern=r"([0-9]+\.[0-9]+[a-z])", required=False,
+                  depends=["watchdog"], timeout=30),
+    sequence.Step("reprogram", slot="reprogram_one_wire",
+                  pattern="download hex records now...",
+                  depends=["one_wire_version"], when="needs_one_wire",
+                  timeout=30),
+    sequence.Step("upload", slot="write_hex_file", command="{one_wire_file}",
+                  pattern="lock bits set", depends=["reprogram"],
+                  when="needs_one_wire"),
+    sequence.Step("one_wire_ver", slot="one_wire_test",
+                  pattern=r"([0-9]+\.[0-9a-zA-Z]+)", depends=["upload"],
+                  when="needs_one_wire", timeout=30),
+]
+
+
 class Program(QWizardPage):
     """Second QWizard page. Handles Xmega programming, watchdog reset and 
     one-wire master programming."""
 
-    command_signal = pyqtSignal(str)
+    phase = "program"
+
     sleep_signal = pyqtSignal(int)
     complete_signal = pyqtSignal()
     flash_signal = pyqtSignal()
-    board_version_check = pyqtSignal()
-    test_one_wire = pyqtSignal()
-    reprogram_one_wire = pyqtSignal()
-    file_write_signal = pyqtSignal(str)
 
     def __init__(self, threadlink, test_utility, serial_manager, model, report):
         super().__init__()
@@ -44,20 +70,31 @@ class Program(QWizardPage):
 
         self.flash_signal.connect(self.flash.flash)
         self.flash.command_succeeded.connect(self.flash_update)
+        self.flash.command_progress.connect(self.flash_progress)
         self.flash.command_failed.connect(self.flash_failed)
         self.flash.flash_finished.connect(self.flash_finished)
+        # The board's cached versions are stale once it's reflashed.
+        self.flash.flash_finished.connect(self.sm.clear_cache)
+        # So are the delays, until it reports the new firmware's version.
+        self.flash.flash_finished.connect(self.sm.firmware_changed)
         self.flash.process_error_signal.connect(self.process_error)
         self.flash.file_not_found_signal.connect(self.file_not_found)
         self.flash.generic_error_signal.connect(self.generic_error)
         self.flash.version_signal.connect(self.set_versions)
 
-        self.command_signal.connect(self.sm.send_command)
+        self.sequence = sequence.Sequence(
+            STEPS, self.sm, model,
+            actions={"flash": self.start_flash},
+            conditions={"needs_flash": self.needs_flash,
+                        "needs_one_wire": self.needs_one_wire})
+        self.sequence.step_started.connect(self.step_started)
+        self.sequence.step_finished.connect(self.step_finished)
+        self.sequence.step_skipped.connect(self.step_skipped)
+        self.sequence.finished.connect(self.sequence_finished)
+
         self.sleep_signal.connect(self.sm.sleep)
         self.complete_signal.connect(self.completeChanged)
-        self.board_version_check.connect(self.sm.version_check)
 
-        self.sm.version_signal.connect(self.compare_version)
-        self.sm.no_version.connect(self.no_version)
         self.sm.line_written.connect(self.update_pbar)
         self.sm.file_not_found_signal.connect(self.file_not_found)
         self.sm.generic_error_signal.connect(self.generic_error)
@@ -66,18 +103,11 @@ class Program(QWizardPage):
         self.sm.port_unavailable_signal.connect(self.port_warning)
         self.sm.serial_error_signal.connect(self.serial_error)
 
-        self.test_one_wire.connect(self.sm.one_wire_test)
-        self.reprogram_one_wire.connect(self.sm.reprogram_one_wire)
-        self.file_write_signal.connect(self.sm.write_hex_file)
-
-
         self.system_font = QApplication.font().family()
         self.label_font = QFont(self.system_font, 12)
 
-        self.flash_statuses = {"chip_erase": "Programming boot-loader...",
-                               "prog_boot": "Programming app-section...",
-                               "prog_app": "Programming main-app...",
-                               "prog_main": "Writing fuses...",
+        self.flash_statuses = {"chip_erase": "Programming flash...",
+                               "prog_image": "Writing fuses...",
                                "write_fuses": "Writing lockbits...",
                                "write_lockbits": "Complete."}
 
@@ -132,6 +162,7 @@ class Program(QWizardPage):
         self.setTitle("Xmega Programming and Verification")
 
     def initializePage(self):
+        self.sequence.stop()
         self.pbar_value = 0
 
         self.set_flash_files()
@@ -139,6 +170,7 @@ class Program(QWizardPage):
         self.threadlink.unchecked(self.batch_lbl, self.batch_chkbx)
         self.batch_pbar_lbl.setText("Flash Xmega")
         self.batch_pbar.reset()
+        self.batch_pbar.setFormat("%p%")
         self.watchdog_pbar_lbl.setText("Reset watchdog")
         self.watchdog_pbar.setRange(0, 1)
         self.watchdog_pbar.reset()
@@ -155,10 +187,21 @@ class Program(QWizardPage):
         # to be re-enabled.
         self.is_complete = False
 
+    def shutdown(self):
+        self.flash_thread.quit()
+        self.flash_thread.wait()
+
+    def auto_start(self):
+        """Starts programming without the operator's check when the board
+        was detected on the fixture."""
+        if self.sm.dut_present and not self.batch_chkbx.isChecked():
+            self.batch_chkbx.click()
+
     def set_flash_files(self):
         at_path = self.tu.settings.value("atprogram_file_path")
         hex_path = Path(self.tu.settings.value("hex_files_path"))
-        self.flash.set_files(at_path, hex_path)
+        self.flash.set_files(at_path, hex_path,
+                             self.tu.settings.value("hex_cache_dir_path"))
 
     def generic_error(self, error):
         QMessageBox.warning(self, "Warning", error)
@@ -195,34 +238,38 @@ class Program(QWizardPage):
 
     def set_versions(self, main_app_ver, one_wire_file, one_wire_ver):
         """Set a variable to have the most recent version of the main app.
-        Start the check of what version the board is running."""
+        Start the programming sequence. The 1-wire master file is repacked
+        into fewer, longer records if the station is set to a longer record
+        size, since the upload time goes by the record count."""
         self.main_app_file_version = main_app_ver
-        self.one_wire_file_path = one_wire_file
         self.one_wire_file_version = one_wire_ver
+        size = int(self.tu.settings.value("hex_record_bytes"))
+        try:
+            if size > hexfile.TOOLCHAIN_RECORD_BYTES:
+                self.one_wire_file_path = str(hexfile.repacked_file(
+                    one_wire_file,
+                    self.tu.settings.value("hex_cache_dir_path"), size))
+            else:
+                self.one_wire_file_path = one_wire_file
+        except (OSError, ValueError, hexfile.HexError) as e:
+            self.generic_error(f"Can't read {Path(one_wire_file).name}: {e}")
+            return
 
-        # Check board version.
-        self.board_version_check.emit()
+        self.sequence.start(self.report,
+                            {"one_wire_file": self.one_wire_file_path})
 
-    def compare_version(self, version: str):
-        """Compare main app file version and board version using 
-        packaging.version LegacyVersion and flash the board with the file if
-        the file version is higher than the board version."""
-        if LegacyVersion(self.main_app_file_version) > LegacyVersion(version):
-            self.start_flash()
-        else:
-            QMessageBox.warning(self, "Warning!", "File version is not newer "
-                                "than board version; skipping...")
-            self.tu.xmega_prog_status.setStyleSheet(
-                self.threadlink.status_style_pass)
-            self.tu.xmega_prog_status.setText("XMega Programming: PASS")
+    def needs_flash(self, results) -> bool:
+        """Compare main app file version and board version using
+        packaging.version LegacyVersion. The board is flashed if the file
+        version is higher or the board has no version."""
+        version = results["board_version"].value
+        return (not version or LegacyVersion(self.main_app_file_version) >
+                LegacyVersion(version))
 
-            self.batch_pbar_lbl.setText("Complete.")
-            self.batch_pbar.setRange(0, 1)
-            self.batch_pbar.setValue(1)
-            self.start_watchdog_reset()
-
-    def no_version(self):
-        self.start_flash()
+    def needs_one_wire(self, results) -> bool:
+        version = results["one_wire_version"].value
+        return (not version or LegacyVersion(self.one_wire_file_version) >
+                LegacyVersion(version))
 
     def isComplete(self):
         """Overrides isComplete method to check if all user actions have been 
@@ -235,7 +282,7 @@ class Program(QWizardPage):
     def start_flash(self):
         """Starts flash by emitting command."""
         self.batch_pbar_lbl.setText("Erasing flash...")
-        self.batch_pbar.setRange(0, 6)
+        self.batch_pbar.setRange(0, len(self.flash.commands))
         self.batch_pbar.setValue(0)
         self.flash_signal.emit()
 
@@ -246,6 +293,10 @@ class Program(QWizardPage):
         self.flash_counter += 1
         self.batch_pbar.setValue(self.flash_counter)
 
+    def flash_progress(self, cmd_text, line):
+        """Shows the programmer's latest output under the current step."""
+        self.batch_pbar.setFormat(f"%p%  {line[:60]}")
+
     def flash_failed(self, cmd_text):
         """Handles case where flash programming failed."""
 
@@ -256,63 +307,85 @@ class Program(QWizardPage):
         self.tu.xmega_prog_status.setStyleSheet(
             self.threadlink.status_style_fail)
         self.tu.xmega_prog_status.setText("XMega Programming: FAIL")
+        self.sequence.complete("flash", False)
 
     def flash_finished(self):
         """Handles case where flash programming is successful."""
+        if not self.sequence.is_active("flash"):
+            return
         self.threadlink.checked(self.batch_lbl, self.batch_chkbx)
         self.tu.xmega_prog_status.setStyleSheet(self.threadlink.status_style_pass)
         self.tu.xmega_prog_status.setText("XMega Programming: PASS")
-        self.start_watchdog_reset()
-
-    def start_watchdog_reset(self):
-        self.sm.data_ready.connect(self.watchdog_handler)
-        self.watchdog_pbar.setRange(0, 0)
-        self.watchdog_pbar_lbl.setText("Resetting watchdog...")
-        self.command_signal.emit("watchdog")
-
-    def watchdog_handler(self, data):
-        self.sm.data_ready.disconnect()
-        pattern = r'firmware version "RS485 BRIDGE MAIN APP [0-9]+\.[0-9]+[a-z]"'
-        pattern_version = r"([0-9]+\.[0-9]+[a-z])"
-        if not re.search(pattern, data):
-            QMessageBox.warning(self, "Warning",
-                                "Error in serial data.")
-            self.initializePage()
-            return
-        xmega_version = re.search(pattern_version, data).group()
-        self.report.write_data("xmega_app", xmega_version, "PASS")
-        self.watchdog_pbar.setValue(1)
-        self.watchdog_pbar_lbl.setText("Complete.")
-        self.start_one_wire_programming()
-
-    def start_one_wire_programming(self):
-        self.sm.data_ready.connect(self.one_wire_version)
-
-        self.test_one_wire.emit()
-        self.one_wire_pbar_lbl.setText("Checking version...")
-
-    def one_wire_version(self, data):
-        self.sm.data_ready.disconnect()
-
-        self.watchdog_pbar.setRange(0, 1)
-        self.watchdog_pbar.setValue(1)
-        self.watchdog_pbar_lbl.setText("Complete")
-        
-        pattern = r"([0-9]+\.[0-9]+[a-z])"
+        self.sequence.complete("flash", True)
+
+    def step_started(self, name):
+        if name == "watchdog":
+            self.watchdog_pbar.setRange(0, 0)
+            self.watchdog_pbar_lbl.setText("Resetting watchdog...")
+        elif name == "one_wire_version":
+            self.one_wire_pbar_lbl.setText("Checking version...")
+        elif name == "reprogram":
+            self.one_wire_pbar_lbl.setText("Erasing flash. . .")
+        elif name == "upload":
+            # Get file length
+            count = 0
+            try:
+                with open(self.one_wire_file_path, "r") as f:
+                    for line in f:
+                        count += 1
+            except IOError:
+                # The serial manager reports the missing file.
+                pass
+            self.one_wire_pbar.setRange(0, count)
+            self.one_wire_pbar_lbl.setText("Programming 1-wire master. . .")
 
-        if re.search(pattern, data):
-            one_wire_ver = re.search(pattern, data).group()
-        else:
-            one_wire_ver = None
+    def step_finished(self, name, passed, value):
+        if name == "watchdog":
+            if passed:
+                self.watchdog_pbar.setRange(0, 1)
+                self.watchdog_pbar.setValue(1)
+                self.watchdog_pbar_lbl.setText("Complete.")
+            else:
+                QMessageBox.warning(self, "Warning",
+                                    "Error in serial data.")
+        elif name == "reprogram" and not passed:
+            QMessageBox.warning(self, "Xmega1", "Bad command response.")
+        elif name == "upload":
+            if passed:
+                self.one_wire_pbar_lbl.setText("Programming complete.")
+            else:
+                QMessageBox.warning(self, "Xmega2", "Bad command response.")
+        elif name == "one_wire_ver":
+            if passed:
+                self.report.write_data("one_wire_ver", value, "PASS")
+                self.one_wire_pbar_lbl.setText("Version recorded.")
+                self.tu.one_wire_prog_status.setText(
+                    "1-Wire Programming: PASS")
+                self.tu.one_wire_prog_status.setStyleSheet(
+                    self.threadlink.status_style_pass)
+            else:
+                self.report.write_data("one_wire_ver", "N/A", "FAIL")
+                self.tu.one_wire_prog_status.setText(
+                    "Xmega Programming: FAIL")
+                self.tu.one_wire_prog_status.setStyleSheet(
+                    self.threadlink.status_style_fail)
+                QMessageBox.warning(self, "XMega3", "Bad command response.")
+
+    def step_skipped(self, name):
+        if name == "flash":
+            QMessageBox.warning(self, "Warning!", "File version is not newer "
+                                "than board version; skipping...")
+            self.tu.xmega_prog_status.setStyleSheet(
+                self.threadlink.status_style_pass)
+            self.tu.xmega_prog_status.setText("XMega Programming: PASS")
 
-        if (LegacyVersion(self.one_wire_file_version) > LegacyVersion(one_wire_ver)
-            or not one_wire_ver):
-            self.one_wire_pbar_lbl.setText("Erasing flash. . .")
-            self.sm.data_ready.connect(self.send_hex_file)
-            self.reprogram_one_wire.emit()
-        else:
+            self.batch_pbar_lbl.setText("Complete.")
+            self.batch_pbar.setRange(0, 1)
+            self.batch_pbar.setValue(1)
+        elif name == "reprogram":
             QMessageBox.warning(self, "Warning!", "File version is not newer "
                                 "than board version; skipping...")
+            one_wire_ver = self.sequence.results["one_wire_version"].value
             self.report.write_data("one_wire_ver", one_wire_ver, "PASS")
             self.tu.one_wire_prog_status.setText("1-Wire Programming: PASS")
             self.tu.one_wire_prog_status.setStyleSheet(
@@ -320,65 +393,18 @@ class Program(QWizardPage):
             self.one_wire_pbar_lbl.setText("Complete.")
             self.one_wire_pbar.setRange(0, 1)
             self.one_wire_pbar.setValue(1)
-            self.is_complete = True
-            self.complete_signal.emit()
-
-    def send_hex_file(self, data):
-        self.sm.data_ready.disconnect()
 
-        # Get file length
-        count = 0
-        try:
-            with open(self.one_wire_file_path, "r") as f:
-                for line in f:
-                    count += 1
-            self.one_wire_pbar.setRange(0, count)
-        except IOError:
-            QMessageBox.warning(self, "Warning",
-                                "Can't open one-wire-master file!")
+    def sequence_finished(self, passed):
+        """Completes the page once the board is programmed. A failure before
+        the version is recorded leaves the board to be programmed again."""
+        retry = [name for name, result in self.sequence.results.items()
+                 if not result.passed and name != "one_wire_ver"]
+        if retry:
+            self.initializePage()
             return
-        # Check for response from board before proceeding
-        pattern = "download hex records now..."
-
-        if (re.search(pattern, data)):
-            self.one_wire_pbar_lbl.setText("Programming 1-wire master. . .")
-            self.sm.data_ready.connect(self.data_parser)
-            self.file_write_signal.emit(self.one_wire_file_path)
-        else:
-            QMessageBox.warning(self, "Xmega1", "Bad command response.")
+        self.is_complete = True
+        self.complete_signal.emit()
 
     def update_pbar(self):
         self.pbar_value += 1
         self.one_wire_pbar.setValue(self.pbar_value)
-
-    def data_parser(self, data):
-        self.sm.data_ready.disconnect()
-        pattern = "lock bits set"
-        if (re.search(pattern, data)):
-            self.one_wire_pbar_lbl.setText("Programming complete.")
-            self.sm.data_ready.connect(self.record_version)
-            self.test_one_wire.emit()
-        else:
-            QMessageBox.warning(self, "Xmega2", "Bad command response.")
-
-    def record_version(self, data):
-        self.sm.data_ready.disconnect()
-        pattern = r"([0-9]+\.[0-9a-zA-Z]+)"
-        onewire_version = re.search(pattern, data)
-
-        if (onewire_version):
-            onewire_version_val = onewire_version.group()
-            self.report.write_data("one_wire_ver", onewire_version_val, "PASS")
-            self.one_wire_pbar_lbl.setText("Version recorded.")
-            self.tu.one_wire_prog_status.setText("1-Wire Programming: PASS")
-            self.tu.one_wire_prog_status.setStyleSheet(
-                self.threadlink.status_style_pass)
-        else:
-            self.report.write_data("one_wire_ver", "N/A", "FAIL")
-            self.tu.one_wire_prog_status.setText("Xmega Programming: FAIL")
-            self.tu.one_wire_prog_status.setStyleSheet(
-                self.threadlink.status_style_fail)
-            QMessageBox.warning(self, "XMega3", "Bad command response.")
-
-        self.is_complete = True
-        self.complete_signal.emit()
\ No newline at end of file
@@ -0,0 +1,223 @@
+import sys
+import time
+import argparse
+from collections import deque
+
+import serial
+from PyQt5.QtCore import QCoreApplication
+
+import model
+import capture
+import sequence
+import serialmanager
+
+
+class ReplayError(serial.SerialException):
+    pass
+
+
+class ReplaySerial:
+    """Serial port that plays back a recorded session, so the parsing and
+    sequencing can be tested without a board.
+
+    The bytes written have to match the session's transmitted bytes. Each
+    received record is released once the transmission before it is
+    written, after the same delay as in the recording divided by the speed.
+    A speed of 0 releases it at once.
+
+    Instance variables:
+    speed       --  Playback speed; 1 is recorded speed, 0 as fast as
+                    possible.
+    divergence  --  Description of the first write that didn't match the
+                    session, or None.
+
+    Instance methods:
+    done  --  True once the whole session has been played back.
+    """
+
+    def __init__(self, records, speed=1.0, port="REPLAY"):
+        self.port = port
+        self.baudrate = 115200
+        self.timeout = 15
+        self.is_open = True
+        self.speed = speed
+        self.records = deque(r for r in records if r[1] != capture.MARK)
+        self.expected = b""
+        self.sent = 0.0
+        self.divergence = None
+        self.rx = bytearray()
+        # (time the bytes arrive, bytes) for received records released.
+        self.pending = deque()
+        self.release(self.records[0][0] if self.records else 0)
+
+    def release(self, sent: float):
+        """Schedules the received records up to the next transmission,
+        relative to the time that transmission was sent."""
+        now = time.monotonic()
+        while self.records and self.records[0][1] == capture.RX:
+            timestamp, _, payload = self.records.popleft()
+            delay = (timestamp - sent) / self.speed if self.speed else 0
+            self.pending.append((now + max(delay, 0), payload))
+
+    def done(self) -> bool:
+        return not self.records and not self.expected and not self.pending
+
+    def diverge(self, message: str):
+        if self.divergence is None:
+            self.divergence = message
+        raise ReplayError(message)
+
+    def settle(self):
+        """Moves the received records that have arrived into the receive
+        buffer."""
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            self.rx += self.pending.popleft()[1]
+
+    # pyserial interface used by SerialManager.
+
+    @property
+    def in_waiting(self):
+        self.settle()
+        return len(self.rx)
+
+    def write(self, data):
+        size = len(data)
+        data = bytes(data)
+        while data:
+            if not self.expected:
+                if not self.records:
+                    self.diverge(f"Wrote {data!r} after the session ended.")
+                self.sent, _, self.expected = self.records.popleft()
+            n = min(len(data), len(self.expected))
+            if data[:n] != self.expected[:n]:
+                self.diverge(f"Wrote {data!r} where the session wrote "
+                             f"{self.expected!r}.")
+            data = data[n:]
+            self.expected = self.expected[n:]
+            if not self.expected:
+                self.release(self.sent)
+        return size
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        self.settle()
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def readinto(self, buffer):
+        """Reads into the buffer, waiting up to the timeout for a received
+        record on its way if nothing has arrived yet."""
+        deadline = time.monotonic() + self.timeout
+        self.settle()
+        while not self.rx and self.pending and time.monotonic() < deadline:
+            time.sleep(max(min(self.pending[0][0], deadline) -
+                           time.monotonic(), 0))
+            self.settle()
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read_until(self, expected=b"\n"):
+        """Waits for the expected bytes while received records are on their
+        way, up to the timeout."""
+        deadline = time.monotonic() + self.timeout
+        self.settle()
+        while expected not in self.rx and self.pending:
+            wait = min(self.pending[0][0], deadline) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.settle()
+            if time.monotonic() >= deadline:
+                break
+        i = self.rx.find(expected)
+        size = len(self.rx) if i < 0 else i + len(expected)
+        return self.read(size)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+
+def load_session(path, serial_num=None) -> list:
+    """Returns the records of a session file, or of one board's session in
+    it."""
+    return list(capture.slice_session(capture.read_segment(path),
+                                      serial_num))
+
+
+def replay_manager(records, speed=0.0) -> serialmanager.SerialManager:
+    """Returns a SerialManager talking to a replayed session. Its delays are
+    scaled by the speed, so as fast as possible doesn't wait at all."""
+    sm = serialmanager.SerialManager()
+    sm.ser = ReplaySerial(records, speed)
+    for key, value in sm.timing.items():
+        sm.timing[key] = value / speed if speed else 0
+    return sm
+
+
+def replay_steps(steps, sm, context=None, conditions=()) -> sequence.Sequence:
+    """Runs a test phase's steps against a replayed session. Steps that
+    aren't run over the serial port pass at once, and only the named
+    conditions hold, so the session decides the results."""
+    seq = sequence.Sequence(
+        steps, sm, model.Model(),
+        actions={s.name: lambda name=s.name: seq.complete(name, True)
+                 for s in steps if s.resource != "serial"},
+        conditions={s.when: lambda results, when=s.when: when in conditions
+                    for s in steps if s.when})
+    seq.start(context=context or {})
+    return seq
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded serial session through a test "
+                    "phase's serial steps, to check parsing and time the "
+                    "sequencing without a board.")
+    parser.add_argument("session", help="Session file, see capture.py --out.")
+    parser.add_argument("phase", choices=["program", "interfaces"])
+    parser.add_argument("--sn", help="Board serial number.")
+    parser.add_argument("-s", "--speed", type=float, default=0.0,
+                        help="Playback speed; 1 is recorded speed, 0 (the "
+                             "default) as fast as possible.")
+    parser.add_argument("--tac-id", default="", help="Port 1 TAC ID.")
+    parser.add_argument("--one-wire-file", default="",
+                        help="1-wire master hex file the session uploaded.")
+    parser.add_argument("--when", action="append", default=[],
+                        help="Condition that held in the session, e.g. "
+                             "needs_one_wire. May be repeated.")
+    args = parser.parse_args(argv)
+
+    if args.phase == "program":
+        import program as phase
+    else:
+        import interfaces as phase
+
+    # The steps' timeout timers need an application.
+    app = QCoreApplication(sys.argv)
+    sm = replay_manager(load_session(args.session, args.sn), args.speed)
+    start = time.perf_counter()
+    seq = replay_steps(phase.STEPS, sm,
+                       {"port1_tac_id": args.tac_id,
+                        "one_wire_file": args.one_wire_file}, args.when)
+    elapsed = time.perf_counter() - start
+
+    for name, result in seq.results.items():
+        status = "SKIP" if result.skipped else \
+            "PASS" if result.passed else "FAIL"
+        print(f"{name:20} {status:5} {result.seconds:8.3f} s  {result.value}")
+    print(f"Total {elapsed:.3f} s")
+    if sm.ser.divergence:
+        print(f"Diverged: {sm.ser.divergence}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
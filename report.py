@@ -1,4 +1,5 @@
 import csv
+import results
 from pathlib import Path
 from datetime import datetime as dt
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
@@ -11,11 +12,12 @@ class Report(QObject):
     timestamp   -- Used to store the current timestamp for naming the report.
     date        -- Stores date in dd--mm--yy format.
     test_result -- Boolean storing success or failure of the sum of the tests.
-    data        -- Dictionary of test variables and their results and values.
+    data        -- Result record of test variables, values and statuses.
 
     Instance Methods
     write_data          -- Updates data model.
     set_file_location   -- Sets file path for report location.
+    finalize            -- Sets the result and returns report name and rows.
     generate_report     -- Generates report and saves to path location.
     """
     file_not_found_signal = pyqtSignal()
@@ -28,27 +30,9 @@ class Report(QObject):
         self.timestamp = None
         self.date = f"{today.day:02d}-{today.month:02d}-{today.year}"
         self.test_result = None
-        # Data format: key | [value, units, test-passed]
-        self.data = {
-            # key : ["Name", value, PASS/FAIL]
-            "timestamp": ["Timestamp", None, "PASS"],
-            "pcba_sn": ["PCBA PN", None, None],
-            "pcba_pn": ["PCBA SN", None, None],
-            "tester_id": ["Tester ID", None, None],
-            "input_i": ["Input Current (mA)", None, None],
-            "5v_supply": ["5V Supply (V)", None, None],
-            "2p5v": ["2.5V Output (V)", None, None],
-            "1p8v": ["1.8V Supply (V)", None, None],
-            "internal_5v": ["Internal 5V (V)", None, None],
-            # "xmega_bootloader": ["Xmega Bootloader Version", None, None],
-            "xmega_app": ["Xmega App Version", None, None],
-            "one_wire_ver": ["1WireMaster Version", None, None],
-            # "serial_match": ["Serial Number Match", None, None],
-            "tac_connected": ["TAC Port Connected", None, None],
-            "led_test": ["LED Test", None, None],
-            "eeprom_sn": ["EEPROM SN", None, None],
-            "hall_effect": ["Hall-Effect Sensor Test", None, None],
-        }
+        # One compact record per board, sharing the fixed channel schema.
+        self.data = results.ResultRecord()
+        self.data.set_status("timestamp", results.Status.PASS)
         self.file_path = ""
 
     def write_data(self, data_key, data_value, status):
@@ -56,15 +40,15 @@ class Report(QObject):
         indicating if the test passed or not. If the test failed and isn't
         already in the list of data, include it.
         """
-        self.data[data_key][1] = data_value
-        self.data[data_key][2] = status
+        self.data.set(data_key, data_value, status)
 
     def set_file_location(self, file_path):
         """Sets the file path for the report's save location."""
         self.file_path = Path(file_path)
 
-    def generate_report(self) -> str:
-        """Writes all data in the data dictionary to an output file."""
+    def finalize(self) -> (str, list):
+        """Timestamps the report, works out the overall test result and
+        returns the report's file name and rows."""
         # Get the time again for a more accurate report timestamp.
         today = dt.now()
         self.timestamp = (
@@ -72,31 +56,34 @@ class Report(QObject):
             f" {today.hour:02d}:{today.minute:02d}"
             f":{today.second}"
         )
-        self.data["timestamp"][1] = self.timestamp
+        self.data.set("timestamp", self.timestamp, "PASS")
         # Filename-friendly timestamp
         ts = self.timestamp.replace(":", "-")
-        sn = self.data["pcba_sn"][1]
-        id = self.data["tester_id"][1]
+        sn = self.data.value("pcba_sn")
+        id = self.data.value("tester_id")
 
-        name = str(self.file_path.joinpath(f"{sn}_{ts}-ID-{id}.csv"))
+        name = f"{sn}_{ts}-ID-{id}.csv"
 
         # Check for any tests that failed.
-        for _, test in self.data.items():
-            if test[2] == "FAIL":
-                self.test_result = "FAIL"
-                name = name[:-4] + "_FAIL.csv"
-                break
-            self.test_result = "PASS"
-        
+        self.test_result = str(self.data.result())
+        if self.test_result == "FAIL":
+            name = name[:-4] + "_FAIL.csv"
+
+        rows = [["Name", "Value", "Pass/Fail"],
+                ["Test Result", "", self.test_result]]
+        rows += self.data.rows()
+
+        return (name, rows)
+
+    def generate_report(self) -> str:
+        """Writes all data in the data dictionary to an output file."""
+        file_name, rows = self.finalize()
+        name = str(self.file_path.joinpath(file_name))
 
         try:
             with open(name, "w", newline='') as f:
                 csvwriter = csv.writer(f)
-
-                csvwriter.writerow(["Name", "Value", "Pass/Fail"])
-                csvwriter.writerow(["Test Result", "", self.test_result])
-                for _, test in self.data.items():
-                    csvwriter.writerow([test[0], test[1], test[2]])
+                csvwriter.writerows(rows)
 
         except FileNotFoundError:
             self.file_not_found_signal.emit()
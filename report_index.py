@@ -0,0 +1,153 @@
+import re
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import date, timedelta, datetime as dt
+
+INDEX_FILE = "reports.sqlite"
+
+# Report file names: {sn}_{yyyy-mm-dd hh-mm-s}-ID-{tester id}[_FAIL].csv
+REPORT_NAME_PATTERN = (r"(?P<sn>[^_]+)_(?P<date>\d{4}-\d{2}-\d{2}) "
+                       r"(?P<time>\d{1,2}-\d{1,2}-\d{1,2})-ID-(?P<id>.*?)"
+                       r"(?P<fail>_FAIL)?\.csv")
+
+
+def parse_report_name(name: str):
+    """Returns the serial number, tester ID, POSIX time and result encoded in
+    a report file name, or None if it isn't a report."""
+    match = re.fullmatch(REPORT_NAME_PATTERN, name)
+    if not match:
+        return None
+    timestamp = dt.strptime(f"{match.group('date')} {match.group('time')}",
+                            "%Y-%m-%d %H-%M-%S").timestamp()
+    return {"sn": match.group("sn"),
+            "tester_id": match.group("id"),
+            "time": timestamp,
+            "result": "FAIL" if match.group("fail") else "PASS"}
+
+
+class ReportIndex:
+    """SQLite index of test runs, kept up to date as reports are finalized,
+    for finding a board's history without browsing the report directory.
+
+    Instance methods:
+    add      --  Adds a run to the index.
+    move     --  Updates the path of a run's report.
+    search   --  Finds runs by serial number, tester and time range.
+    rebuild  --  Adds every report found in a directory.
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                path TEXT PRIMARY KEY,
+                sn TEXT,
+                pn TEXT,
+                tester_id TEXT,
+                time REAL,
+                result TEXT,
+                failed TEXT
+            );
+            CREATE INDEX IF NOT EXISTS runs_sn ON runs (sn, time);
+            CREATE INDEX IF NOT EXISTS runs_tester ON runs (tester_id, time);
+            CREATE INDEX IF NOT EXISTS runs_time ON runs (time);
+        """)
+
+    def add(self, path, sn, pn, tester_id, time, result, failed=()):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(path), sn, pn, tester_id, time, result,
+                 ",".join(failed)))
+
+    def search(self, sn=None, tester_id=None, start=None, end=None) -> list:
+        """Returns matching runs as dictionaries, oldest first. Start and end
+        are POSIX times; any criterion may be None."""
+        conditions = []
+        args = []
+        for clause, value in (("sn = ?", sn), ("tester_id = ?", tester_id),
+                              ("time >= ?", start), ("time <= ?", end)):
+            if value is not None and value != "":
+                conditions.append(clause)
+                args.append(value)
+
+        query = "SELECT path, sn, pn, tester_id, time, result, failed " \
+                "FROM runs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY time"
+
+        keys = ("path", "sn", "pn", "tester_id", "time", "result", "failed")
+        return [dict(zip(keys, row)) for row in self.db.execute(query, args)]
+
+    def move(self, old_path, new_path):
+        """Points a run at its report's new location, e.g. once it has been
+        replicated from the spool."""
+        with self.db:
+            self.db.execute("UPDATE runs SET path = ? WHERE path = ?",
+                            (str(new_path), str(old_path)))
+
+    def rebuild(self, report_dir) -> int:
+        """Indexes every report in a directory from its file name. Returns
+        the number of reports found."""
+        count = 0
+        with self.db:
+            for path in Path(report_dir).glob("*.csv"):
+                run = parse_report_name(path.name)
+                if not run:
+                    continue
+                self.db.execute(
+                    "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (str(path), run["sn"], None, run["tester_id"],
+                     run["time"], run["result"], ""))
+                count += 1
+        return count
+
+    def close(self):
+        self.db.close()
+
+
+def format_run(run: dict) -> str:
+    ts = dt.fromtimestamp(run["time"]).isoformat(sep=" ", timespec="seconds")
+    return f"{ts}  {run['sn']}  {run['tester_id']}  {run['result']}  " \
+           f"{run['path']}"
+
+
+def parse_end(text: str) -> float:
+    """Returns the POSIX time of an ISO end date or time. A date on its own
+    ends at the end of that day."""
+    try:
+        day = date.fromisoformat(text)
+    except ValueError:
+        return dt.fromisoformat(text).timestamp()
+    end = dt.combine(day, dt.min.time()) + timedelta(days=1)
+    return (end - timedelta(microseconds=1)).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the report index.")
+    parser.add_argument("index_dir", help="Index directory.")
+    parser.add_argument("--sn", help="Board serial number.")
+    parser.add_argument("--tester", help="Tester ID.")
+    parser.add_argument("--start", help="ISO start date or time.")
+    parser.add_argument("--end", help="ISO end date or time.")
+    parser.add_argument("--rebuild", metavar="REPORT_DIR",
+                        help="Index the reports in a directory first.")
+    args = parser.parse_args(argv)
+
+    index = ReportIndex(Path(args.index_dir).joinpath(INDEX_FILE))
+    if args.rebuild:
+        print(f"Indexed {index.rebuild(args.rebuild)} reports.")
+
+    start = dt.fromisoformat(args.start).timestamp() if args.start else None
+    end = parse_end(args.end) if args.end else None
+    for run in index.search(args.sn, args.tester, start, end):
+        print(format_run(run))
+    index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
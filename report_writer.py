@@ -0,0 +1,169 @@
+import os
+import csv
+import shutil
+from pathlib import Path
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+# Time in ms to wait for more reports before replicating a batch.
+BATCH_DELAY = 500
+# Maximum number of reports replicated per batch.
+BATCH_SIZE = 20
+# Retry delays in ms after a failed replication, doubling up to the maximum.
+RETRY_MIN = 1000
+RETRY_MAX = 60000
+
+
+def fsync_dir(path):
+    """Flushes a directory entry to disk where the platform supports it."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ReportWriter(QObject):
+    """Writes reports to a local spool directory and replicates them to the
+    report directory in the background, so a slow or unavailable share never
+    holds up testing.
+
+    Reports are written to the spool atomically and survive a restart; any
+    still in the spool are replicated when the writer starts. Replication
+    copies a batch of reports, syncs them to disk in one pass, and only then
+    renames them into place and removes them from the spool. Failed batches
+    are retried with a growing delay.
+
+    Instance methods:
+    set_destination  --  Sets the report directory.
+    submit           --  Spools a report for replication.
+    replicate        --  Replicates one batch of spooled reports.
+    queue_depth      --  Number of reports waiting in the spool.
+    """
+    queue_depth_signal = pyqtSignal(int)
+    report_replicated = pyqtSignal(str)
+    replication_error_signal = pyqtSignal(str)
+    spool_error_signal = pyqtSignal(str, str)
+
+    def __init__(self, spool_dir):
+        super().__init__()
+        self.spool_dir = Path(spool_dir)
+        self.destination = None
+        self.retry_delay = RETRY_MIN
+        self.timer = None
+
+    @pyqtSlot()
+    def start(self):
+        """Creates the replication timer in the writer's thread and picks up
+        any reports left in the spool."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.replicate)
+        self.queue_depth_signal.emit(self.queue_depth())
+        self.schedule(BATCH_DELAY)
+
+    @pyqtSlot()
+    def stop(self):
+        """Stops replication. Spooled reports are picked up on the next
+        start."""
+        if self.timer:
+            self.timer.stop()
+
+    @pyqtSlot(str)
+    def set_destination(self, destination):
+        self.destination = Path(destination)
+        self.retry_delay = RETRY_MIN
+        self.schedule(BATCH_DELAY)
+
+    @pyqtSlot(str, list)
+    def submit(self, name, rows):
+        """Writes the report rows to the spool and schedules replication.
+        Emits the report name and the error if it can't be written."""
+        try:
+            self.spool(name, rows)
+        except OSError as e:
+            self.spool_error_signal.emit(name, str(e))
+            return
+        self.queue_depth_signal.emit(self.queue_depth())
+        self.schedule(BATCH_DELAY)
+
+    def spool(self, name, rows) -> Path:
+        """Atomically writes a report into the spool directory."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir.joinpath(name)
+        tmp = self.spool_dir.joinpath(name + ".tmp")
+
+        with open(tmp, "w", newline='') as f:
+            csvwriter = csv.writer(f)
+            csvwriter.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        fsync_dir(self.spool_dir)
+        return path
+
+    def pending(self) -> list:
+        """Returns the spooled reports, oldest first."""
+        if not self.spool_dir.is_dir():
+            return []
+        return sorted(self.spool_dir.glob("*.csv"),
+                      key=lambda p: p.stat().st_mtime)
+
+    def queue_depth(self) -> int:
+        return len(self.pending())
+
+    def schedule(self, delay):
+        if self.timer and not self.timer.isActive():
+            self.timer.start(delay)
+
+    @pyqtSlot()
+    def replicate(self) -> bool:
+        """Replicates one batch of spooled reports to the destination.
+        Returns True if the batch was replicated."""
+        batch = self.pending()[:BATCH_SIZE]
+        if not batch or not self.destination:
+            return True
+
+        copies = []
+        try:
+            if not self.destination.is_dir():
+                raise FileNotFoundError(
+                    f"Report directory {self.destination} does not exist!")
+
+            for path in batch:
+                part = self.destination.joinpath(path.name + ".part")
+                shutil.copyfile(path, part)
+                copies.append((path, part))
+
+            # One sync pass for the whole batch.
+            for _, part in copies:
+                with open(part, "rb+") as f:
+                    os.fsync(f.fileno())
+
+            for path, part in copies:
+                os.replace(part, self.destination.joinpath(path.name))
+            fsync_dir(self.destination)
+
+        except OSError as e:
+            for _, part in copies:
+                try:
+                    part.unlink()
+                except OSError:
+                    pass
+            self.replication_error_signal.emit(str(e))
+            self.schedule(self.retry_delay)
+            self.retry_delay = min(self.retry_delay * 2, RETRY_MAX)
+            return False
+
+        for path, _ in copies:
+            path.unlink()
+            self.report_replicated.emit(
+                str(self.destination.joinpath(path.name)))
+
+        self.retry_delay = RETRY_MIN
+        self.queue_depth_signal.emit(self.queue_depth())
+        if self.pending():
+            self.schedule(0)
+        return True
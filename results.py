@@ -0,0 +1,247 @@
+import csv
+import enum
+import json
+import math
+import struct
+from array import array
+
+MAGIC = b"TLR1"
+NO_TEXT = 0xFFFF
+
+
+class Status(enum.IntEnum):
+    """Test status of a result channel."""
+    NONE = 0
+    PASS = 1
+    FAIL = 2
+
+    @classmethod
+    def parse(cls, status):
+        """Converts None, "PASS"/"FAIL" or a Status to a Status."""
+        if status is None or status == "":
+            return cls.NONE
+        if isinstance(status, cls):
+            return status
+        return cls[status]
+
+    def __str__(self):
+        return "" if self is Status.NONE else self.name
+
+
+class Channel:
+    """A single result channel: its key, report name and whether its values
+    are stored as floats."""
+    __slots__ = ("key", "name", "numeric")
+
+    def __init__(self, key, name, numeric=False):
+        self.key = key
+        self.name = name
+        self.numeric = numeric
+
+
+class Schema:
+    """Fixed, ordered set of result channels. One schema object is shared by
+    every record, so a record only holds its values.
+
+    Instance variables:
+    channels  --  The channels in report order.
+    slots     --  Channel key to (channel index, numeric, index into the
+                  value store).
+    """
+    __slots__ = ("channels", "slots", "numeric_count", "text_count",
+                 "binary")
+
+    def __init__(self, channels):
+        self.channels = tuple(channels)
+        self.slots = {}
+        numeric = text = 0
+        for i, channel in enumerate(self.channels):
+            if channel.numeric:
+                self.slots[channel.key] = (i, True, numeric)
+                numeric += 1
+            else:
+                self.slots[channel.key] = (i, False, text)
+                text += 1
+        self.numeric_count = numeric
+        self.text_count = text
+        # Binary layout: magic | numeric values | statuses, then the text
+        # values as length-prefixed UTF-8.
+        self.binary = struct.Struct(
+            f"<4s{numeric}d{len(self.channels)}B")
+
+    def __len__(self):
+        return len(self.channels)
+
+    def keys(self):
+        return [channel.key for channel in self.channels]
+
+
+SCHEMA = Schema([
+    Channel("timestamp", "Timestamp"),
+    Channel("pcba_sn", "PCBA PN"),
+    Channel("pcba_pn", "PCBA SN"),
+    Channel("tester_id", "Tester ID"),
+    Channel("input_i", "Input Current (mA)", True),
+    Channel("5v_supply", "5V Supply (V)", True),
+    Channel("2p5v", "2.5V Output (V)", True),
+    Channel("1p8v", "1.8V Supply (V)", True),
+    Channel("internal_5v", "Internal 5V (V)", True),
+    Channel("xmega_app", "Xmega App Version"),
+    Channel("one_wire_ver", "1WireMaster Version"),
+    Channel("tac_connected", "TAC Port Connected"),
+    Channel("led_test", "LED Test"),
+    Channel("eeprom_sn", "EEPROM SN"),
+    Channel("hall_effect", "Hall-Effect Sensor Test"),
+])
+
+
+class ResultRecord:
+    """Compact record of one board's results. Numeric channels are stored as
+    floats, with NaN for no value, text channels as strings, and statuses as
+    one byte per channel.
+
+    Instance methods:
+    set           --  Sets a channel's value and status.
+    value         --  Returns a channel's value.
+    status        --  Returns a channel's status.
+    result        --  Overall result of the record.
+    failed_keys   --  Keys of the failed channels.
+    rows          --  Report rows: name, value and status per channel.
+    to_dict       --  Plain dictionary for JSON export.
+    to_bytes      --  Packed binary form.
+    """
+    __slots__ = ("schema", "numbers", "texts", "statuses")
+
+    def __init__(self, schema=SCHEMA):
+        self.schema = schema
+        self.numbers = array("d", [math.nan]) * schema.numeric_count
+        self.texts = [None] * schema.text_count
+        self.statuses = bytearray(len(schema))
+
+    def set(self, key, value, status=None):
+        index, numeric, i = self.schema.slots[key]
+        if numeric:
+            try:
+                self.numbers[i] = float(value)
+            except (TypeError, ValueError):
+                self.numbers[i] = math.nan
+        else:
+            self.texts[i] = None if value is None else str(value)
+        self.statuses[index] = Status.parse(status)
+
+    def set_status(self, key, status):
+        self.statuses[self.schema.slots[key][0]] = Status.parse(status)
+
+    def value(self, key):
+        _, numeric, i = self.schema.slots[key]
+        if numeric:
+            value = self.numbers[i]
+            return None if math.isnan(value) else value
+        return self.texts[i]
+
+    def status(self, key) -> Status:
+        return Status(self.statuses[self.schema.slots[key][0]])
+
+    def result(self) -> Status:
+        return Status.FAIL if Status.FAIL in self.statuses else Status.PASS
+
+    def failed_keys(self) -> list:
+        return [channel.key
+                for channel, status in zip(self.schema.channels,
+                                           self.statuses)
+                if status == Status.FAIL]
+
+    def rows(self) -> list:
+        return [[channel.name, self.value(channel.key), str(Status(status))]
+                for channel, status in zip(self.schema.channels,
+                                           self.statuses)]
+
+    def csv_row(self) -> list:
+        """One wide row per record, with a value and status column per
+        channel, matching csv_header."""
+        row = []
+        for channel, status in zip(self.schema.channels, self.statuses):
+            value = self.value(channel.key)
+            row += ["" if value is None else value, str(Status(status))]
+        return row
+
+    def to_dict(self) -> dict:
+        return {channel.key: [self.value(channel.key), str(Status(status))]
+                for channel, status in zip(self.schema.channels,
+                                           self.statuses)}
+
+    @classmethod
+    def from_dict(cls, data, schema=SCHEMA):
+        record = cls(schema)
+        for key, (value, status) in data.items():
+            record.set(key, value, status)
+        return record
+
+    def to_bytes(self) -> bytes:
+        parts = [self.schema.binary.pack(MAGIC, *self.numbers,
+                                         *self.statuses)]
+        for text in self.texts:
+            if text is None:
+                parts.append(struct.pack("<H", NO_TEXT))
+            else:
+                encoded = text.encode()[:NO_TEXT - 1]
+                parts.append(struct.pack("<H", len(encoded)) + encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, schema=SCHEMA):
+        """Unpacks a record; returns it and the number of bytes used."""
+        record = cls(schema)
+        unpacked = schema.binary.unpack_from(data, 0)
+        if unpacked[0] != MAGIC:
+            raise ValueError("Not a packed result record.")
+        n = schema.numeric_count
+        record.numbers = array("d", unpacked[1:1 + n])
+        record.statuses = bytearray(unpacked[1 + n:])
+
+        pos = schema.binary.size
+        for i in range(schema.text_count):
+            (length,) = struct.unpack_from("<H", data, pos)
+            pos += 2
+            if length != NO_TEXT:
+                record.texts[i] = bytes(data[pos:pos + length]).decode()
+                pos += length
+        return (record, pos)
+
+
+def csv_header(schema=SCHEMA) -> list:
+    header = []
+    for channel in schema.channels:
+        header += [channel.name, f"{channel.name} Pass/Fail"]
+    return header
+
+
+def write_csv(records, f, schema=SCHEMA):
+    """Writes records to a file as one wide row each."""
+    csvwriter = csv.writer(f)
+    csvwriter.writerow(csv_header(schema))
+    for record in records:
+        csvwriter.writerow(record.csv_row())
+
+
+def dump_json(records) -> str:
+    return json.dumps([record.to_dict() for record in records])
+
+
+def load_json(text, schema=SCHEMA) -> list:
+    return [ResultRecord.from_dict(data, schema) for data in json.loads(text)]
+
+
+def pack_records(records) -> bytes:
+    return b"".join(record.to_bytes() for record in records)
+
+
+def unpack_records(data, schema=SCHEMA) -> list:
+    records = []
+    view = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        record, size = ResultRecord.from_bytes(view[pos:], schema)
+        records.append(record)
+        pos += size
+    return records
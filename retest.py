@@ -0,0 +1,61 @@
+import csv
+import results
+
+# Test phases in procedure order.
+PHASES = ["setup", "program", "interfaces"]
+
+# Phase : report keys recorded by the phase
+PHASE_KEYS = {
+    "setup": ["input_i", "5v_supply", "2p5v", "1p8v"],
+    "program": ["xmega_app", "one_wire_ver"],
+    "interfaces": ["internal_5v", "tac_connected", "eeprom_sn",
+                   "hall_effect", "led_test"],
+}
+
+# Phase : phases whose results it relies on. Rerunning a phase invalidates
+# every phase that depends on it, e.g. rework that fixes a supply rail means
+# the board has to be reprogrammed and its interfaces retested.
+DEPENDS_ON = {
+    "setup": [],
+    "program": ["setup"],
+    "interfaces": ["program"],
+}
+
+
+def load_report(path) -> results.ResultRecord:
+    """Reads a report file back into a result record. Raises ValueError if
+    the file isn't a report."""
+    names = {channel.name: channel.key for channel in results.SCHEMA.channels}
+    record = results.ResultRecord()
+
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+
+    if not rows or rows[0] != ["Name", "Value", "Pass/Fail"]:
+        raise ValueError(f"{path} is not a report.")
+
+    for row in rows[1:]:
+        if len(row) == 3 and row[0] in names:
+            record.set(names[row[0]], row[1] or None, row[2] or None)
+    return record
+
+
+def phases_to_rerun(record: results.ResultRecord) -> list:
+    """Returns the phases that failed or didn't complete, plus every phase
+    that depends on them, in procedure order."""
+    rerun = set()
+    for phase in PHASES:
+        statuses = [record.status(key) for key in PHASE_KEYS[phase]]
+        if any(status != results.Status.PASS for status in statuses):
+            rerun.add(phase)
+        elif any(dep in rerun for dep in DEPENDS_ON[phase]):
+            rerun.add(phase)
+    return [phase for phase in PHASES if phase in rerun]
+
+
+def merge(record: results.ResultRecord, previous: results.ResultRecord,
+          phases):
+    """Copies the results of the given phases from a previous run."""
+    for phase in phases:
+        for key in PHASE_KEYS[phase]:
+            record.set(key, previous.value(key), previous.status(key))
@@ -0,0 +1,114 @@
+import re
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+# Read timeout of the line readers, also bounds how long stopping takes.
+READ_TIMEOUT = 0.5
+
+TESTER_ID_PATTERN = r"[A-Z0-9_\-]+"
+READING_PATTERN = (r"([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)"
+                   r"\s*(mA|mV|A|V)?")
+
+
+class ProductTable:
+    """Lookup table built once from the product data for validating scanned
+    input as it arrives.
+
+    Instance variables:
+    prefixes  --  Serial number prefix to part number.
+
+    Instance methods:
+    classify          --  Work out which start page field a scan belongs to.
+    valid_serial      --  Check a serial number against a part number.
+    valid_tester_id   --  Check a tester ID.
+    """
+
+    SERIAL_LENGTH = 7
+
+    def __init__(self, product_data: dict):
+        self.product_data = product_data
+        self.prefixes = {values[0]: pn for pn, values in product_data.items()}
+
+    def classify(self, text: str) -> (str, str):
+        """Returns the start page field the scanned text belongs to and the
+        normalised value. The field is None if the text isn't a part or
+        serial number."""
+        value = text.strip().upper()
+
+        if value in self.product_data:
+            return ("pcba_pn", value)
+
+        pn = self.prefixes.get(value[0:3])
+        if pn and self.valid_serial(value, pn):
+            return ("pcba_sn", value)
+
+        return (None, value)
+
+    def valid_serial(self, sn: str, pn: str) -> bool:
+        """The serial number should be seven characters long and start with
+        the specific prefix for the given product."""
+        if pn not in self.product_data:
+            return False
+        return (sn[0:3] == self.product_data[pn][0] and
+                len(sn) == self.SERIAL_LENGTH)
+
+    @staticmethod
+    def valid_tester_id(tester_id: str) -> bool:
+        return bool(re.fullmatch(TESTER_ID_PATTERN, tester_id))
+
+
+def parse_reading(line: str) -> (float, str):
+    """Parses a meter reading, such as a SCPI "+4.01200E-03" response or a
+    talk-only "4.012 mA" line. Returns the value and its unit, which is None
+    when the meter doesn't send one. Raises ValueError on anything else."""
+    match = re.fullmatch(READING_PATTERN, line.strip())
+    if not match:
+        raise ValueError(f"Bad reading: {line!r}")
+    return (float(match.group(1)), match.group(2))
+
+
+class SerialLineReader(QObject):
+    """Reads lines from a serial peripheral, such as a barcode scanner or a
+    meter in talk-only mode, and emits each line as it arrives. Lines may be
+    terminated with CR, LF or both."""
+    line_received = pyqtSignal(str)
+    port_error_signal = pyqtSignal(str)
+
+    def __init__(self, port: str, baudrate: int = 9600):
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        # Only stop() sets it, so a stop while the port opens isn't lost.
+        self.stopped = threading.Event()
+
+    @pyqtSlot()
+    def run(self):
+        """Reads until stopped. Runs in the reader's own thread."""
+        # Imported here to keep pyserial off the startup path.
+        import serial
+        if self.stopped.is_set():
+            return
+        try:
+            ser = serial.Serial(self.port, self.baudrate,
+                                timeout=READ_TIMEOUT)
+        except serial.serialutil.SerialException:
+            self.port_error_signal.emit(self.port)
+            return
+
+        buffer = b""
+        with ser:
+            while not self.stopped.is_set():
+                try:
+                    buffer += ser.read(ser.in_waiting or 1)
+                except serial.serialutil.SerialException:
+                    self.port_error_signal.emit(self.port)
+                    break
+
+                *lines, buffer = re.split(rb"[\r\n]", buffer)
+                for line in lines:
+                    text = line.decode(errors="replace").strip()
+                    if text:
+                        self.line_received.emit(text)
+
+    def stop(self):
+        self.stopped.set()
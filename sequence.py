@@ -0,0 +1,253 @@
+import re
+import time
+import itertools
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# Numbers the serial requests of every sequence, so a response only ever
+# reaches the step that asked for it.
+_request_numbers = itertools.count(1)
+
+
+class Step:
+    """One step of a test sequence.
+
+    Instance variables:
+    name      --  Step name, also used for dependencies and actions.
+    command   --  Argument for the serial slot, formatted with the
+                  sequence's context, e.g. a command or a file path.
+    slot      --  SerialManager slot that runs the step.
+    pattern   --  Regular expression the response must match, formatted
+                  with the context like the command, whose values match
+                  literally. The value is its first group, or the whole
+                  match.
+    required  --  False if the step passes without a value when the
+                  pattern doesn't match.
+    timeout   --  Seconds before the step fails, or None.
+    limit     --  Model limit the value is checked against.
+    report    --  Report key the value and result are written to.
+    depends   --  Steps that must pass before this one starts.
+    resource  --  What the step occupies. Steps on different resources run
+                  concurrently; serial steps go to the board, others are
+                  started by an action and finished with complete(). None
+                  never waits for other steps.
+    when      --  Name of a condition; the step is skipped if it's false.
+    """
+    __slots__ = ("name", "command", "slot", "pattern", "required",
+                 "timeout", "limit", "report", "depends", "resource", "when")
+
+    def __init__(self, name, command=None, slot="send_command", pattern=None,
+                 required=True, timeout=None, limit=None, report=None,
+                 depends=(), resource="serial", when=None):
+        self.name = name
+        self.command = command
+        self.slot = slot
+        self.pattern = pattern
+        self.required = required
+        self.timeout = timeout
+        self.limit = limit
+        self.report = report
+        self.depends = tuple(depends)
+        self.resource = resource
+        self.when = when
+
+
+class StepResult:
+    """Outcome of a step. Skipped steps count as passed; steps blocked by a
+    failed dependency count as failed."""
+    __slots__ = ("passed", "value", "data", "seconds", "skipped")
+
+    def __init__(self, passed, value=None, data="", seconds=0.0,
+                 skipped=False):
+        self.passed = passed
+        self.value = value
+        self.data = data
+        self.seconds = seconds
+        self.skipped = skipped
+
+
+class Sequence(QObject):
+    """Runs a graph of test steps against the board. Each step starts as
+    soon as its dependencies have passed and its resource is free, so the
+    pages only describe the steps and react to their results; the engine
+    needs no widgets and runs the same way headless.
+
+    Serial responses come back tagged with their request number and are
+    matched to the step that sent it. Responses to steps that timed out or
+    were stopped are dropped.
+
+    Instance variables:
+    results  --  Step name : StepResult, for the finished steps.
+    timings  --  Step name : seconds taken.
+
+    Instance methods:
+    start     --  Runs the steps.
+    stop      --  Abandons the running steps.
+    complete  --  Finishes a step run by an action.
+    """
+    request_signal = pyqtSignal(int, str, str)
+    step_started = pyqtSignal(str)
+    step_finished = pyqtSignal(str, bool, object)
+    step_skipped = pyqtSignal(str)
+    finished = pyqtSignal(bool)
+
+    def __init__(self, steps, serial_manager, model=None, actions=None,
+                 conditions=None):
+        super().__init__()
+        self.steps = {step.name: step for step in steps}
+        self.model = model
+        self.report = None
+        self.actions = actions or {}
+        self.conditions = conditions or {}
+        self.context = {}
+        self.results = {}
+        self.timings = {}
+        self.active = {}
+        self.started = {}
+        self.timers = {}
+        self.requests = {}
+        self.running = False
+
+        self.request_signal.connect(serial_manager.execute)
+        serial_manager.step_response.connect(self.response)
+
+    def start(self, report=None, context=None, keep=()):
+        """Runs the steps, writing results to the report. Steps named in
+        keep that already have a result aren't run again."""
+        kept = {name: self.results[name] for name in keep
+                if name in self.results}
+        self.stop()
+        self.report = report
+        self.context = context or {}
+        self.results = kept
+        self.timings = {name: r.seconds for name, r in kept.items()}
+        self.started = {}
+        self.running = True
+        self.advance()
+
+    def stop(self):
+        self.running = False
+        for timer in self.timers.values():
+            timer.stop()
+            timer.deleteLater()
+        self.timers.clear()
+        self.active.clear()
+        self.requests.clear()
+
+    def advance(self):
+        """Starts every step that can run and emits finished once all of
+        them have a result."""
+        progressed = True
+        while progressed and self.running:
+            progressed = False
+            for step in self.steps.values():
+                if not self.running:
+                    return
+                if step.name in self.results or step.name in self.started:
+                    continue
+
+                deps = [self.results.get(name) for name in step.depends]
+                if None in deps:
+                    continue
+                if not all(dep.passed for dep in deps):
+                    self.results[step.name] = StepResult(False, skipped=True)
+                    progressed = True
+                    continue
+                if step.when and not self.conditions[step.when](self.results):
+                    self.results[step.name] = StepResult(True, skipped=True)
+                    self.step_skipped.emit(step.name)
+                    progressed = True
+                    continue
+                if step.resource is not None and step.resource in self.active:
+                    continue
+
+                self.begin(step)
+                progressed = True
+
+        if (self.running and not self.active and
+                len(self.results) == len(self.steps)):
+            self.running = False
+            self.finished.emit(all(r.passed for r in self.results.values()))
+
+    def begin(self, step: Step):
+        self.started[step.name] = time.monotonic()
+        if step.resource is not None:
+            self.active[step.resource] = step.name
+        self.step_started.emit(step.name)
+
+        if step.timeout:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda: self.timed_out(step.name))
+            timer.start(int(step.timeout * 1000))
+            self.timers[step.name] = timer
+
+        if step.resource == "serial":
+            request = next(_request_numbers)
+            self.requests[request] = step.name
+            self.request_signal.emit(
+                request, step.slot,
+                (step.command or "").format(**self.context))
+        elif step.name in self.actions:
+            self.actions[step.name]()
+
+    def is_active(self, name) -> bool:
+        return (self.running and name in self.started and
+                name not in self.results)
+
+    def response(self, request: int, ok: bool, data: str):
+        """Evaluates a serial response for the step that requested it."""
+        name = self.requests.pop(request, None)
+        if name is None or not self.is_active(name):
+            return
+        if not ok:
+            self.finish(name, False)
+            return
+
+        step = self.steps[name]
+        value = None
+        passed = True
+        if step.pattern:
+            # Context values are matched literally.
+            match = re.search(step.pattern.format(
+                **{k: re.escape(str(v)) for k, v in self.context.items()}),
+                data)
+            if match:
+                value = match.group(1) if match.groups() else match.group()
+            else:
+                passed = not step.required
+
+        if passed and step.limit:
+            try:
+                value = float(value)
+                passed = self.model.compare_to_limit(step.limit, value)
+            except (TypeError, ValueError):
+                passed = False
+        self.finish(name, passed, value, data)
+
+    def timed_out(self, name):
+        if self.is_active(name):
+            self.finish(name, False)
+
+    def complete(self, name, passed: bool, value=None):
+        """Finishes a step that isn't run over the serial port."""
+        if self.is_active(name):
+            self.finish(name, passed, value)
+
+    def finish(self, name, passed, value=None, data=""):
+        step = self.steps[name]
+        seconds = time.monotonic() - self.started[name]
+        self.results[name] = StepResult(passed, value, data, seconds)
+        self.timings[name] = seconds
+        if self.active.get(step.resource) == name:
+            del self.active[step.resource]
+        timer = self.timers.pop(name, None)
+        if timer:
+            timer.stop()
+            timer.deleteLater()
+
+        if step.report and self.report:
+            self.report.write_data(step.report,
+                                   "" if value is None else value,
+                                   "PASS" if passed else "FAIL")
+        self.step_finished.emit(name, passed, value)
+        self.advance()
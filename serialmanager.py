@@ -1,10 +1,107 @@
 import time
+import json
 import serial
 import re
 import serial.tools.list_ports
+import capture
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
 
+# Short read timeout used when polling the fixture for a board.
+PROBE_TIMEOUT = 0.2
+# Queries whose responses don't change until the board is reprogrammed or
+# reset, so they are answered from the cache within a session.
+STATIC_QUERIES = ("version", "1-wire-test", "tac-get-info")
+# Commands that reset or reprogram the board, clearing the cache.
+RESET_COMMANDS = ("watchdog", "reprogram-1-wire-master")
+# Commands whose responses report the board's firmware version.
+VERSION_COMMANDS = ("version", "watchdog")
+VERSION_PATTERN = r"[0-9]+\.[0-9]+[a-z]"
+# Delays in seconds, tuned per station by tune_serial.py and loaded from
+# its timing profile. The defaults suit any board and adapter.
+TIMING_DEFAULTS = {
+    "char_delay": 0.05,       # after each character, for its echo
+    "command_delay": 0.1,     # after the CRLF that ends a command
+    "key_delay": 0.5,         # before the key that continues 1-wire-test
+    "dot_delay": 0.3,         # before the "." that ends 1-wire-test
+    "serial_delay": 0.3,      # before reading the serial number's echo
+    "flush_delay": 0.5,       # before draining the buffers
+    "reprogram_wait": 5.0,    # for the 1-wire master to erase its flash
+    "hex_line_delay": 0.06,   # after each hex record
+    "upload_wait": 3.0,       # for the 1-wire master to finish programming
+}
+# The bootloader needs at least 50 ms between records, whatever the tuning.
+TIMING_MINIMUMS = {"hex_line_delay": 0.05}
+# Initial size of the receive buffer. It grows to fit longer frames.
+RX_BUFFER_SIZE = 4096
+# Slots a test sequence step may run.
+SEQUENCE_SLOTS = ("send_command", "one_wire_test", "reprogram_one_wire",
+                  "write_hex_file")
+
+
+class ReceiveBuffer:
+    """Preallocated receive buffer. Bytes are read from the port straight
+    into it, and frames are handed out as memoryview slices, so nothing is
+    copied until a consumer decodes a frame. A frame is only valid until
+    the next read.
+
+    Instance methods:
+    fill   --  Reads bytes from the port into the buffer.
+    find   --  Finds a delimiter in the buffered bytes.
+    take   --  Removes bytes from the front of the buffer.
+    clear  --  Drops the buffered bytes.
+    """
+
+    def __init__(self, size=RX_BUFFER_SIZE):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def reserve(self, size: int) -> memoryview:
+        """Returns space for size bytes after the buffered ones, moving them
+        to the front, or to a larger buffer, when the end is reached."""
+        if self.tail + size > len(self.buffer):
+            length = len(self)
+            if length + size > len(self.buffer):
+                buffer = bytearray(max(2 * len(self.buffer), length + size))
+                buffer[:length] = self.view[self.head:self.tail]
+                self.buffer = buffer
+                self.view = memoryview(buffer)
+            else:
+                self.view[:length] = self.view[self.head:self.tail]
+            self.head = 0
+            self.tail = length
+        return self.view[self.tail:self.tail + size]
+
+    def fill(self, ser, size: int) -> memoryview:
+        """Reads up to size bytes from the port and returns them."""
+        space = self.reserve(size)
+        start = self.tail
+        self.tail += ser.readinto(space)
+        return self.view[start:self.tail]
+
+    def find(self, delimiter: bytes, start=0) -> int:
+        """Returns the position of the delimiter, counted from the first
+        buffered byte and searched for from start, or -1."""
+        i = self.buffer.find(delimiter, self.head + start, self.tail)
+        return i - self.head if i >= 0 else -1
+
+    def take(self, size: int) -> memoryview:
+        """Removes and returns the first size bytes."""
+        frame = self.view[self.head:self.head + size]
+        self.head += len(frame)
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        return frame
+
+    def clear(self):
+        self.head = self.tail = 0
+
+
 class SerialManager(QObject):
     """Class that handles the serial connection."""
     data_ready = pyqtSignal(str)
@@ -19,6 +116,11 @@ class SerialManager(QObject):
     serial_error_signal = pyqtSignal()
     file_not_found_signal = pyqtSignal(str)
     generic_error_signal = pyqtSignal(str)
+    link_status_signal = pyqtSignal(bool)
+    dut_detected = pyqtSignal(str)
+    dut_removed = pyqtSignal()
+    step_response = pyqtSignal(int, bool, str)
+    timing_mismatch_signal = pyqtSignal(str, str)
 
     def __init__(self):
         super().__init__()
@@ -26,92 +128,377 @@ class SerialManager(QObject):
                                  parity=serial.PARITY_NONE, rtscts=False,
                                  xonxoff=False, dsrdtr=False)
         self.end = b"\r\n>"
+        self.capture_dir = None
+        self.capture = None
+        # Session state: the buffers only need flushing when the last
+        # response didn't end cleanly at the prompt.
+        self.in_sync = False
+        self.link_errors = 0
+        self.dut_present = False
+        # Static query : response, for the board in the fixture.
+        self.cache = {}
+        self.timing = dict(TIMING_DEFAULTS)
+        # The loaded timing profile's delays and the firmware it was tuned
+        # against.
+        self.profile_timing = None
+        self.profile_firmware = None
+        # The firmware version the delays were last chosen for.
+        self.timing_version = None
+        self.rx = ReceiveBuffer()
 
+    @staticmethod
     def scan_ports():
         """Scan and return list of connected comm ports."""
         return serial.tools.list_ports.comports()
 
+    def set_capture_dir(self, capture_dir):
+        """Sets the directory for the raw serial capture files."""
+        self.capture_dir = capture_dir
+
+    def new_session(self, serial_num: str):
+        """Starts a session for a new DUT. The port stays open, but the
+        buffers are resynced before the next command and the raw capture is
+        marked with the serial number."""
+        self.in_sync = False
+        self.cache.clear()
+        if self.capture:
+            self.capture.mark(serial_num)
+
+    def load_timing(self, path) -> bool:
+        """Loads the delays from a timing profile. Delays the profile
+        doesn't set, or sets to nonsense, keep their defaults. Returns False
+        if the profile can't be read.
+
+        The delays only hold for the firmware the profile was tuned
+        against, so if the profile names one they're only used once a board
+        reports that version, see match_timing."""
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            delays = dict(profile["delays"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        for key, default in TIMING_DEFAULTS.items():
+            try:
+                value = float(delays.get(key, default))
+            except (TypeError, ValueError):
+                continue
+            if value >= 0:
+                self.timing[key] = max(value, TIMING_MINIMUMS.get(key, 0))
+        self.profile_timing = dict(self.timing)
+        self.profile_firmware = profile.get("firmware")
+        self.timing_version = None
+        if self.profile_firmware:
+            self.timing.update(TIMING_DEFAULTS)
+        return True
+
+    def match_timing(self, version: str) -> bool:
+        """Uses the profile's delays if it was tuned against the board's
+        firmware version, and the defaults otherwise. Called with every
+        version the board reports. Emits timing_mismatch_signal with the
+        profile's and the board's versions when a new version gets the
+        defaults. Returns False if it did."""
+        if self.profile_timing is None:
+            return True
+        matches = not self.profile_firmware or version == self.profile_firmware
+        if version != self.timing_version:
+            self.timing_version = version
+            self.timing.update(self.profile_timing if matches
+                               else TIMING_DEFAULTS)
+            if not matches:
+                self.timing_mismatch_signal.emit(self.profile_firmware,
+                                                 version)
+        return matches
+
+    @pyqtSlot()
+    def firmware_changed(self):
+        """Goes back to the default delays after the board is reflashed,
+        until it reports its new version."""
+        if self.profile_timing is not None and self.profile_firmware:
+            self.timing_version = None
+            self.timing.update(TIMING_DEFAULTS)
+
+    @pyqtSlot()
+    def clear_cache(self):
+        """Forgets the board's static responses, e.g. after it has been
+        reflashed."""
+        self.cache.clear()
+
+    def emit_response(self, frame, query=None):
+        """Emits a response on data_ready. The frame is only decoded if
+        something is connected or the response is cached."""
+        cached = query in STATIC_QUERIES and self.in_sync
+        version = query in VERSION_COMMANDS
+        if not cached and not version and not self.receivers(self.data_ready):
+            return
+        data = str(frame, "utf-8")
+        if version:
+            match = re.search(VERSION_PATTERN, data)
+            if match:
+                self.match_timing(match.group())
+        self.cache_response(query, data)
+        self.data_ready.emit(data)
+
+    def cache_response(self, query: str, response: str):
+        """Caches a static query's response if it ended cleanly at the
+        prompt."""
+        if query in STATIC_QUERIES and self.in_sync:
+            self.cache[query] = response
+
+    def is_healthy(self) -> bool:
+        """Returns True if the port is open and the last exchange ended
+        cleanly at the prompt."""
+        return self.ser.is_open and self.in_sync and not self.link_errors
+
+    def sync(self):
+        """Flushes the buffers only if the session is out of sync."""
+        if not self.in_sync:
+            self.flush_buffers()
+
+    def link_error(self):
+        """Records a failed exchange so the next command resyncs."""
+        self.in_sync = False
+        self.link_errors += 1
+        if self.link_errors == 1:
+            self.link_status_signal.emit(False)
+
+    def write(self, data: bytes):
+        """Writes to the port and records the bytes in the capture. The
+        session is out of sync until the response is read up to the prompt."""
+        self.in_sync = False
+        self.ser.write(data)
+        if self.capture:
+            self.capture.tx(data)
+
+    def receive(self, size: int) -> int:
+        """Reads up to size bytes into the receive buffer and records them
+        in the capture. Returns the number of bytes read."""
+        data = self.rx.fill(self.ser, size)
+        if self.capture:
+            self.capture.rx(data)
+        return len(data)
+
+    def read_available(self) -> memoryview:
+        """Returns the buffered bytes and those waiting on the port."""
+        self.receive(self.ser.in_waiting)
+        return self.rx.take(len(self.rx))
+
+    def drain(self):
+        """Discards the bytes received, e.g. the echoes of a command."""
+        self.read_available()
+
+    def receive_until(self, expected: bytes) -> memoryview:
+        """Returns the frame up to and including the expected bytes, or what
+        arrived before the port's timeout."""
+        timeout = self.ser.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = 0
+        while True:
+            i = self.rx.find(expected, start)
+            if i >= 0:
+                return self.rx.take(i + len(expected))
+            start = max(len(self.rx) - len(expected) + 1, 0)
+            waiting = self.ser.in_waiting
+            if waiting:
+                self.receive(waiting)
+                continue
+            # Blocks until the next byte arrives or the port times out.
+            if ((deadline is not None and time.monotonic() >= deadline) or
+                    not self.receive(1)):
+                return self.rx.take(len(self.rx))
+
+    def read_until(self, expected: bytes) -> memoryview:
+        """Returns the frame up to and including the expected bytes and
+        tracks whether the session is in sync."""
+        data = self.receive_until(expected)
+
+        # A read that stops short of the prompt timed out.
+        if data[-len(self.end):] == self.end:
+            self.in_sync = True
+            if self.link_errors:
+                self.link_errors = 0
+                self.link_status_signal.emit(True)
+        else:
+            self.link_error()
+        return data
+
     def rs485_write_command(self, command: str):
         """Write a command by sending individual chars and wait for echo back,
            because its a RS485 interface: half-duplex with no control flow.
         """
         for c in command:
-            self.ser.write(c.encode())
+            self.write(c.encode())
             self.ser.flush()
-            time.sleep(0.05)
-            self.ser.read(self.ser.in_waiting)
+            time.sleep(self.timing["char_delay"])
+            self.drain()
 
-        self.ser.write(b"\r\n")
+        self.write(b"\r\n")
         self.ser.flush()
-        time.sleep(0.1)
+        time.sleep(self.timing["command_delay"])
 
     @pyqtSlot(str)
     def send_command(self, command):
         """Checks connection to the serial port and sends a command."""
         if self.ser.is_open:
+            if command in self.cache:
+                self.data_ready.emit(self.cache[command])
+                return
+            if command in RESET_COMMANDS:
+                self.cache.clear()
+
             try:
-                self.flush_buffers()
+                self.sync()
 
                 self.rs485_write_command(command)
 
                 try:
-                    response = self.ser.read_until(self.end).decode()
-                    self.data_ready.emit(response)
+                    self.emit_response(self.read_until(self.end), command)
                 except UnicodeDecodeError:
+                    self.link_error()
                     self.serial_error_signal.emit()
                     return
 
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.no_port_sel.emit()
         else:
             self.no_port_sel.emit()
 
+    @pyqtSlot(int, str, str)
+    def execute(self, request: int, slot: str, arg: str):
+        """Runs a test sequence step's slot and answers with its response,
+        tagged with the request number so it reaches the step that asked.
+        A slot that reports an error instead of data fails the step."""
+        if slot not in SEQUENCE_SLOTS:
+            self.step_response.emit(request, False, "")
+            return
+
+        responses = []
+
+        def collect(data):
+            responses.append(data)
+
+        self.data_ready.connect(collect)
+        try:
+            if arg:
+                getattr(self, slot)(arg)
+            else:
+                getattr(self, slot)()
+        finally:
+            self.data_ready.disconnect(collect)
+
+        if responses:
+            self.step_response.emit(request, True, responses[-1])
+        else:
+            self.step_response.emit(request, False, "")
+
+    def query_version(self):
+        """Queries the board's firmware version. Returns None if the response
+        doesn't contain a version."""
+        response = self.cache.get("version")
+        if response is None:
+            self.sync()
+            self.rs485_write_command("version")
+            response = str(self.read_until(self.end), "utf-8")
+            self.cache_response("version", response)
+        match = re.search(VERSION_PATTERN, response)
+        if not match:
+            return None
+        self.match_timing(match.group())
+        return match.group()
+
     @pyqtSlot()
     def version_check(self):
-        command = "version"
-        p = r"[0-9]+\.[0-9]+[a-z]"
         if self.ser.is_open:
             try:
-                self.flush_buffers()
-
-                self.rs485_write_command(command)
-
                 try:
-                    response = self.ser.read_until(self.end).decode()
+                    version = self.query_version()
                 except UnicodeDecodeError:
+                    self.link_error()
                     self.serial_error_signal.emit()
                     return
 
                 # Ensure version matches format, otherwise emit error signal.
-                if re.search(p, response):
-                    self.version_signal.emit(re.search(p, response).group())
+                if version:
+                    self.version_signal.emit(version)
                     return
                 else:
                     self.no_version.emit()
                     return
 
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.port_unavailable_signal.emit()
             except Exception as e:
                 self.generic_error_signal.emit()
         else:
             self.no_port_sel.emit()
 
+    def probe_prompt(self) -> bool:
+        """Sends an empty line with a short timeout and returns True if a
+        board answers with the prompt."""
+        timeout = self.ser.timeout
+        self.ser.timeout = PROBE_TIMEOUT
+        try:
+            self.write(b"\r\n")
+            data = self.receive_until(self.end)
+        finally:
+            self.ser.timeout = timeout
+
+        self.in_sync = data[-len(self.end):] == self.end
+        return self.in_sync
+
+    @pyqtSlot()
+    def poll_dut(self):
+        """Polls the fixture for a board. Emits the board's firmware version
+        when a newly powered board answers, and a removal signal when it
+        stops answering."""
+        if not self.ser.is_open:
+            return
+
+        try:
+            present = self.probe_prompt()
+            if present != self.dut_present:
+                # A different board may be in the fixture now.
+                self.cache.clear()
+            if present and not self.dut_present:
+                self.dut_present = True
+                try:
+                    version = self.query_version()
+                except UnicodeDecodeError:
+                    version = None
+                self.dut_detected.emit(version or "")
+            elif not present and self.dut_present:
+                self.dut_present = False
+                self.dut_removed.emit()
+        except serial.serialutil.SerialException:
+            # A vanished adapter is reported by the status bar only, so the
+            # poll doesn't raise a warning every interval.
+            self.link_error()
+            if self.dut_present:
+                self.dut_present = False
+                self.dut_removed.emit()
+
     @pyqtSlot()
     def one_wire_test(self):
         """Sends command for one wire test and evaluates the result."""
         if self.ser.is_open:
+            if "1-wire-test" in self.cache:
+                self.data_ready.emit(self.cache["1-wire-test"])
+                return
+
             try:
-                self.flush_buffers()
+                self.sync()
 
                 self.rs485_write_command("1-wire-test")
-                time.sleep(0.5)
-                self.ser.write(" ".encode())
-                time.sleep(0.3)
-                self.ser.write(".".encode())
-                data = self.ser.read_until(self.end).decode()
-                self.data_ready.emit(data)
+                time.sleep(self.timing["key_delay"])
+                self.write(" ".encode())
+                time.sleep(self.timing["dot_delay"])
+                self.write(".".encode())
+                self.emit_response(self.read_until(self.end), "1-wire-test")
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.no_port_sel.emit()
         else:
             self.no_port_sel.emit()
@@ -120,14 +507,14 @@ class SerialManager(QObject):
     def reprogram_one_wire(self):
         """Sends command to reprogram one wire master."""
         if self.ser.is_open:
+            self.cache.clear()
             try:
                 self.rs485_write_command("reprogram-1-wire-master")
                 # Wait for serial buffer to fill
-                time.sleep(5)
-                num_bytes = self.ser.in_waiting
-                data = self.ser.read(num_bytes).decode()
-                self.data_ready.emit(data)
+                time.sleep(self.timing["reprogram_wait"])
+                self.emit_response(self.read_available())
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.no_port_sel.emit()
         else:
             self.no_port_sel.emit()
@@ -137,22 +524,23 @@ class SerialManager(QObject):
         """Writes hex file line-by-line with appropriate delay between
         each name."""
         if self.ser.is_open:
+            self.cache.clear()
             try:
                 with open(file_path, "rb") as f:
                     for line in f:
-                        self.ser.write(line)
+                        self.write(line)
                         self.line_written.emit()
                         # minimum of 50 ms delay required after each line
-                        time.sleep(0.060)
+                        time.sleep(self.timing["hex_line_delay"])
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.no_port_sel.emit()
             except FileNotFoundError:
                 self.file_not_found_signal.emit("1-wire-master")
 
 
-            time.sleep(3)
-            data = self.ser.read_until(self.end).decode()
-            self.data_ready.emit(data)
+            time.sleep(self.timing["upload_wait"])
+            self.emit_response(self.read_until(self.end))
         else:
             self.no_port_sel.emit()
 
@@ -161,23 +549,24 @@ class SerialManager(QObject):
         """Sets the serial port."""
         if self.ser.is_open:
             try:
-                self.flush_buffers
+                self.sync()
                 s = serial_num + "\r\n"
-                self.ser.write(s.encode())
-                time.sleep(0.3)
-                data = self.ser.read_until(self.end).decode()
+                self.write(s.encode())
+                time.sleep(self.timing["serial_delay"])
+                data = str(self.read_until(self.end), "utf-8")
                 # Try to get serial number twice
                 if serial_num not in data:
-                    self.flush_buffers
-                    self.ser.write(s.encode())
-                    time.sleep(0.3)
-                    data = self.ser.read_until(self.end).decode()
+                    self.sync()
+                    self.write(s.encode())
+                    time.sleep(self.timing["serial_delay"])
+                    data = str(self.read_until(self.end), "utf-8")
                     if serial_num not in data:
                         self.serial_test_failed.emit(data)
                         return
                 self.serial_test_succeeded.emit(serial_num)
 
             except serial.serialutil.SerialException:
+                self.link_error()
                 self.no_port_sel.emit()
 
     @pyqtSlot(int)
@@ -187,33 +576,71 @@ class SerialManager(QObject):
         self.sleep_finished.emit()
 
     def is_connected(self, port):
-        """Checks for serial connection."""
+        """Checks for serial connection. A healthy session on the port is
+        trusted without probing the board again."""
+        if self.ser.port != port or not self.ser.is_open:
+            return False
+        if self.is_healthy():
+            return True
+
         try:
-            self.ser.write(b"\r\n")
-            time.sleep(0.1)
-            self.ser.read(self.ser.in_waiting)
+            self.write(b"\r\n")
+            time.sleep(self.timing["command_delay"])
+            self.drain()
         except serial.serialutil.SerialException:
             return False
 
         return self.ser.port == port and self.ser.is_open
 
     def open_port(self, port: str) -> bool:
-        """Opens serial port and checks that board is available."""
+        """Opens serial port and checks that board is available. An already
+        open session on the same port is kept."""
+        if self.ser.is_open and self.ser.port == port:
+            return
+
         try:
             self.ser.close()
+            self.in_sync = False
+            self.rx.clear()
             self.ser.port = port
             self.ser.open()
 
         except serial.serialutil.SerialException:
             self.port_unavailable_signal.emit()
+            return
+
+        self.cache.clear()
+        self.open_capture(port)
+
+    def open_capture(self, port: str):
+        """Starts the raw capture for the port. Capture problems never stop
+        a test, so any file error just leaves the capture disabled."""
+        if self.capture:
+            self.capture.close()
+            self.capture = None
+
+        if not self.capture_dir:
+            return
+
+        try:
+            self.capture = capture.SerialCapture(self.capture_dir, port)
+        except (OSError, ValueError, capture.CaptureError):
+            self.capture = None
 
     def flush_buffers(self):
         """Flushes the serial buffer by writing to the buffer and then reading
         all the available bytes."""
-        self.ser.write("\r\n".encode())
-        time.sleep(0.5)
-        self.ser.read(self.ser.in_waiting)
+        self.write("\r\n".encode())
+        time.sleep(self.timing["flush_delay"])
+        self.drain()
+        self.in_sync = True
 
     def close_port(self):
         """Closes serial port."""
         self.ser.close()
+        self.in_sync = False
+        self.rx.clear()
+        self.cache.clear()
+        if self.capture:
+            self.capture.close()
+            self.capture = None
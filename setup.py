@@ -10,6 +10,10 @@ from PyQt5.QtCore import pyqtSignal
 class Setup(QWizardPage):
     """First QWizard Page with initial input values."""
 
+    # The serial port is idle on this page, so the fixture can be polled.
+    watch_fixture = True
+    phase = "setup"
+
     command_signal = pyqtSignal(str)
     complete_signal = pyqtSignal()
 
@@ -62,12 +66,25 @@ class Setup(QWizardPage):
         self.step_e_input.setFixedWidth(LINE_EDIT_WIDTH)
         self.step_e_unit = QLabel("V")
 
+        # Limit key : measurement input
+        self.measurement_inputs = {
+            "input_i": self.step_b_input,
+            "5v_supply": self.step_c_input,
+            "2p5v": self.step_d_input,
+            "1p8v": self.step_e_input,
+        }
+
+        self.measure_button = QPushButton("Measure")
+        self.measure_button.clicked.connect(self.measure)
+        self.measure_button.setFixedWidth(LINE_EDIT_WIDTH)
+
         self.submit_button = QPushButton("Submit")
         self.submit_button.clicked.connect(self.parse_values)
         self.submit_button.setFixedWidth(LINE_EDIT_WIDTH)
 
         self.btn_layout = QHBoxLayout()
         self.btn_layout.addStretch()
+        self.btn_layout.addWidget(self.measure_button)
         self.btn_layout.addWidget(self.submit_button)
         self.btn_layout.addSpacing(RIGHT_SPACING + 5)
 
@@ -125,14 +142,75 @@ class Setup(QWizardPage):
         self.layout.addLayout(self.btn_layout)
         self.layout.addStretch()
 
+        self.complete_signal.connect(self.completeChanged)
+
         self.setLayout(self.layout)
         self.setTitle("Setup")
 
+    def reset(self):
+        """Clears the previous board's steps."""
+        self.threadlink.unchecked(self.step_a_lbl, self.step_a_chkbx)
+        for measurement_input in self.measurement_inputs.values():
+            measurement_input.clear()
+        self.submit_button.setEnabled(True)
+
     def initializePage(self):
         # Flag for tracking page completion and allowing the next button
         # to be re-enabled.
         self.is_complete = False
-        self.complete_signal.connect(self.completeChanged)
+        self.measure_button.setEnabled(self.tu.bench_available())
+
+    def dut_detected(self, version):
+        """Ticks the power-on step when the board answers on the fixture."""
+        if not self.step_a_chkbx.isChecked():
+            self.step_a_chkbx.setChecked(True)
+            self.threadlink.checked(self.step_a_lbl, self.step_a_chkbx)
+            if self.measure_button.isEnabled():
+                self.measure()
+
+    def measure(self):
+        """Takes the measurements on the bench instruments."""
+        self.measure_button.setEnabled(False)
+        self.tu.start_measurement()
+
+    def measurements_ready(self, values):
+        """Fills the measurement inputs with the bench readings and submits
+        them. An empty dictionary means the measurement failed."""
+        self.measure_button.setEnabled(self.tu.bench_available())
+        if not values or not self.submit_button.isEnabled():
+            return
+
+        for key, value in values.items():
+            self.measurement_inputs[key].setText(f"{value:.4g}")
+        self.parse_values()
+
+    def measurement_received(self, value, unit):
+        """Fills the focused, or else the first empty, measurement input
+        with a meter reading and submits once all four are filled."""
+        if not self.submit_button.isEnabled():
+            return
+
+        empty = [i for i in self.measurement_inputs.values() if not i.text()]
+        if not empty:
+            return
+        focused = [i for i in empty if i.hasFocus()]
+        target = focused[0] if focused else empty[0]
+
+        # Scale from the meter's unit to the input's unit.
+        if target is self.step_b_input:
+            scale = {None: 1.0, "mA": 1.0, "A": 1000.0}
+        else:
+            scale = {None: 1.0, "V": 1.0, "mV": 0.001}
+        if unit not in scale:
+            QMessageBox.warning(self, "Warning", f"Unexpected unit: {unit}")
+            return
+
+        target.setText(f"{value * scale[unit]:g}")
+        empty.remove(target)
+        if empty:
+            empty[0].setFocus()
+        else:
+            self.parse_values()
 
     def parse_values(self):
         """Parse the input values and check their validity."""
@@ -148,6 +226,7 @@ class Setup(QWizardPage):
             return
 
         self.submit_button.setEnabled(False)
+        self.measure_button.setEnabled(False)
         for limit, value in zip(limits, values):
             if(self.model.compare_to_limit(limit, value)):
                 self.report.write_data(limit, value, "PASS")
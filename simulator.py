@@ -0,0 +1,210 @@
+import time
+import bisect
+
+PROMPT = b"\r\n>"
+HEX_EOF = b":00000001FF"
+
+
+class BoardSimulator:
+    """Stands in for the serial port of a Threadlink board on the fixture.
+    Echoes what is written like the RS485 bridge does and answers each
+    command line with its response and the prompt, so whole test
+    procedures can run without hardware.
+
+    Instance variables:
+    app_version       --  Firmware version reported by the board.
+    one_wire_version  --  1-wire master version reported by the board.
+    tac_ids           --  The five IDs reported by tac-get-info.
+    internal_5v       --  Internal 5V reading.
+    powered           --  False while no board is on the fixture.
+    latency           --  Seconds the board takes to answer anything. While
+                          it's answering, the half-duplex bus is busy and
+                          whatever is written collides and is lost.
+    erase_time        --  Extra seconds the 1-wire master takes to erase and
+                          to program its flash.
+
+    Instance methods:
+    insert_board  --  Resets the simulator for a new board.
+    """
+
+    def __init__(self, app_version="1.2a", one_wire_version="1.1a",
+                 tac_ids=("0a1b2c3d", "00000000", "00000000", "00000000",
+                          "12345678"),
+                 internal_5v=5.01, port="SIM", latency=0.0, erase_time=0.0):
+        self.port = port
+        self.baudrate = 115200
+        self.timeout = 15
+        self.is_open = True
+        self.latency = latency
+        self.erase_time = erase_time
+        self.rx = bytearray()
+        self.line = bytearray()
+        # (time the bytes arrive, bytes) for answers still on their way.
+        self.pending = []
+        self.insert_board(app_version, one_wire_version, tac_ids,
+                          internal_5v)
+
+    def insert_board(self, app_version="1.2a", one_wire_version="1.1a",
+                     tac_ids=None, internal_5v=None):
+        self.app_version = app_version
+        self.one_wire_version = one_wire_version
+        if tac_ids is not None:
+            self.tac_ids = tuple(tac_ids)
+        if internal_5v is not None:
+            self.internal_5v = internal_5v
+        self.uploading = False
+        self.upload_corrupt = False
+        self.awaiting_key = False
+        self.powered = True
+        self.rx.clear()
+        self.line.clear()
+        self.pending = []
+
+    def respond(self, command: str) -> bytes:
+        """Returns the board's answer to a command line."""
+        if command == "":
+            return PROMPT
+        if command == "version":
+            return (f"\r\nversion\r\nfirmware version "
+                    f"\"RS485 BRIDGE MAIN APP {self.app_version}\""
+                    ).encode() + PROMPT
+        if command == "watchdog":
+            return (f"\r\nreset\r\nfirmware version "
+                    f"\"RS485 BRIDGE MAIN APP {self.app_version}\""
+                    ).encode() + PROMPT
+        if command == "5v":
+            return f"\r\ninternal 5v: {self.internal_5v:.2f} V".encode() + \
+                PROMPT
+        if command == "tac-get-info":
+            return ("\r\n" + " ".join(self.tac_ids)).encode() + PROMPT
+        if command == "1-wire-test":
+            # The test pauses until a key is pressed, ending with ".".
+            self.awaiting_key = True
+            return (f"\r\n1-wire master version {self.one_wire_version}"
+                    ).encode()
+        if command == "reprogram-1-wire-master":
+            self.uploading = True
+            self.upload_corrupt = False
+            ready = b"\r\ndownload hex records now...\r\n"
+            if not self.erase_time:
+                return b"\r\nerasing flash" + ready
+            self.reply(ready, self.erase_time)
+            return b"\r\nerasing flash"
+        return b"\r\nunknown command" + PROMPT
+
+    def upload(self, record: bytes):
+        """Takes one hex record of a 1-wire master upload."""
+        if record.strip() == HEX_EOF:
+            self.uploading = False
+            if self.upload_corrupt:
+                self.reply(b"\r\nchecksum error" + PROMPT)
+            else:
+                self.reply(b"\r\nprogramming complete\r\nlock bits set" +
+                           PROMPT, self.erase_time)
+        else:
+            # Busy writing the record to flash.
+            self.reply(b"")
+
+    def reply(self, data: bytes, extra=0.0):
+        """Queues bytes sent by the board, after its latency."""
+        delay = self.latency + extra
+        if delay:
+            bisect.insort(self.pending, (time.monotonic() + delay, bytes(data)))
+        else:
+            self.rx += data
+
+    def busy(self) -> bool:
+        """True while the board is still sending an answer."""
+        return bool(self.pending) and \
+            self.pending[-1][0] > time.monotonic()
+
+    def settle(self):
+        """Moves the answers that have arrived into the receive buffer."""
+        now = time.monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            self.rx += self.pending.pop(0)[1]
+
+    # pyserial interface used by SerialManager.
+
+    @property
+    def in_waiting(self):
+        self.settle()
+        return len(self.rx)
+
+    def write(self, data):
+        if not self.powered:
+            return len(data)
+        if self.busy():
+            # Collision on the half-duplex bus.
+            if self.uploading:
+                self.upload_corrupt = True
+            return len(data)
+        if self.uploading:
+            for record in bytes(data).splitlines():
+                self.upload(record)
+            return len(data)
+
+        if self.awaiting_key:
+            self.awaiting_key = b"." not in data
+            self.reply(data if self.awaiting_key else data + PROMPT)
+            return len(data)
+
+        self.reply(data)
+
+        self.line += data
+        while b"\r\n" in self.line:
+            line, _, rest = bytes(self.line).partition(b"\r\n")
+            self.line = bytearray(rest)
+            self.reply(self.respond(line.decode(errors="replace").strip()))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        self.settle()
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def readinto(self, buffer):
+        """Reads into the buffer, waiting up to the timeout for an answer on
+        its way if nothing has arrived yet."""
+        deadline = time.monotonic() + self.timeout
+        self.settle()
+        while not self.rx and self.pending and time.monotonic() < deadline:
+            time.sleep(max(min(self.pending[0][0], deadline) -
+                           time.monotonic(), 0))
+            self.settle()
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def read_until(self, expected=b"\n"):
+        """Waits for the expected bytes while an answer is on its way, up to
+        the timeout."""
+        deadline = time.monotonic() + self.timeout
+        self.settle()
+        while expected not in self.rx and self.pending:
+            wait = min(self.pending[0][0], deadline) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.settle()
+            if time.monotonic() >= deadline:
+                break
+        i = self.rx.find(expected)
+        size = len(self.rx) if i < 0 else i + len(expected)
+        return self.read(size)
+
+    def reset_input_buffer(self):
+        self.rx.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
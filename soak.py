@@ -0,0 +1,290 @@
+import gc
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+from pathlib import Path
+
+# Samples taken before the leak check starts; caches, fonts and the first
+# procedure are created during the first boards.
+WARMUP = 20
+# Allowed growth over the checked boards, per metric. Counts that only a
+# leak changes must stay flat; memory and objects get some slack for the
+# allocator and interpreter caches.
+TOLERANCE = {
+    "rss_kb": 4096,
+    "objects": 2000,
+    "widgets": 0,
+    "qthreads": 0,
+    "receivers": 0,
+}
+# Seconds to wait for a page to finish before giving up on a board.
+PAGE_TIMEOUT = 30
+
+SETUP_VALUES = {"input_i": "5.0", "5v_supply": "0.87", "2p5v": "2.5",
+                "1p8v": "1.8"}
+
+
+def rss_kb():
+    """Returns the resident set size in kB, or None where it can't be
+    read."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss // 1024
+
+
+def receiver_count(objects) -> int:
+    """Returns the total number of connections to the objects' signals."""
+    from PyQt5.QtCore import QMetaMethod
+    total = 0
+    for obj in objects:
+        meta = obj.metaObject()
+        for i in range(meta.methodCount()):
+            method = meta.method(i)
+            if method.methodType() != QMetaMethod.Signal:
+                continue
+            signal = getattr(obj, bytes(method.name()).decode(), None)
+            try:
+                total += obj.receivers(signal)
+            except TypeError:
+                continue
+    return total
+
+
+def leaks(samples: list, warmup=WARMUP, tolerance=TOLERANCE) -> list:
+    """Returns a message for each metric that kept growing after the warmup:
+    one that ends above its post-warmup level by more than its tolerance
+    and never drops back to it."""
+    checked = samples[warmup:]
+    if len(checked) < 2:
+        return []
+
+    found = []
+    for metric, allowed in tolerance.items():
+        values = [s[metric] for s in checked if s.get(metric) is not None]
+        if len(values) < 2:
+            continue
+        growth = values[-1] - values[0]
+        if growth > allowed and min(values[len(values) // 2:]) > values[0]:
+            found.append(f"{metric} grew by {growth} over {len(values)} "
+                         f"boards ({values[0]} -> {values[-1]})")
+    return found
+
+
+class SoakHarness:
+    """Drives simulated boards through the whole Threadlink procedure in a
+    headless window and samples resource use after each one.
+
+    Instance methods:
+    run_board  --  Tests one board from the start page to the final page.
+    sample     --  Measures the window's resource use.
+    """
+
+    def __init__(self, work_dir):
+        from PyQt5.QtCore import QSettings
+        from PyQt5.QtWidgets import QApplication, QMessageBox
+        import serialmanager
+        import simulator
+        import views
+
+        self.work_dir = Path(work_dir)
+        self.errors = []
+
+        # Keep the harness's settings away from the real ones.
+        QSettings.setDefaultFormat(QSettings.IniFormat)
+        QSettings.setPath(QSettings.IniFormat, QSettings.UserScope,
+                          str(self.work_dir.joinpath("settings")))
+
+        # Every message box means the procedure went off its normal path.
+        def message(parent, title, text, *args):
+            self.errors.append(f"{title}: {text}")
+            return QMessageBox.Yes
+
+        for name in ("warning", "information", "critical", "question"):
+            setattr(QMessageBox, name, staticmethod(message))
+
+        # The delays are for real hardware; the simulator answers at once.
+        serialmanager.time = types.SimpleNamespace(sleep=lambda s: None,
+                                                   monotonic=time.monotonic)
+
+        self.app = QApplication.instance() or QApplication([])
+        self.board = simulator.BoardSimulator(app_version="1.2a",
+                                              one_wire_version="1.1a")
+        self.configure(QSettings("BeadedStream", "Threadlink TestUtility"))
+
+        self.window = views.ThreadlinkUtility()
+        self.wait(lambda: self.window.sm is not None, "Startup")
+        self.window.sm.ser = self.board
+        self.serial_num = 0
+
+    def configure(self, settings):
+        """Points the settings at generated hex files, a fake atprogram and
+        directories inside the work directory."""
+        import hexfile
+
+        hex_dir = self.work_dir.joinpath("hex")
+        hex_dir.mkdir(parents=True, exist_ok=True)
+        # Each file in its own part of the flash, as the merge requires.
+        sections = {"boot-section.hex": 0x20000, "app-section.hex": 0x0000,
+                    "main-app-1.3a.hex": 0x1000,
+                    "1-wire-master-1.1b.hex": 0x0000}
+        for name, address in sections.items():
+            records = [hexfile.make_record(hexfile.EXT_LINEAR, 0,
+                                           (address >> 16).to_bytes(2, "big")),
+                       hexfile.make_record(hexfile.DATA, address & 0xFFFF,
+                                           bytes(range(16))),
+                       hexfile.EOF_RECORD]
+            hex_dir.joinpath(name).write_text("\r\n".join(records) + "\r\n")
+
+        if os.name == "nt":
+            atprogram = self.work_dir.joinpath("atprogram.bat")
+            atprogram.write_text("@echo Firmware check OK\r\n")
+        else:
+            atprogram = self.work_dir.joinpath("atprogram")
+            atprogram.write_text("#!/bin/sh\necho Firmware check OK\n")
+            atprogram.chmod(0o755)
+
+        values = {
+            "user_id": "SOAK",
+            "port1_tac_id": self.board.tac_ids[0],
+            "hex_files_path": str(hex_dir),
+            "atprogram_file_path": str(atprogram),
+            "instrument_backend": "None",
+            "auto_detect": False,
+            "show_dashboard": False,
+            # The default delays, not a profile tuned for some station.
+            "timing_profile_path": str(self.work_dir.joinpath("timing.json")),
+        }
+        for name in ("report_dir_path", "capture_dir_path", "spool_dir_path",
+                     "index_dir_path", "hex_cache_dir_path",
+                     "profile_dir_path"):
+            path = self.work_dir.joinpath(name)
+            path.mkdir(exist_ok=True)
+            values[name] = str(path)
+        for key, value in values.items():
+            settings.setValue(key, value)
+
+    def wait(self, done, what):
+        """Processes events until done() is true."""
+        deadline = time.monotonic() + PAGE_TIMEOUT
+        while not done():
+            if self.errors:
+                raise RuntimeError(f"{what}: {self.errors[-1]}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{what} didn't finish.")
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def run_board(self):
+        w = self.window
+        self.serial_num += 1
+        self.board.insert_board(app_version="1.2a", one_wire_version="1.1a")
+
+        w.tester_id_input.setText("SOAK")
+        w.pcba_sn_input.setText(f"THL{self.serial_num % 10000:04d}")
+        w.parse_values()
+        procedure = w.procedure
+
+        setup = procedure.setup_page
+        for key, value in SETUP_VALUES.items():
+            setup.measurement_inputs[key].setText(value)
+        setup.parse_values()
+        procedure.next()
+
+        program = procedure.program_page
+        program.batch_chkbx.click()
+        self.wait(lambda: program.is_complete, "Programming")
+        procedure.next()
+
+        interfaces = procedure.interfaces_page
+        self.wait(interfaces.repeat_tests.isEnabled, "Interface tests")
+        interfaces.hall_effect_pass_btn.click()
+        interfaces.led_test_pass_btn.click()
+        procedure.next()
+
+        if procedure.currentPage() is not procedure.final_page:
+            raise RuntimeError("Procedure didn't reach the final page.")
+        procedure.finish()
+        self.app.processEvents()
+
+    def objects(self) -> list:
+        """The long-lived objects whose signal connections are counted."""
+        w = self.window
+        objects = [w, w.sm, w.bench_worker, w.report_writer]
+        for procedure in w.procedures.values():
+            objects.append(procedure)
+            objects.extend(procedure.pages)
+            objects.append(procedure.program_page.flash)
+        return objects
+
+    def sample(self) -> dict:
+        from PyQt5.QtCore import QThread
+        from PyQt5.QtWidgets import QApplication
+
+        self.app.processEvents()
+        gc.collect()
+        everything = gc.get_objects()
+        return {
+            "rss_kb": rss_kb(),
+            "objects": len(everything),
+            "widgets": len(QApplication.allWidgets()),
+            "qthreads": sum(1 for o in everything
+                            if isinstance(o, QThread) and o.isRunning()),
+            "receivers": receiver_count(self.objects()),
+        }
+
+    def close(self):
+        from PyQt5.QtWidgets import QMessageBox
+        QMessageBox.question = staticmethod(lambda *args: QMessageBox.Yes)
+        self.window.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Soak test the Threadlink procedure with simulated "
+                    "boards and check for leaks.")
+    parser.add_argument("-n", "--boards", type=int, default=300,
+                        help="Number of boards to test.")
+    parser.add_argument("-o", "--output", help="Write the samples as CSV.")
+    args = parser.parse_args(argv)
+
+    if sys.platform.startswith("linux") and "DISPLAY" not in os.environ:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        harness = SoakHarness(work_dir)
+        samples = []
+        try:
+            for i in range(args.boards):
+                harness.run_board()
+                samples.append(harness.sample())
+                if i % 50 == 0:
+                    print(f"{i + 1}: {samples[-1]}")
+        finally:
+            harness.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(",".join(TOLERANCE) + "\n")
+            for s in samples:
+                f.write(",".join(str(s[k]) for k in TOLERANCE) + "\n")
+
+    print(f"{len(samples)}: {samples[-1]}")
+    found = leaks(samples)
+    for leak in found:
+        print(f"LEAK: {leak}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
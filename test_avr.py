@@ -0,0 +1,70 @@
+import sys
+import avr
+
+PROGRESS = "import time; print('Erasing...', flush=True); " \
+           "print('Firmware check OK')"
+HANG = "import time; print('Attaching...', flush=True); time.sleep(30)"
+
+
+def make_flash(tmp_path):
+    flash = avr.FlashThreadlink()
+    flash.set_files(sys.executable, tmp_path, tmp_path)
+    return flash
+
+
+def test_output_streamed(tmp_path):
+    flash = make_flash(tmp_path)
+    lines = []
+    flash.command_progress.connect(lambda cmd, line: lines.append(line))
+
+    status = flash.run_command("chip_erase", [sys.executable, "-c", PROGRESS])
+    assert "Firmware check OK" in status
+    assert lines == ["Erasing...", "Firmware check OK"]
+    assert len(flash.timings.times["chip_erase"]) == 1
+
+
+def test_hung_command_killed_and_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(avr, "DEFAULT_DEADLINE", 0.5)
+    flash = make_flash(tmp_path)
+    flash.commands = {"chip_erase": [sys.executable, "-c", HANG]}
+    lines = []
+    failed = []
+    flash.command_progress.connect(lambda cmd, line: lines.append(line))
+    flash.command_failed.connect(failed.append)
+
+    flash.flash()
+    assert failed == ["chip_erase"]
+    assert lines == ["Attaching..."] * (avr.RETRIES + 1)
+
+
+def test_killed_program_erased_before_retry(tmp_path, monkeypatch):
+    monkeypatch.setattr(avr, "DEFAULT_DEADLINE", 0.5)
+    flash = make_flash(tmp_path)
+    # Hangs the first time it runs, then succeeds.
+    marker = tmp_path.joinpath("hung")
+    program = f"import os, time; p = {str(marker)!r}\n" \
+              f"if not os.path.exists(p): open(p, 'w'); time.sleep(30)\n" \
+              f"print('Firmware check OK')"
+    flash.commands = {"chip_erase": [sys.executable, "-c", PROGRESS],
+                      "prog_image": [sys.executable, "-c", program]}
+    run = []
+    flash.command_succeeded.connect(run.append)
+
+    flash.flash()
+    assert run == ["chip_erase", "prog_image"]
+    assert len(flash.timings.times["chip_erase"]) == 2
+
+
+def test_deadline_learned(tmp_path):
+    path = tmp_path.joinpath(avr.TIMINGS_FILE)
+    timings = avr.CommandTimings(path)
+    assert timings.deadline("prog_image") == avr.DEFAULT_DEADLINE
+
+    for seconds in (20, 22, 21):
+        timings.record("prog_image", seconds)
+    assert timings.deadline("prog_image") == 21 * avr.DEADLINE_FACTOR
+    timings.record("write_fuses", 0.5)
+    assert timings.deadline("write_fuses") == avr.MIN_DEADLINE
+
+    # The next run of the utility starts from the recorded times.
+    assert avr.CommandTimings(path).times == timings.times
@@ -0,0 +1,49 @@
+import time
+import dashboard
+
+
+def entry(t, result, failed=(), phases=None):
+    return {"time": t, "sn": "THL0001", "tester_id": "AB",
+            "result": result, "failed": list(failed),
+            "phases": phases or {"setup": 30.0, "program": 90.0}}
+
+
+def test_shift_stats():
+    stats = dashboard.ShiftStats()
+    stats.add(entry(0, "PASS"))
+    stats.add(entry(1800, "FAIL", ["2p5v"]))
+    stats.add(entry(3600, "FAIL", ["2p5v", "led_test"],
+                    {"setup": 60.0, "program": 90.0}))
+
+    assert stats.total == 3
+    assert round(stats.yield_percent(), 1) == 33.3
+    assert stats.boards_per_hour() == 2.0
+    assert stats.pareto() == [("2p5v", 2), ("led_test", 1)]
+    assert stats.phase_means() == {"setup": 40.0, "program": 90.0}
+
+
+def test_boards_per_hour_saved():
+    stats = dashboard.ShiftStats()
+    stats.add(entry(0, "PASS", phases={"setup": 30.0, "program": 900.0}))
+    stats.add(entry(900, "FAIL", ["2p5v"], {"setup": 30.0}))
+    assert stats.boards_per_hour_saved() == 0.0
+
+    failed = entry(1800, "FAIL", ["2p5v"], {"setup": 30.0})
+    failed["skipped"] = ["program"]
+    stats.add(failed)
+    # Two boards in half an hour, where running the program phase would
+    # have taken three quarters of an hour.
+    assert stats.boards_per_hour() == 4.0
+    assert round(stats.boards_per_hour_saved(), 2) == round(4 - 2 / 0.75, 2)
+
+
+def test_shift_index(tmp_path):
+    index = dashboard.ShiftIndex(tmp_path)
+    now = time.time()
+    index.append(entry(now - 10 * 3600, "PASS"))
+    index.append(entry(now - 60, "FAIL", ["led_test"]))
+
+    stats = dashboard.ShiftStats()
+    index.load_shift(stats)
+    assert stats.total == 1
+    assert stats.failures["led_test"] == 1
@@ -0,0 +1,111 @@
+import pytest
+import hexfile
+
+
+def data_records(count, start=0):
+    return [hexfile.make_record(hexfile.DATA, start + 16 * i,
+                                bytes(range(i, i + 16)))
+            for i in range(count)]
+
+
+def test_make_record_checksum():
+    assert hexfile.make_record(hexfile.EXT_LINEAR, 0, b"\x00\x00") == \
+        ":020000040000FA"
+    assert hexfile.parse_record(":10000000000102030405060708090A0B0C0D0E0F78") \
+        == (hexfile.DATA, 0, bytes(range(16)))
+
+
+def test_bad_checksum():
+    with pytest.raises(hexfile.HexError):
+        hexfile.parse_record(":10000000000102030405060708090A0B0C0D0E0F79")
+
+
+def test_repack_halves_records():
+    lines = [":020000040000FA"] + data_records(8) + [hexfile.EOF_RECORD]
+    records = hexfile.repack(lines, 32)
+
+    # The redundant extended address record is dropped.
+    assert len(records) == 5
+    assert records[-1] == hexfile.EOF_RECORD
+    original = hexfile.HexImage().load(lines)
+    assert hexfile.HexImage().load(records).memory == original.memory
+
+
+def test_repack_keeps_gaps_and_segments():
+    lines = (data_records(2, 0xFFE0) + [":020000040001F9"] +
+             data_records(1, 0x0010) + [hexfile.EOF_RECORD])
+    image = hexfile.HexImage().load(lines)
+    assert image.ranges() == [(0xFFE0, 0x10000), (0x10010, 0x10020)]
+
+    records = hexfile.repack(lines, 32)
+    assert records[1] == ":020000040001F9"
+    assert hexfile.HexImage().load(records).memory == image.memory
+
+
+def test_conflicting_data():
+    image = hexfile.HexImage().load(data_records(1))
+    image.load(data_records(1))
+    with pytest.raises(hexfile.HexError):
+        image.load([hexfile.make_record(hexfile.DATA, 8, b"\xff")])
+
+
+def test_repacked_file_cached(tmp_path):
+    source = tmp_path.joinpath("1-wire-master-1.1b.hex")
+    source.write_text("\r\n".join(data_records(4) + [hexfile.EOF_RECORD]))
+    cache = tmp_path.joinpath("cache")
+
+    path = hexfile.repacked_file(source, cache)
+    assert path.name.startswith("1-wire-master-1.1b-")
+    assert path.read_text().count("\n") == 3
+    assert hexfile.repacked_file(source, cache) == path
+
+    # A rebuilt file gets a new copy.
+    source.write_text("\r\n".join(data_records(2) + [hexfile.EOF_RECORD]))
+    assert hexfile.repacked_file(source, cache) != path
+
+
+def write_hex(path, address, count=1):
+    upper = hexfile.make_record(hexfile.EXT_LINEAR, 0,
+                                (address >> 16).to_bytes(2, "big"))
+    records = [upper] + data_records(count, address & 0xFFFF)
+    path.write_text("\r\n".join(records + [hexfile.EOF_RECORD]))
+    return path
+
+
+def test_merged_file(tmp_path):
+    boot = write_hex(tmp_path.joinpath("boot-section.hex"), 0x20000)
+    app = write_hex(tmp_path.joinpath("app-section.hex"), 0x0000, 2)
+    main = write_hex(tmp_path.joinpath("main-app-1.3a.hex"), 0x1000)
+    cache = tmp_path.joinpath("cache")
+
+    path = hexfile.merged_file([boot, app, main], cache, 0x22000)
+    image = hexfile.HexImage().load(path.read_text().splitlines())
+    assert image.ranges() == [(0x0000, 0x0020), (0x1000, 0x1010),
+                              (0x20000, 0x20010)]
+    assert hexfile.merged_file([boot, app, main], cache, 0x22000) == path
+
+
+def test_merged_file_overlap(tmp_path):
+    app = write_hex(tmp_path.joinpath("app-section.hex"), 0x0000, 2)
+    main = write_hex(tmp_path.joinpath("main-app-1.3a.hex"), 0x0010)
+    with pytest.raises(hexfile.HexError, match="overlaps app-section.hex"):
+        hexfile.merged_file([app, main], tmp_path, 0x22000)
+
+    with pytest.raises(hexfile.HexError, match="beyond"):
+        hexfile.merged_file([app], tmp_path, 0x10)
+
+
+def test_merged_file_drops_start_records(tmp_path):
+    boot = write_hex(tmp_path.joinpath("boot-section.hex"), 0x20000)
+    main = write_hex(tmp_path.joinpath("main-app-1.3a.hex"), 0x1000)
+    for path, entry in ((boot, 0x20000), (main, 0)):
+        lines = path.read_text().splitlines()
+        lines.insert(-1, hexfile.make_record(hexfile.START_LINEAR, 0,
+                                             entry.to_bytes(4, "big")))
+        path.write_text("\r\n".join(lines))
+
+    path = hexfile.merged_file([boot, main], tmp_path, 0x22000)
+    types = [hexfile.parse_record(line)[0]
+             for line in path.read_text().splitlines()]
+    assert hexfile.START_LINEAR not in types
+    assert types[-1] == hexfile.EOF
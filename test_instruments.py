@@ -0,0 +1,63 @@
+import instruments
+
+
+class FakeTransport:
+    """Records SCPI commands and answers queries from a table."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.commands = []
+
+    def write(self, command):
+        self.commands.append(command)
+
+    def query(self, command):
+        self.commands.append(command)
+        return self.responses[command]
+
+    def close(self):
+        pass
+
+
+def test_dmm_scan():
+    transport = FakeTransport({"READ?": "+8.7E-01,+2.5E+00,+1.8E+00"})
+    dmm = instruments.ScpiDmm(transport, scanner_card=True)
+    assert dmm.measure_scan("voltage", [101, 102, 103]) == [0.87, 2.5, 1.8]
+    assert transport.commands == ["CONF:VOLT:DC (@101,102,103)",
+                                  "ROUT:SCAN (@101,102,103)", "READ?"]
+
+
+def test_bench_plan():
+    dmm = instruments.ScpiDmm(
+        FakeTransport({"READ?": "+8.7E-01,+2.5E+00,+1.8E+00"}),
+        scanner_card=True)
+    psu = instruments.ScpiPowerSupply(
+        FakeTransport({"MEAS:CURR?": "0.004"}))
+    bench = instruments.Bench({"dmm": dmm, "psu": psu})
+
+    values = bench.measure_all()
+    bench.close()
+    assert values == {"input_i": 4.0, "5v_supply": 0.87, "2p5v": 2.5,
+                      "1p8v": 1.8}
+
+
+def test_simulated_bench_within_limits():
+    import model
+    m = model.Model()
+    bench = instruments.create_bench("Simulated")
+    for key, value in bench.measure_all().items():
+        assert m.compare_to_limit(key, value)
+    bench.close()
+
+
+def test_worker_reports_unexpected_errors():
+    worker = instruments.BenchWorker()
+    worker.bench = instruments.Bench({
+        "dmm": instruments.ScpiDmm(FakeTransport({}), scanner_card=True),
+        "psu": instruments.ScpiPowerSupply(FakeTransport({}))})
+    errors, values = [], []
+    worker.bench_error_signal.connect(errors.append)
+    worker.measurements_ready.connect(values.append)
+    worker.measure()
+    worker.close()
+    assert errors and not values
@@ -0,0 +1,35 @@
+import interfaces
+import replay
+import serialmanager
+import simulator
+
+TAC = [step for step in interfaces.STEPS if step.name == "tac"]
+IDS = ["0a1b2c3d", "00000000", "00000000", "00000000", "12345678"]
+
+
+def tac_result(monkeypatch, tac_id, tac_ids=IDS):
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(tac_ids=tac_ids)
+    seq = replay.replay_steps(TAC, sm, {"port1_tac_id": tac_id})
+    return seq.results["tac"]
+
+
+def test_tac_records_eeprom_serial(monkeypatch):
+    result = tac_result(monkeypatch, "0a1b2c3d")
+    assert result.passed and result.value == "12345678"
+
+
+def test_tac_fails_without_port1_id(monkeypatch):
+    assert not tac_result(monkeypatch, "").passed
+
+
+def test_tac_id_matches_whole_id(monkeypatch):
+    assert not tac_result(monkeypatch, "2c3d").passed
+    assert not tac_result(monkeypatch, "0a1b").passed
+    assert not tac_result(monkeypatch, ".*").passed
+
+
+def test_tac_needs_exactly_five_ids(monkeypatch):
+    assert not tac_result(monkeypatch, "0a1b2c3d", IDS + ["87654321"]).passed
+    assert not tac_result(monkeypatch, "0a1b2c3d", IDS[:4]).passed
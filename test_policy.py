@@ -0,0 +1,31 @@
+import policy
+import report
+
+
+def test_passing_board_runs_everything():
+    r = report.Report()
+    r.write_data("input_i", 4.0, "PASS")
+    assert policy.phases_to_skip(r.data, "setup", "Stop") == []
+
+
+def test_failed_board_skips():
+    r = report.Report()
+    r.write_data("2p5v", 2.0, "FAIL")
+    assert policy.phases_to_skip(r.data, "setup", "Off") == []
+    assert policy.phases_to_skip(r.data, "setup", "Stop") == \
+        ["program", "interfaces"]
+    assert policy.phases_to_skip(r.data, "program", "Stop") == ["interfaces"]
+    assert policy.phases_to_skip(r.data, "interfaces", "Stop") == []
+
+
+def test_diagnose_skips_dependent_phases():
+    # A blank board failing setup: without the program phase it has no
+    # firmware to run the interface tests.
+    r = report.Report()
+    r.write_data("2p5v", 2.0, "FAIL")
+    assert policy.phases_to_skip(r.data, "setup", "Diagnose") == \
+        ["program", "interfaces"]
+
+    # Once programmed, a failure still leaves the interfaces to diagnose.
+    r.write_data("xmega_app", "1.2a", "FAIL")
+    assert policy.phases_to_skip(r.data, "program", "Diagnose") == []
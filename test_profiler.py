@@ -0,0 +1,34 @@
+import time
+import threading
+import profiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_samples_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+    worker.start()
+    p = profiler.SamplingProfiler(interval=0.001)
+    p.start()
+    time.sleep(0.1)
+    p.stop()
+    stop.set()
+    worker.join()
+
+    assert p.samples > 0
+    busy = [s for s in p.stacks if s.startswith("busy;")]
+    assert busy and all("test_profiler:busy_loop" in s for s in busy)
+    assert not any("profiler:SamplingProfiler.run" in s for s in p.stacks)
+
+
+def test_folded_format(tmp_path):
+    p = profiler.SamplingProfiler()
+    p.stacks["gui;a:main;a:f"] += 3
+    p.stacks["worker;b:g"] += 1
+    path = tmp_path.joinpath("profile.folded")
+    p.write(path)
+    assert path.read_text() == "gui;a:main;a:f 3\nworker;b:g 1\n"
@@ -0,0 +1,61 @@
+import time
+import capture
+import interfaces
+import replay
+import serialmanager
+import simulator
+
+CONTEXT = {"port1_tac_id": "0a1b2c3d"}
+
+
+def record_session(tmp_path, monkeypatch):
+    """Runs the interface tests on the simulator with the capture on and
+    returns the board's session file."""
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(internal_5v=4.91)
+    sm.set_capture_dir(tmp_path)
+    sm.open_capture("SIM")
+    sm.new_session("THL0001")
+    replay.replay_steps(interfaces.STEPS, sm, CONTEXT)
+    sm.capture.close()
+    monkeypatch.undo()
+
+    records = capture.slice_session(capture.read_records(tmp_path, "SIM"),
+                                    "THL0001")
+    path = tmp_path.joinpath("THL0001.cap")
+    assert capture.write_session(records, path) > 0
+    return path
+
+
+def test_replay_reproduces_results(tmp_path, monkeypatch):
+    path = record_session(tmp_path, monkeypatch)
+    sm = replay.replay_manager(replay.load_session(path))
+
+    seq = replay.replay_steps(interfaces.STEPS, sm, CONTEXT)
+    assert seq.results["internal_5v"].value == 4.91
+    assert seq.results["tac"].value == "12345678"
+    assert sm.ser.done() and sm.ser.divergence is None
+
+
+def test_replay_detects_divergence(tmp_path, monkeypatch):
+    path = record_session(tmp_path, monkeypatch)
+    sm = replay.replay_manager(replay.load_session(path))
+
+    seq = replay.replay_steps(interfaces.STEPS[1:], sm, CONTEXT)
+    assert not seq.results["tac"].passed
+    # The session asked for the 5V reading first.
+    assert sm.ser.divergence.endswith("the session wrote b'5'.")
+
+
+def test_replay_at_recorded_speed():
+    records = [(100.0, capture.TX, b"5v\r\n"),
+               (100.2, capture.RX, b"\r\n5.01"),
+               (100.4, capture.RX, b"\r\n>")]
+    port = replay.ReplaySerial(records, speed=2)
+    port.write(b"5v\r\n")
+    assert port.in_waiting == 0
+
+    start = time.monotonic()
+    assert port.read_until(b"\r\n>") == b"\r\n5.01\r\n>"
+    assert 0.15 < time.monotonic() - start < 0.5
@@ -0,0 +1,48 @@
+from datetime import datetime as dt
+import report_index
+
+
+def test_parse_report_name():
+    run = report_index.parse_report_name(
+        "THL0001_2020-03-04 09-05-7-ID-AB_FAIL.csv")
+    assert run["sn"] == "THL0001"
+    assert run["tester_id"] == "AB"
+    assert run["result"] == "FAIL"
+    assert run["time"] == dt(2020, 3, 4, 9, 5, 7).timestamp()
+
+    assert report_index.parse_report_name("notes.csv") is None
+
+
+def test_index_search(tmp_path):
+    reports = tmp_path / "reports"
+    reports.mkdir()
+    for name in ["THL0001_2020-03-04 09-05-7-ID-AB_FAIL.csv",
+                 "THL0001_2020-03-05 10-00-00-ID-CD.csv",
+                 "THL0002_2020-03-05 11-00-00-ID-AB.csv"]:
+        (reports / name).write_text("")
+
+    index = report_index.ReportIndex(tmp_path / "index" / "reports.sqlite")
+    assert index.rebuild(reports) == 3
+
+    runs = index.search(sn="THL0001")
+    assert [r["result"] for r in runs] == ["FAIL", "PASS"]
+    assert len(index.search(tester_id="AB")) == 2
+    start = dt(2020, 3, 5).timestamp()
+    assert [r["sn"] for r in index.search(start=start)] == ["THL0001",
+                                                           "THL0002"]
+
+    index.add(tmp_path / "x.csv", "THL0003", "45211-01", "AB", start + 1,
+              "PASS")
+    assert index.search(sn="THL0003")[0]["pn"] == "45211-01"
+    index.move(tmp_path / "x.csv", reports / "x.csv")
+    assert index.search(sn="THL0003")[0]["path"] == str(reports / "x.csv")
+    index.close()
+
+
+def test_parse_end():
+    # A date on its own takes in the whole day.
+    end = report_index.parse_end("2020-03-05")
+    assert dt(2020, 3, 5, 23, 59, 59).timestamp() < end < \
+        dt(2020, 3, 6).timestamp()
+    assert report_index.parse_end("2020-03-05T12:00") == \
+        dt(2020, 3, 5, 12).timestamp()
@@ -0,0 +1,37 @@
+import report_writer
+
+rows = [["Name", "Value", "Pass/Fail"], ["Test Result", "", "PASS"]]
+
+
+def test_spool_and_replicate(tmp_path):
+    spool = tmp_path / "spool"
+    share = tmp_path / "share"
+    writer = report_writer.ReportWriter(spool)
+    writer.set_destination(str(share))
+
+    writer.submit("THL0001_a.csv", rows)
+    writer.submit("THL0002_b.csv", rows)
+    assert writer.queue_depth() == 2
+
+    # Share unavailable: reports stay in the spool.
+    assert not writer.replicate()
+    assert writer.queue_depth() == 2
+
+    share.mkdir()
+    assert writer.replicate()
+    assert writer.queue_depth() == 0
+    assert sorted(p.name for p in share.iterdir()) == ["THL0001_a.csv",
+                                                       "THL0002_b.csv"]
+    assert (share / "THL0001_a.csv").read_text().splitlines() == [
+        "Name,Value,Pass/Fail", "Test Result,,PASS"]
+
+
+def test_spool_error(tmp_path):
+    spool = tmp_path / "spool"
+    spool.write_text("")
+    writer = report_writer.ReportWriter(spool)
+    errors = []
+    writer.spool_error_signal.connect(lambda *args: errors.append(args))
+
+    writer.submit("THL0001_a.csv", rows)
+    assert [name for name, _ in errors] == ["THL0001_a.csv"]
@@ -0,0 +1,38 @@
+import io
+import results
+from results import ResultRecord, Status
+
+
+def make_record():
+    record = ResultRecord()
+    record.set("pcba_sn", "THL0001", "PASS")
+    record.set("input_i", 4.0, "PASS")
+    record.set("2p5v", 2.7, "FAIL")
+    record.set("internal_5v", "", "FAIL")
+    return record
+
+
+def test_record_values():
+    record = make_record()
+    assert record.value("input_i") == 4.0
+    assert record.value("internal_5v") is None
+    assert record.value("xmega_app") is None
+    assert record.status("2p5v") is Status.FAIL
+    assert record.result() is Status.FAIL
+    assert record.failed_keys() == ["2p5v", "internal_5v"]
+    assert record.schema is results.SCHEMA
+
+
+def test_record_serialization():
+    records = [make_record(), ResultRecord()]
+
+    for restored in (results.load_json(results.dump_json(records)),
+                     results.unpack_records(results.pack_records(records))):
+        assert [r.to_dict() for r in restored] == [r.to_dict()
+                                                   for r in records]
+
+    f = io.StringIO()
+    results.write_csv(records, f)
+    lines = f.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[1].startswith(",,THL0001,PASS")
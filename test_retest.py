@@ -0,0 +1,32 @@
+import report
+import retest
+
+
+def write_report(tmp_path, failed_keys):
+    r = report.Report()
+    r.set_file_location(tmp_path)
+    for phase in retest.PHASES:
+        for key in retest.PHASE_KEYS[phase]:
+            status = "FAIL" if key in failed_keys else "PASS"
+            r.write_data(key, 1.0, status)
+    r.write_data("pcba_sn", "THL0001", "PASS")
+    return r.generate_report()
+
+
+def test_rerun_rules(tmp_path):
+    previous = retest.load_report(write_report(tmp_path, ["led_test"]))
+    assert retest.phases_to_rerun(previous) == ["interfaces"]
+
+    previous = retest.load_report(write_report(tmp_path, ["2p5v"]))
+    assert retest.phases_to_rerun(previous) == retest.PHASES
+
+
+def test_merge(tmp_path):
+    previous = retest.load_report(write_report(tmp_path, ["one_wire_ver"]))
+    assert retest.phases_to_rerun(previous) == ["program", "interfaces"]
+
+    r = report.Report()
+    retest.merge(r.data, previous, ["setup"])
+    assert r.data.value("2p5v") == 1.0
+    assert str(r.data.status("2p5v")) == "PASS"
+    assert r.data.value("one_wire_ver") is None
@@ -0,0 +1,35 @@
+import pytest
+import scanner
+
+products = scanner.ProductTable({"45211-01": ["THL", None]})
+
+
+def test_classify():
+    assert products.classify("45211-01") == ("pcba_pn", "45211-01")
+    assert products.classify(" thl1234\r") == ("pcba_sn", "THL1234")
+    assert products.classify("THL12345") == (None, "THL12345")
+    assert products.classify("ab") == (None, "AB")
+
+
+def test_valid_serial():
+    assert products.valid_serial("THL0001", "45211-01")
+    assert not products.valid_serial("ABC0001", "45211-01")
+    assert not products.valid_serial("THL0001", "00000-00")
+
+
+def test_parse_reading():
+    assert scanner.parse_reading("+4.01200E-03") == (4.012e-3, None)
+    assert scanner.parse_reading("4.0 mA") == (4.0, "mA")
+    assert scanner.parse_reading("-2.5V") == (-2.5, "V")
+
+    with pytest.raises(ValueError):
+        scanner.parse_reading("OVLD")
+
+
+def test_stop_before_run():
+    reader = scanner.SerialLineReader("/dev/does-not-exist")
+    errors = []
+    reader.port_error_signal.connect(errors.append)
+    reader.stop()
+    reader.run()
+    assert not errors
@@ -0,0 +1,122 @@
+import model
+import sequence
+import serialmanager
+import simulator
+from sequence import Step
+
+
+class Report:
+    def __init__(self):
+        self.data = {}
+
+    def write_data(self, key, value, result):
+        self.data[key] = (value, result)
+
+
+def make_manager(monkeypatch, **board):
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(**board)
+    return sm
+
+
+def run(seq, **kwargs):
+    finished = []
+    seq.finished.connect(finished.append)
+    seq.start(**kwargs)
+    return finished
+
+
+def test_serial_steps_check_limits_and_report(monkeypatch):
+    sm = make_manager(monkeypatch, internal_5v=5.01)
+    report = Report()
+    seq = sequence.Sequence([
+        Step("internal_5v", command="5v", pattern=r"([0-9]+\.[0-9]+)",
+             limit="internal_5v", report="internal_5v"),
+        Step("tac", command="tac-get-info",
+             pattern=r"{tac_id}(?:\s+[0-9a-f]{{8}}){{3}}\s+([0-9a-f]{{8}})",
+             report="eeprom_sn"),
+    ], sm, model.Model())
+
+    finished = run(seq, report=report, context={"tac_id": "0a1b2c3d"})
+    assert finished == [True]
+    assert report.data["internal_5v"] == (5.01, "PASS")
+    assert report.data["eeprom_sn"] == ("12345678", "PASS")
+    assert set(seq.timings) == {"internal_5v", "tac"}
+
+
+def test_failed_step_blocks_dependents(monkeypatch):
+    sm = make_manager(monkeypatch)
+    started = []
+    seq = sequence.Sequence([
+        Step("bad", command="5v", pattern="no such response"),
+        Step("after", command="version", depends=["bad"]),
+        Step("other", command="version"),
+    ], sm)
+    seq.step_started.connect(started.append)
+
+    assert run(seq) == [False]
+    assert started == ["bad", "other"]
+    assert not seq.results["after"].passed
+
+
+def test_conditions_skip_steps(monkeypatch):
+    sm = make_manager(monkeypatch, one_wire_version="1.1a")
+    skipped = []
+    seq = sequence.Sequence([
+        Step("one_wire", slot="one_wire_test",
+             pattern=r"([0-9]+\.[0-9]+[a-z])", required=False),
+        Step("reprogram", slot="reprogram_one_wire",
+             depends=["one_wire"], when="old"),
+        Step("watchdog", command="watchdog", depends=["reprogram"]),
+    ], sm, conditions={"old": lambda r: r["one_wire"].value < "1.1a"})
+    seq.step_skipped.connect(skipped.append)
+
+    assert run(seq) == [True]
+    assert skipped == ["reprogram"]
+    assert seq.results["watchdog"].passed
+
+
+def test_other_resources_overlap_serial_steps(monkeypatch):
+    sm = make_manager(monkeypatch)
+    started = []
+    seq = sequence.Sequence([
+        Step("manual", resource=None),
+        Step("flash", resource="programmer"),
+        Step("5v", command="5v"),
+        Step("watchdog", command="watchdog", depends=["flash"]),
+    ], sm, actions={"flash": lambda: started.append("action")})
+    finished = run(seq)
+
+    # The serial test ran while the programmer and operator were busy.
+    assert seq.results["5v"].passed
+    assert "action" in started
+    assert finished == []
+
+    seq.complete("flash", True)
+    assert seq.results["watchdog"].passed
+    seq.complete("manual", True)
+    assert finished == [True]
+
+
+def test_keep_manual_results(monkeypatch):
+    sm = make_manager(monkeypatch)
+    seq = sequence.Sequence([
+        Step("manual", resource=None),
+        Step("5v", command="5v"),
+    ], sm)
+    run(seq)
+    seq.complete("manual", False)
+
+    # The operator's result stands when the tests are repeated.
+    finished = run(seq, keep=["manual"])
+    assert finished == [False]
+    assert not seq.results["manual"].passed
+    assert seq.results["5v"].passed
+
+
+def test_unknown_slot_fails_step(monkeypatch):
+    sm = make_manager(monkeypatch)
+    seq = sequence.Sequence([Step("bad", slot="close_port")], sm)
+    assert run(seq) == [False]
+    assert sm.ser.is_open
@@ -0,0 +1,190 @@
+import serialmanager
+
+
+class FakeSerial:
+    """Minimal serial port that echoes input and answers each CRLF with a
+    response and the prompt."""
+
+    def __init__(self, response=b"ok"):
+        self.response = response
+        self.rx = bytearray()
+        self.written = bytearray()
+        self.is_open = True
+        self.port = "COM1"
+        self.timeout = 15
+        self.powered = True
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def write(self, data):
+        self.written += data
+        if not self.powered:
+            return
+        self.rx += data
+        if data.endswith(b"\r\n"):
+            self.rx += self.response + b"\r\n>"
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def make_manager(monkeypatch, response=b"ok"):
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    sm.ser = FakeSerial(response)
+    return sm
+
+
+def test_flush_skipped_when_in_sync(monkeypatch):
+    sm = make_manager(monkeypatch)
+    flushes = []
+
+    def flush_buffers():
+        flushes.append(1)
+        sm.in_sync = True
+
+    sm.flush_buffers = flush_buffers
+    sm.send_command("5v")
+    sm.send_command("5v")
+    assert len(flushes) == 1
+    assert sm.is_healthy()
+
+    sm.new_session("THL0001")
+    sm.send_command("5v")
+    assert len(flushes) == 2
+
+
+def test_timeout_marks_link_error(monkeypatch):
+    sm = make_manager(monkeypatch)
+    sm.flush_buffers = lambda: setattr(sm, "in_sync", True)
+    sm.send_command("5v")
+    # Drop the prompt so the read times out.
+    sm.ser.response = b"partial"
+    sm.end = b"\r\n#"
+    sm.send_command("5v")
+    assert not sm.is_healthy()
+    assert sm.link_errors == 1
+
+
+def test_poll_detects_board(monkeypatch):
+    sm = make_manager(monkeypatch, response=b"1.2a")
+    sm.ser.powered = False
+    detected = []
+    removed = []
+    sm.dut_detected.connect(detected.append)
+    sm.dut_removed.connect(lambda: removed.append(1))
+
+    sm.poll_dut()
+    assert not detected and not sm.dut_present
+
+    sm.ser.powered = True
+    sm.poll_dut()
+    sm.poll_dut()
+    assert detected == ["1.2a"]
+    assert sm.ser.timeout == 15
+
+    sm.ser.powered = False
+    sm.poll_dut()
+    assert removed == [1]
+    assert not sm.dut_present
+
+
+def test_static_queries_cached_until_reset(monkeypatch):
+    sm = make_manager(monkeypatch, response=b"1.2a")
+    responses = []
+    sm.data_ready.connect(responses.append)
+
+    assert sm.query_version() == "1.2a"
+    sm.send_command("tac-get-info")
+    written = len(sm.ser.written)
+    assert sm.query_version() == "1.2a"
+    sm.send_command("tac-get-info")
+    assert len(sm.ser.written) == written
+    assert responses[0] == responses[1]
+
+    # A reset may change the answers.
+    sm.send_command("watchdog")
+    sm.query_version()
+    assert len(sm.ser.written) > written
+
+    written = len(sm.ser.written)
+    sm.new_session("THL0002")
+    sm.send_command("tac-get-info")
+    assert len(sm.ser.written) > written
+
+
+def test_load_timing(tmp_path, monkeypatch):
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    profile = tmp_path.joinpath("threadlink_timing.json")
+    assert not sm.load_timing(profile)
+
+    profile.write_text('{"firmware": "1.2a", "delays": {"char_delay": 0.01,'
+                       ' "hex_line_delay": 0.0, "key_delay": "fast"}}')
+    assert sm.load_timing(profile)
+    # The defaults hold until the board reports the profile's firmware.
+    assert sm.timing == serialmanager.TIMING_DEFAULTS
+    sm.ser = FakeSerial(b'firmware version "RS485 BRIDGE MAIN APP 1.2a"')
+    sm.send_command("version")
+    assert sm.timing["char_delay"] == 0.01
+    # Too short for the 1-wire master to write a record to flash.
+    assert sm.timing["hex_line_delay"] == \
+        serialmanager.TIMING_MINIMUMS["hex_line_delay"]
+    assert sm.timing["key_delay"] == serialmanager.TIMING_DEFAULTS["key_delay"]
+
+    # Reflashed with other firmware.
+    mismatches = []
+    sm.timing_mismatch_signal.connect(lambda *args: mismatches.append(args))
+    sm.firmware_changed()
+    assert sm.timing == serialmanager.TIMING_DEFAULTS
+    sm.ser.response = b'firmware version "RS485 BRIDGE MAIN APP 1.3a"'
+    sm.send_command("watchdog")
+    assert sm.timing == serialmanager.TIMING_DEFAULTS
+    assert mismatches == [("1.2a", "1.3a")]
+    assert sm.match_timing("1.2a")
+    assert sm.timing["char_delay"] == 0.01
+
+
+def test_receive_buffer_frames():
+    rx = serialmanager.ReceiveBuffer(size=16)
+    port = FakeSerial()
+    port.rx += b"\r\n5.01\r\n>\r\nok"
+    rx.fill(port, port.in_waiting)
+
+    i = rx.find(b"\r\n>")
+    frame = rx.take(i + 3)
+    assert frame.obj is rx.buffer
+    assert str(frame, "utf-8") == "\r\n5.01\r\n>"
+
+    # The buffer grows for a frame longer than it.
+    port.rx += b"\r\n" + b"x" * 30 + b"\r\n>"
+    rx.fill(port, port.in_waiting)
+    assert rx.take(len(rx)) == b"\r\nok\r\n" + b"x" * 30 + b"\r\n>"
+    assert len(rx.buffer) > 16 and len(rx) == 0
+
+
+def test_responses_decoded_only_when_wanted(monkeypatch):
+    sm = make_manager(monkeypatch, response=b"\xff")
+    sm.flush_buffers = lambda: setattr(sm, "in_sync", True)
+    errors = []
+    sm.serial_error_signal.connect(lambda: errors.append(1))
+
+    sm.send_command("5v")
+    assert not errors and sm.is_healthy()
+
+    responses = []
+    sm.data_ready.connect(responses.append)
+    sm.send_command("5v")
+    assert errors == [1] and not responses
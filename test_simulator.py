@@ -0,0 +1,49 @@
+import serialmanager
+import simulator
+
+
+def make_manager(monkeypatch):
+    monkeypatch.setattr(serialmanager.time, "sleep", lambda s: None)
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(app_version="1.2a",
+                                      one_wire_version="1.1a")
+    return sm
+
+
+def test_version_and_one_wire_test(monkeypatch):
+    sm = make_manager(monkeypatch)
+    responses = []
+    sm.data_ready.connect(responses.append)
+
+    assert sm.query_version() == "1.2a"
+    sm.one_wire_test()
+    assert "1.1a" in responses[-1]
+    # The key that ends the 1-wire test doesn't reach the next command.
+    sm.send_command("5v")
+    assert "5.01" in responses[-1]
+    assert sm.is_healthy()
+
+
+def test_one_wire_upload(monkeypatch, tmp_path):
+    sm = make_manager(monkeypatch)
+    responses = []
+    sm.data_ready.connect(responses.append)
+    hex_file = tmp_path.joinpath("1-wire-master-1.1b.hex")
+    hex_file.write_bytes(b":020000040000FA\r\n:00000001FF\r\n")
+
+    sm.reprogram_one_wire()
+    assert "download hex records now..." in responses[-1]
+    sm.write_hex_file(str(hex_file))
+    assert "lock bits set" in responses[-1]
+
+
+def test_collision_with_slow_board():
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(latency=0.02)
+    sm.flush_buffers()
+    assert sm.query_version() == "1.2a"
+
+    # The next character goes out while the board is still echoing.
+    sm.timing["char_delay"] = 0.0
+    sm.clear_cache()
+    assert sm.query_version() is None
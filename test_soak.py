@@ -0,0 +1,21 @@
+import soak
+
+
+def samples(metric, values):
+    base = {name: 0 for name in soak.TOLERANCE}
+    return [dict(base, **{metric: value}) for value in values]
+
+
+def test_growing_thread_count_is_a_leak():
+    found = soak.leaks(samples("qthreads", range(60)), warmup=20)
+    assert len(found) == 1
+    assert found[0].startswith("qthreads")
+
+
+def test_warmup_and_noise_are_not_leaks():
+    # Memory climbs during the warmup, then moves within the tolerance.
+    rss = list(range(0, 20000, 1000)) + [20000, 21000, 20500] * 20
+    assert soak.leaks(samples("rss_kb", rss), warmup=20) == []
+    # Falling back to the starting level isn't steady growth.
+    receivers = [109] * 20 + [110] * 20 + [109] * 20
+    assert soak.leaks(samples("receivers", receivers), warmup=20) == []
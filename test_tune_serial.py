@@ -0,0 +1,17 @@
+import serialmanager
+import simulator
+import tune_serial
+
+
+def test_tune_finds_board_latency():
+    sm = serialmanager.SerialManager()
+    sm.ser = simulator.BoardSimulator(latency=0.02)
+    sm.flush_buffers()
+
+    value = tune_serial.tune(sm, "char_delay", 1, 0.0, steps=2,
+                             report=lambda line: None)
+    assert value == 0.025
+    assert sm.timing["char_delay"] == \
+        serialmanager.TIMING_DEFAULTS["char_delay"]
+    # Every trial disconnects what it collected.
+    assert sm.receivers(sm.data_ready) == 0
@@ -1,4 +1,6 @@
 import re
+import time
+import policy
 import os.path
 from pathlib import Path
 from PyQt5.QtWidgets import (
@@ -16,7 +18,11 @@ from final_page import FinalPage
 
 class Threadlink(QWizard):
     """QWizard class for the Threadlink board. Sets up the QWizard page and adds the
-    individual QWizardPage subpages for each set of tests."""
+    individual QWizardPage subpages for each set of tests.
+
+    The wizard and its pages are created once and reused: new_board resets
+    them for each board tested.
+    """
 
     status_style_pass = """QLabel {background: #8cff66;
                         border: 2px solid grey; font-size: 20px}"""
@@ -48,14 +54,34 @@ class Threadlink(QWizard):
                                                 serial_manager, model, report))
         final_id = self.addPage(FinalPage(self, test_utility, report))
 
+        self.first_id = setup_id
         self.setup_page = self.page(setup_id)
         self.program_page = self.page(program_id)
         self.interfaces_page = self.page(interfaces_id)
         self.final_page = self.page(final_id)
+        self.pages = (self.setup_page, self.program_page,
+                      self.interfaces_page, self.final_page)
 
         self.tu = test_utility
         self.report = report
 
+        # The policy decides what's left to run before the page moves on.
+        for page in (self.setup_page, self.program_page,
+                     self.interfaces_page):
+            page.complete_signal.connect(self.apply_policy)
+            page.complete_signal.connect(self.auto_advance)
+
+        # Phases already passed on an earlier run of a reworked board.
+        self.skip_phases = set()
+        # Phases the fail-fast policy skipped because the board had failed.
+        self.stopped_phases = []
+
+        # Time spent in each test phase, for the shift dashboard.
+        self.phase_times = {}
+        self.current_phase = None
+        self.phase_started = None
+        self.currentIdChanged.connect(self.phase_changed)
+
     def abort(self):
         """Prompt user for confirmation and abort test if confirmed."""
 
@@ -64,14 +90,113 @@ class Threadlink(QWizard):
                                             QMessageBox.Yes,
                                             QMessageBox.No)
         if confirmation == QMessageBox.Yes:
-            self.tu.initUI()
+            self.tu.show_start_page()
         else:
             pass
 
     def finish(self):
-        """Reinitialize the TestUtility main page when tests are finished."""
+        """Return to the TestUtility main page when tests are finished."""
+
+        self.tu.show_start_page()
 
-        self.tu.initUI()
+    def new_board(self, report, skip_phases=()):
+        """Resets the wizard and its pages for the next board and starts
+        from the first page. Phases in skip_phases passed on an earlier run
+        and are skipped."""
+        self.report = report
+        for page in self.pages:
+            page.report = report
+            if hasattr(page, "reset"):
+                page.reset()
+        self.button(QWizard.CustomButton1).setEnabled(True)
+
+        self.skip_phases = set(skip_phases)
+        self.stopped_phases = []
+        start_id = self.first_id
+        while self.skipped(start_id):
+            start_id = self.page(start_id).nextId()
+        self.setStartId(start_id)
+        self.restart()
+
+        self.phase_times = {}
+        self.current_phase = None
+        self.phase_changed()
+
+    def shutdown(self):
+        """Stops the worker threads. Called when the program exits."""
+        self.program_page.shutdown()
+
+    def skipped(self, page_id) -> bool:
+        phase = getattr(self.page(page_id), "phase", None)
+        return phase in self.skip_phases or phase in self.stopped_phases
+
+    def apply_policy(self):
+        """Skips the remaining phases that can't change a failed board's
+        verdict, as the fail-fast setting allows."""
+        phase = getattr(self.currentPage(), "phase", None)
+        mode = self.tu.settings.value("fail_fast")
+        for skipped in policy.phases_to_skip(self.report.data, phase, mode):
+            if skipped not in self.stopped_phases:
+                self.stopped_phases.append(skipped)
+
+    def nextId(self):
+        """Overrides nextId to step over skipped phases."""
+        next_id = super().nextId()
+        while next_id != -1 and self.skipped(next_id):
+            next_id = self.page(next_id).nextId()
+        return next_id
+
+    def phase_changed(self):
+        """Adds the time spent on the previous page to its phase."""
+        self.close_phase()
+        self.current_phase = getattr(self.currentPage(), "phase", None)
+        self.phase_started = time.monotonic()
+
+    def close_phase(self):
+        """Adds the time spent so far to the current phase and ends it.
+        The final page calls it before summarizing, as its page is
+        initialized before the page change is signalled."""
+        if self.current_phase:
+            self.phase_times[self.current_phase] = (
+                self.phase_times.get(self.current_phase, 0) +
+                time.monotonic() - self.phase_started)
+        self.current_phase = None
+
+    def auto_advance(self):
+        """Moves on to the next page as soon as the current one is complete
+        when the fixture watcher is on."""
+        if not self.tu.auto_detect.isChecked():
+            return
+        if not self.currentPage().isComplete():
+            return
+
+        self.next()
+        page = self.currentPage()
+        if hasattr(page, "auto_start"):
+            page.auto_start()
+
+    def dut_detected(self, version):
+        """Passes a newly detected board on to the current page."""
+        page = self.currentPage()
+        if hasattr(page, "dut_detected"):
+            page.dut_detected(version)
+
+    def measurement_received(self, value, unit):
+        """Passes a meter reading on to the current page."""
+        page = self.currentPage()
+        if hasattr(page, "measurement_received"):
+            page.measurement_received(value, unit)
+
+    def measurements_ready(self, values):
+        """Passes bench measurements on to the current page."""
+        page = self.currentPage()
+        if hasattr(page, "measurements_ready"):
+            page.measurements_ready(values)
+
+    def dut_removed(self):
+        """Returns to the start page once the tested board is removed."""
+        if self.currentPage() is self.final_page:
+            self.finish()
 
     @staticmethod
     def checked(lbl, chkbx):
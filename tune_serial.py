@@ -0,0 +1,260 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from contextlib import contextmanager
+from datetime import datetime as dt
+
+import serialmanager
+from serialmanager import TIMING_DEFAULTS, TIMING_MINIMUMS
+
+# Halvings of the search interval per delay.
+SEARCH_STEPS = 6
+# Tuned delays are this multiple of the smallest reliable value, so a
+# station isn't left at the edge of failing.
+MARGIN = 1.25
+DEFAULT_PROFILE = os.path.join(os.path.expanduser("~"),
+                               "threadlink_timing.json")
+VERSION = r"[0-9]+\.[0-9]+[a-z]"
+HEX_EOF = b":00000001FF\r\n"
+
+
+@contextmanager
+def collect(signal):
+    """Yields a list that fills with the signal's emissions while the
+    block runs."""
+    received = []
+
+    def append(*args):
+        received.append(args)
+
+    signal.connect(append)
+    try:
+        yield received
+    finally:
+        signal.disconnect(append)
+
+
+def version_trial(sm, hex_file=None) -> bool:
+    """A plain command exchange."""
+    with collect(sm.data_ready) as responses:
+        sm.clear_cache()
+        sm.send_command("version")
+    return bool(responses and re.search(VERSION, responses[-1][0])
+                and sm.in_sync)
+
+
+def flush_trial(sm, hex_file=None) -> bool:
+    """A command exchange after the buffers are flushed."""
+    sm.in_sync = False
+    return version_trial(sm)
+
+
+def one_wire_trial(sm, hex_file=None) -> bool:
+    """The 1-wire test, whose keys mustn't spill into the next command."""
+    with collect(sm.data_ready) as responses:
+        sm.clear_cache()
+        sm.one_wire_test()
+    return bool(responses and re.search(VERSION, responses[-1][0])
+                and version_trial(sm))
+
+
+def serial_trial(sm, hex_file=None) -> bool:
+    """Writing a serial number and reading its echo."""
+    with collect(sm.serial_test_succeeded) as succeeded:
+        sm.set_serial("THL0000")
+    return bool(succeeded)
+
+
+def upload_trial(sm, hex_file=None) -> bool:
+    """A whole 1-wire master upload."""
+    with collect(sm.data_ready) as responses:
+        sm.reprogram_one_wire()
+        if not responses or "download hex records now..." not in \
+                responses[-1][0]:
+            return False
+        sm.write_hex_file(hex_file)
+    return "lock bits set" in responses[-1][0]
+
+
+# Delay : the exchange that shows whether it's long enough.
+TRIALS = {
+    "char_delay": version_trial,
+    "command_delay": version_trial,
+    "flush_delay": flush_trial,
+    "key_delay": one_wire_trial,
+    "dot_delay": one_wire_trial,
+    "serial_delay": serial_trial,
+    "reprogram_wait": upload_trial,
+    "hex_line_delay": upload_trial,
+    "upload_wait": upload_trial,
+}
+UPLOAD_DELAYS = ("reprogram_wait", "hex_line_delay", "upload_wait")
+
+
+def recover(sm):
+    """Brings the board back to the prompt after a failed trial, using the
+    default delays."""
+    timing = sm.timing
+    sm.timing = dict(TIMING_DEFAULTS)
+    try:
+        # Ends a 1-wire test still waiting for its key, then an upload
+        # still waiting for its records.
+        sm.write(b".\r\n")
+        time.sleep(TIMING_DEFAULTS["key_delay"])
+        sm.write(HEX_EOF)
+        time.sleep(TIMING_DEFAULTS["upload_wait"])
+        sm.drain()
+        sm.in_sync = False
+        sm.flush_buffers()
+    finally:
+        sm.timing = timing
+    sm.clear_cache()
+
+
+def failure_rate(sm, trial, trials: int, hex_file=None) -> float:
+    failures = 0
+    for _ in range(trials):
+        try:
+            passed = trial(sm, hex_file)
+        except (serialmanager.serial.SerialException, UnicodeDecodeError):
+            passed = False
+        if not passed:
+            failures += 1
+            recover(sm)
+    return failures / trials
+
+
+def tune(sm, delay: str, trials: int, target: float, hex_file=None,
+         steps=SEARCH_STEPS, report=print) -> float:
+    """Returns the smallest value of the delay whose failure rate over the
+    trials is within the target, searching between its minimum and its
+    default. The other delays stay at their current values."""
+    trial = TRIALS[delay]
+    default = TIMING_DEFAULTS[delay]
+    saved = sm.timing[delay]
+
+    def reliable(value) -> bool:
+        sm.timing[delay] = value
+        rate = failure_rate(sm, trial, trials, hex_file)
+        report(f"  {delay} = {value:.4f} s: {rate:.0%} failed")
+        return rate <= target
+
+    try:
+        low = TIMING_MINIMUMS.get(delay, 0.0)
+        high = default
+        if not reliable(high):
+            report(f"  {delay} fails at its default; keeping it.")
+            return default
+        if reliable(low):
+            return low
+        for _ in range(steps):
+            middle = (low + high) / 2
+            if reliable(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+    finally:
+        sm.timing[delay] = saved
+
+
+def calibrate(sm, trials: int, target: float, hex_file=None,
+              margin=MARGIN, report=print) -> dict:
+    """Tunes each delay in turn, keeping the values already tuned, then
+    checks them all together. Delays whose trial fails with the combined
+    values go back to their defaults."""
+    delays = [d for d in TRIALS if hex_file or d not in UPLOAD_DELAYS]
+    tuned = {}
+    for delay in delays:
+        value = tune(sm, delay, trials, target, hex_file, report=report)
+        tuned[delay] = min(TIMING_DEFAULTS[delay],
+                           max(value * margin,
+                               TIMING_MINIMUMS.get(delay, 0.0)))
+        sm.timing[delay] = tuned[delay]
+        report(f"{delay}: {tuned[delay]:.4f} s "
+               f"(default {TIMING_DEFAULTS[delay]} s)")
+
+    for trial in dict.fromkeys(TRIALS[d] for d in delays):
+        rate = failure_rate(sm, trial, trials, hex_file)
+        if rate > target:
+            report(f"{trial.__name__} failed {rate:.0%} with the tuned "
+                   f"delays; restoring its defaults.")
+            for delay in delays:
+                if TRIALS[delay] is trial:
+                    tuned[delay] = TIMING_DEFAULTS[delay]
+                    sm.timing[delay] = TIMING_DEFAULTS[delay]
+    return tuned
+
+
+def adapter_name(port: str) -> str:
+    """Describes the USB-RS485 adapter on a port."""
+    for info in serialmanager.serial.tools.list_ports.comports():
+        if info.device == port:
+            return f"{info.description} ({info.hwid})"
+    return port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the shortest reliable serial delays for this "
+                    "station's adapter and board firmware, and save them as "
+                    "the timing profile the test utility loads.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-p", "--port", help="Serial port of the fixture.")
+    target.add_argument("--simulate", action="store_true",
+                        help="Tune against the board simulator.")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Simulated board latency in seconds.")
+    parser.add_argument("--erase-time", type=float, default=0.5,
+                        help="Simulated 1-wire erase time in seconds.")
+    parser.add_argument("-n", "--trials", type=int, default=10,
+                        help="Trials per candidate value.")
+    parser.add_argument("-t", "--target", type=float, default=0.0,
+                        help="Highest acceptable failure rate, 0 to 1.")
+    parser.add_argument("--hex", help="1-wire master hex file. The upload "
+                        "delays are only tuned when one is given.")
+    parser.add_argument("-o", "--output", default=DEFAULT_PROFILE,
+                        help="Timing profile to write.")
+    args = parser.parse_args(argv)
+
+    sm = serialmanager.SerialManager()
+    if args.simulate:
+        import simulator
+        sm.ser = simulator.BoardSimulator(latency=args.latency,
+                                          erase_time=args.erase_time)
+        adapter = "simulator"
+    else:
+        sm.open_port(args.port)
+        if not sm.ser.is_open:
+            print(f"Can't open {args.port}.")
+            return 1
+        adapter = adapter_name(args.port)
+
+    sm.flush_buffers()
+    firmware = sm.query_version()
+    if not firmware:
+        print("No board answered.")
+        return 1
+    print(f"Tuning {adapter}, firmware {firmware}.")
+
+    delays = calibrate(sm, args.trials, args.target, args.hex)
+    profile = {
+        "firmware": firmware,
+        "adapter": adapter,
+        "created": dt.now().isoformat(timespec="seconds"),
+        "trials": args.trials,
+        "target": args.target,
+        "delays": delays,
+    }
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"Saved {args.output}.")
+    sm.close_port()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,46 @@
 import os
 import re
-import threadlink
-import serialmanager
+import sys
+import sqlite3
+import importlib
 import model
+import policy
+import retest
 import report
-import sys
+import dashboard
+import hexfile
+import scanner
+import profiler
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QPushButton, QVBoxLayout, QApplication, QLabel,
     QLineEdit, QComboBox, QGridLayout, QGroupBox, QHBoxLayout,
     QMessageBox, QAction, QActionGroup, QFileDialog, QDialog, QMenu,
-    QDesktopWidget
+    QDesktopWidget, QDockWidget, QCheckBox, QDateEdit, QTableWidget,
+    QTableWidgetItem, QHeaderView, QStackedWidget
 )
 from PyQt5.QtGui import QPixmap, QFont
-from PyQt5.QtCore import QSettings, Qt, QThread
+from PyQt5.QtCore import (
+    QSettings, Qt, QThread, QTimer, QMetaObject, QDate, QDateTime, QTime,
+    pyqtSignal
+)
+
+# The serial, instrument, report writing and indexing stacks and the wizard
+# pages are imported when first used, so the window shows as early as
+# possible: start_services imports the background services once the window
+# is up, and each procedure's module is imported when its first test starts.
 
 VERSION_NUM = "0.2.0"
 
 WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 800
 
+# Interval in ms between polls of the fixture for a powered board.
+FIXTURE_POLL_INTERVAL = 1000
+# Time in ms after the last keystroke before start page inputs are checked.
+SCAN_DEBOUNCE_INTERVAL = 150
+
+INVALID_INPUT_STYLE = "QLineEdit {background: #ffb3a6}"
+
 ABOUT_TEXT = f"""
              PCB assembly test utility for threadlink boards. 
              Copyright Beaded Streams, 2019.
@@ -36,6 +58,12 @@ class ThreadlinkUtility(QMainWindow):
     Creates main window for the program, the file menu, status bar, and the 
     settings/configuration window.
     """
+    poll_signal = pyqtSignal()
+    measure_signal = pyqtSignal()
+    bench_signal = pyqtSignal(str, str, str)
+    report_signal = pyqtSignal(str, list)
+    report_dest_signal = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.system_font = QApplication.font().family()
@@ -50,38 +78,92 @@ class ThreadlinkUtility(QMainWindow):
             "port1_tac_id": "",
             "hex_files_path": "/path/to/hex/files",
             "report_dir_path": "/path/to/report/folder",
-            "atprogram_file_path": "/path/to/atprogram.exe"
+            "atprogram_file_path": "/path/to/atprogram.exe",
+            "capture_dir_path": os.path.join(os.path.expanduser("~"),
+                                             "threadlink_captures"),
+            "scanner_port": "",
+            "dmm_port": "",
+            "instrument_backend": "None",
+            "dmm_scpi_port": "",
+            "psu_scpi_port": "",
+            "spool_dir_path": os.path.join(os.path.expanduser("~"),
+                                           "threadlink_spool"),
+            "index_dir_path": os.path.join(os.path.expanduser("~"),
+                                           "threadlink_index"),
+            "hex_cache_dir_path": os.path.join(os.path.expanduser("~"),
+                                               "threadlink_hex_cache"),
+            "profile_dir_path": os.path.join(os.path.expanduser("~"),
+                                             "threadlink_profiles"),
+            "timing_profile_path": os.path.join(os.path.expanduser("~"),
+                                                "threadlink_timing.json"),
+            "profile_boards": "10",
+            "hex_record_bytes": str(hexfile.TOOLCHAIN_RECORD_BYTES),
+            "fail_fast": "Off"
         }
 
         for key in settings_defaults:
             if not self.settings.value(key):
                 self.settings.setValue(key, settings_defaults[key])
 
-        self.sm = serialmanager.SerialManager()
-        self.serial_thread = QThread()
-        self.sm.moveToThread(self.serial_thread)
-        self.serial_thread.start()
-
         self.m = model.Model()
         self.r = report.Report()
 
-        self.sm.port_unavailable_signal.connect(self.port_unavailable)
+        # Fixture watcher: polls for a board while no test commands are
+        # running, so a newly powered board can start the test by itself.
+        self.procedure = None
+        self.watching = False
+        self.fixture_timer = QTimer(self)
+        self.fixture_timer.setInterval(FIXTURE_POLL_INTERVAL)
+        self.fixture_timer.timeout.connect(self.poll_signal.emit)
 
         # Part number : [serial prefix, procedure class]
         self.product_data = {
-            "45211-01": ["THL", threadlink.Threadlink],
+            "45211-01": ["THL", "threadlink.Threadlink"],
         }
+        self.products = scanner.ProductTable(self.product_data)
+
+        # Start page inputs are checked shortly after typing stops, so
+        # keystroke-wedge scanner bursts are validated once, as they arrive.
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.setInterval(SCAN_DEBOUNCE_INTERVAL)
+        self.scan_timer.timeout.connect(self.check_inputs)
+
+        self.sm = None
+        self.report_index = None
+        self.peripherals = []
+        self.queue_lbl = QLabel()
+        self.statusBar().addPermanentWidget(self.queue_lbl)
+
         # Create program actions.
         self.config = QAction("Settings", self)
         self.config.setShortcut("Ctrl+E")
         self.config.setStatusTip("Program Settings")
         self.config.triggered.connect(self.configuration)
 
+        self.search = QAction("Search Reports", self)
+        self.search.setShortcut("Ctrl+F")
+        self.search.setStatusTip("Search test runs")
+        self.search.triggered.connect(self.search_reports)
+
         self.quit = QAction("Quit", self)
         self.quit.setShortcut("Ctrl+Q")
         self.quit.setStatusTip("Exit Program")
         self.quit.triggered.connect(self.close)
 
+        self.auto_detect = QAction("Auto-detect DUT", self)
+        self.auto_detect.setCheckable(True)
+        self.auto_detect.setChecked(
+            self.settings.value("auto_detect", False, type=bool))
+        self.auto_detect.setStatusTip("Start tests when a board is powered")
+        self.auto_detect.toggled.connect(self.toggle_auto_detect)
+
+        self.profile_action = QAction("Profile Boards", self)
+        self.profile_action.setCheckable(True)
+        self.profile_action.setStatusTip("Profile the next boards and save "
+                                         "the profile with the reports")
+        self.profile_action.toggled.connect(self.toggle_profiling)
+
         self.about_tu = QAction("About Threadlink Utility", self)
         self.about_tu.setShortcut("Ctrl+U")
         self.about_tu.setStatusTip("About Program")
@@ -96,6 +178,7 @@ class ThreadlinkUtility(QMainWindow):
         self.menubar = self.menuBar()
         self.file_menu = self.menubar.addMenu("&File")
         self.file_menu.addAction(self.config)
+        self.file_menu.addAction(self.search)
         self.file_menu.addAction(self.quit)
 
         self.serial_menu = self.menubar.addMenu("&Serial")
@@ -105,6 +188,26 @@ class ThreadlinkUtility(QMainWindow):
         self.ports_menu.aboutToShow.connect(self.populate_ports)
         self.ports_group = QActionGroup(self)
         self.ports_group.triggered.connect(self.connect_port)
+        self.serial_menu.addAction(self.auto_detect)
+
+        self.debug_menu = self.menubar.addMenu("&Debug")
+        self.debug_menu.addAction(self.profile_action)
+
+        # Shift dashboard, kept in a dock so it outlives the start page.
+        self.shift_stats = dashboard.ShiftStats()
+        self.shift_index = dashboard.ShiftIndex(
+            self.settings.value("index_dir_path"))
+        self.dashboard = dashboard.DashboardWidget()
+        self.dashboard_dock = QDockWidget("Dashboard", self)
+        self.dashboard_dock.setWidget(self.dashboard)
+        self.dashboard_dock.setVisible(
+            self.settings.value("show_dashboard", False, type=bool))
+        self.dashboard_dock.toggleViewAction().triggered.connect(
+            lambda visible: self.settings.setValue("show_dashboard", visible))
+        self.addDockWidget(Qt.RightDockWidgetArea, self.dashboard_dock)
+
+        self.view_menu = self.menubar.addMenu("&View")
+        self.view_menu.addAction(self.dashboard_dock.toggleViewAction())
 
         self.help_menu = self.menubar.addMenu("&Help")
         self.help_menu.addAction(self.about_tu)
@@ -113,6 +216,75 @@ class ThreadlinkUtility(QMainWindow):
         self.initUI()
         self.center()
 
+        self.profiler = None
+        self.profile_remaining = 0
+        if os.environ.get(profiler.PROFILE_ENV):
+            self.profile_action.setChecked(True)
+
+        # Start the background services once the window is showing.
+        QTimer.singleShot(0, self.start_services)
+
+    def start_services(self):
+        """Imports and starts the serial, instrument and report services
+        and loads the shift and report indexes."""
+        import serialmanager
+        import instruments
+        import report_writer
+        import report_index
+
+        self.sm = serialmanager.SerialManager()
+        self.sm.set_capture_dir(self.settings.value("capture_dir_path"))
+        # The station's tuned delays, if tune_serial.py has been run.
+        self.sm.load_timing(self.settings.value("timing_profile_path"))
+        self.serial_thread = QThread()
+        self.sm.moveToThread(self.serial_thread)
+        self.serial_thread.start()
+
+        self.sm.port_unavailable_signal.connect(self.port_unavailable)
+        self.sm.link_status_signal.connect(self.link_status)
+        self.sm.dut_detected.connect(self.dut_detected)
+        self.sm.dut_removed.connect(self.dut_removed)
+        self.sm.timing_mismatch_signal.connect(self.timing_mismatch)
+        self.poll_signal.connect(self.sm.poll_dut)
+
+        self.start_peripherals()
+
+        self.bench_worker = instruments.BenchWorker()
+        self.bench_thread = QThread()
+        self.bench_worker.moveToThread(self.bench_thread)
+        self.bench_thread.start()
+        self.measure_signal.connect(self.bench_worker.measure)
+        self.bench_signal.connect(self.bench_worker.set_backend)
+        self.bench_worker.measurements_ready.connect(self.measurements_ready)
+        self.bench_worker.bench_error_signal.connect(self.bench_error)
+        self.set_bench()
+
+        # Reports are spooled locally and replicated to the report directory
+        # in the background.
+        self.report_writer = report_writer.ReportWriter(
+            self.settings.value("spool_dir_path"))
+        self.report_thread = QThread()
+        self.report_writer.moveToThread(self.report_thread)
+        self.report_thread.started.connect(self.report_writer.start)
+        self.report_signal.connect(self.report_writer.submit)
+        self.report_dest_signal.connect(self.report_writer.set_destination)
+        self.report_writer.queue_depth_signal.connect(self.report_queue_depth)
+        self.report_writer.replication_error_signal.connect(
+            self.replication_error)
+        self.report_writer.spool_error_signal.connect(self.spool_error)
+        self.report_writer.report_replicated.connect(self.report_replicated)
+        self.report_thread.start()
+        self.report_dest_signal.emit(self.settings.value("report_dir_path"))
+
+        self.shift_index.load_shift(self.shift_stats)
+        self.dashboard.update_stats(self.shift_stats)
+        try:
+            self.report_index = report_index.ReportIndex(os.path.join(
+                self.settings.value("index_dir_path"),
+                report_index.INDEX_FILE))
+        except (OSError, sqlite3.Error):
+            self.report_index = None
+
     def center(self):
         """Centers the application on the screen the mouse pointer is
         currently on."""
@@ -134,7 +306,7 @@ class ThreadlinkUtility(QMainWindow):
         """"Sets up the UI."""
         RIGHT_SPACING = 350
         LINE_EDIT_WIDTH = 200
-        self.central_widget = QWidget()
+        self.start_page = QWidget()
 
         self.tester_id_lbl = QLabel("Please enter tester ID: ")
         self.tester_id_lbl.setFont(self.label_font)
@@ -145,12 +317,19 @@ class ThreadlinkUtility(QMainWindow):
 
         self.tester_id_input = QLineEdit()
         self.tester_id_input.setText(self.settings.value("user_id"))
+        self.tester_id_input.textEdited.connect(
+            lambda: self.scan_timer.start())
+        self.tester_id_input.returnPressed.connect(self.input_entered)
         self.pcba_sn_input = QLineEdit()
+        self.pcba_sn_input.textEdited.connect(lambda: self.scan_timer.start())
+        self.pcba_sn_input.returnPressed.connect(self.input_entered)
         self.tester_id_input.setFixedWidth(LINE_EDIT_WIDTH)
         self.pcba_sn_input.setFixedWidth(LINE_EDIT_WIDTH)
 
         self.pcba_pn_input = QComboBox()
-        self.pcba_pn_input.addItem("45211-01")
+        self.pcba_pn_input.addItems(self.product_data.keys())
+        self.pcba_pn_input.currentTextChanged.connect(
+            lambda: self.scan_timer.start())
         self.pcba_pn_input.setFixedWidth(LINE_EDIT_WIDTH)
 
         self.start_btn = QPushButton("Start")
@@ -204,14 +383,37 @@ class ThreadlinkUtility(QMainWindow):
         vbox.addLayout(hbox_start_btn)
         vbox.addStretch()
 
-        self.central_widget.setLayout(vbox)
-        self.setCentralWidget(self.central_widget)
+        self.start_page.setLayout(vbox)
+
+        # The start page and the procedure page are built once and swapped
+        # between boards. Procedures are created on their first board and
+        # reset for every board after that.
+        self.procedures = {}
+        self.procedure_page = None
+        self.stack = QStackedWidget()
+        self.stack.addWidget(self.start_page)
+        self.setCentralWidget(self.stack)
         self.setFixedSize(WINDOW_WIDTH, WINDOW_HEIGHT)
         self.setWindowTitle("BeadedStream Manufacturing Threadlink Test Utility")
 
+        self.show_start_page()
+
+    def show_start_page(self):
+        """Returns to the start page, ready for the next board."""
+        self.tester_id_input.setText(self.settings.value("user_id"))
+        self.pcba_sn_input.clear()
+        self.pcba_sn_input.setStyleSheet("")
+        self.stack.setCurrentWidget(self.start_page)
+        self.pcba_sn_input.setFocus()
+
+        self.procedure = None
+        self.set_watching(True)
+
     def create_messagebox(self, type, title, text, info_text):
         """A helper method for creating message boxes."""
         msgbox = QMessageBox(self)
+        # Delete on close so boxes don't pile up over a shift.
+        msgbox.setAttribute(Qt.WA_DeleteOnClose)
         msgbox.setWindowTitle(title)
         msgbox.setText(text)
         msgbox.setInformativeText(info_text)
@@ -235,8 +437,11 @@ class ThreadlinkUtility(QMainWindow):
 
     def populate_ports(self):
         """Populates ports menu from connected COM ports."""
-        ports = serialmanager.SerialManager.scan_ports()
         self.ports_menu.clear()
+        if self.sm is None:
+            self.ports_menu.addAction("Starting up...")
+            return
+        ports = self.sm.scan_ports()
 
         if not ports:
             self.ports_menu.addAction("None")
@@ -256,18 +461,315 @@ class ThreadlinkUtility(QMainWindow):
         menu object."""
         p = "COM[0-9]+"
         m = re.search(p, action.text())
+        if self.sm is None:
+            return
         if m:
             port_name = m.group()
             self.sm.open_port(port_name)
         else:
             QMessageBox.warning(self, "Warning", "Invalid port selection!")
 
+    def link_status(self, healthy: bool):
+        """Shows the serial link health in the status bar."""
+        if healthy:
+            self.statusBar().showMessage("Serial link OK.", 5000)
+        else:
+            self.statusBar().showMessage("Serial link error, resyncing...")
+
+    def check_inputs(self):
+        """Highlights invalid start page inputs and returns the first input
+        that still needs a value, or None if all of them are valid."""
+        tester_id = self.tester_id_input.text().strip().upper()
+        pcba_pn = self.pcba_pn_input.currentText()
+        pcba_sn = self.pcba_sn_input.text().strip().upper()
+
+        inputs = [
+            (self.tester_id_input, tester_id,
+             self.products.valid_tester_id(tester_id)),
+            (self.pcba_sn_input, pcba_sn,
+             self.products.valid_serial(pcba_sn, pcba_pn)),
+        ]
+
+        pending = None
+        for widget, value, valid in inputs:
+            widget.setStyleSheet(
+                INVALID_INPUT_STYLE if value and not valid else "")
+            if not valid and not pending:
+                pending = widget
+        return pending
+
+    def input_entered(self):
+        """Moves on to the next input that needs a value, and starts the
+        test once every input is valid."""
+        self.scan_timer.stop()
+        pending = self.check_inputs()
+        if pending:
+            pending.setFocus()
+            pending.selectAll()
+            return
+
+        if self.sm is None:
+            # The start inputs work before the services have started.
+            self.statusBar().showMessage("Starting up...", 5000)
+            return
+
+        if self.auto_detect.isChecked() and not self.sm.dut_present:
+            self.statusBar().showMessage("Waiting for DUT...")
+            return
+
+        self.parse_values()
+
+    def scan_received(self, text: str):
+        """Routes a serial barcode scan to the start page input it belongs
+        to."""
+        if self.procedure:
+            self.statusBar().showMessage(f"Scan ignored during test: {text}",
+                                         5000)
+            return
+
+        field, value = self.products.classify(text)
+        if field == "pcba_pn":
+            self.pcba_pn_input.setCurrentText(value)
+        elif field == "pcba_sn":
+            self.pcba_sn_input.setText(value)
+        elif (self.products.valid_tester_id(value) and
+              (not self.tester_id_input.text() or
+               self.tester_id_input.hasFocus())):
+            # Only into an empty or focused field, so a stray scan doesn't
+            # replace the tester ID.
+            self.tester_id_input.setText(value)
+        else:
+            self.statusBar().showMessage(f"Unrecognised scan: {text}", 5000)
+            return
+
+        self.input_entered()
+
+    def dmm_received(self, text: str):
+        """Passes a meter reading on to the current procedure page."""
+        try:
+            value, unit = scanner.parse_reading(text)
+        except ValueError:
+            self.statusBar().showMessage(f"Bad meter reading: {text}", 5000)
+            return
+
+        if self.procedure:
+            self.procedure.measurement_received(value, unit)
+
+    def start_peripherals(self):
+        """Starts a line reader thread for each configured serial
+        peripheral."""
+        self.stop_peripherals()
+
+        peripherals = {"scanner_port": self.scan_received,
+                       "dmm_port": self.dmm_received}
+
+        for key, slot in peripherals.items():
+            port = self.settings.value(key)
+            if not port:
+                continue
+            reader = scanner.SerialLineReader(port)
+            thread = QThread()
+            reader.moveToThread(thread)
+            thread.started.connect(reader.run)
+            reader.line_received.connect(slot)
+            reader.port_error_signal.connect(self.peripheral_error)
+            thread.start()
+            self.peripherals.append((reader, thread))
+
+    def stop_peripherals(self):
+        """Stops all peripheral line reader threads."""
+        for reader, thread in self.peripherals:
+            reader.stop()
+            thread.quit()
+            thread.wait()
+        self.peripherals = []
+
+    def peripheral_error(self, port: str):
+        """Shows a peripheral port error in the status bar."""
+        self.statusBar().showMessage(f"Can't read from {port}!")
+
+    def set_bench(self):
+        """Sets up the instrument backend from the settings."""
+        self.bench_signal.emit(self.settings.value("instrument_backend"),
+                               self.settings.value("dmm_scpi_port"),
+                               self.settings.value("psu_scpi_port"))
+
+    def bench_available(self) -> bool:
+        """Returns True if instruments take the Setup measurements."""
+        return self.settings.value("instrument_backend") != "None"
+
+    def start_measurement(self):
+        """Takes all the Setup measurements on the bench instruments."""
+        self.measure_signal.emit()
+
+    def measurements_ready(self, values: dict):
+        """Passes the bench measurements on to the current procedure
+        page."""
+        if self.procedure:
+            self.procedure.measurements_ready(values)
+
+    def bench_error(self, error: str):
+        """Displays an instrument error."""
+        QMessageBox.warning(self, "Warning", f"Instrument error: {error}")
+        if self.procedure:
+            self.procedure.measurements_ready({})
+
+    def submit_report(self, name: str, rows: list):
+        """Queues a finished report for writing."""
+        self.report_signal.emit(name, rows)
+
+    def report_finalized(self, report, path, phase_times: dict, skipped=()):
+        """Adds a finalized board to the report index, the shift index and
+        the dashboard."""
+        entry = dashboard.summarize(report, phase_times, skipped)
+        try:
+            self.shift_index.append(entry)
+        except OSError:
+            self.statusBar().showMessage("Can't write shift index!", 5000)
+        if self.report_index:
+            # Indexed at its spool path until it has been replicated.
+            spool_path = self.report_writer.spool_dir.joinpath(
+                os.path.basename(path))
+            try:
+                self.report_index.add(spool_path, entry["sn"],
+                                      report.data.value("pcba_pn"),
+                                      entry["tester_id"], entry["time"],
+                                      entry["result"], entry["failed"])
+            except (OSError, sqlite3.Error):
+                self.statusBar().showMessage("Can't write report index!",
+                                             5000)
+        self.shift_stats.add(entry)
+        self.dashboard.update_stats(self.shift_stats)
+
+        if self.profiler:
+            self.profile_remaining -= 1
+            if self.profile_remaining <= 0:
+                self.profile_action.setChecked(False)
+
+    def report_replicated(self, path: str):
+        """Points the report index at a report's replicated copy."""
+        if not self.report_index:
+            return
+        spool_path = self.report_writer.spool_dir.joinpath(
+            os.path.basename(path))
+        try:
+            self.report_index.move(spool_path, path)
+        except sqlite3.Error:
+            self.statusBar().showMessage("Can't write report index!", 5000)
+
+    def report_queue_depth(self, depth: int):
+        """Shows the number of reports waiting to be replicated."""
+        self.queue_lbl.setText(f"Reports queued: {depth}" if depth else "")
+
+    def replication_error(self, error: str):
+        """Shows a report replication error in the status bar."""
+        self.statusBar().showMessage(f"Report not replicated, retrying: "
+                                     f"{error}", 10000)
+
+    def spool_error(self, name: str, error: str):
+        """Shows that a report couldn't be written on the final page, or
+        on its own if the board has moved on."""
+        if self.procedure:
+            self.procedure.final_page.report_error(name, error)
+        else:
+            QMessageBox.warning(self, "Warning", f"Report {name} not "
+                                f"written: {error}")
+
+    def toggle_profiling(self, checked: bool):
+        """Starts profiling the next boards, or stops and saves the
+        profile. The number of boards comes from the environment variable
+        if it's set, otherwise from the settings."""
+        if checked:
+            boards = os.environ.get(profiler.PROFILE_ENV) or \
+                self.settings.value("profile_boards")
+            try:
+                self.profile_remaining = max(int(boards), 1)
+            except ValueError:
+                self.profile_remaining = 1
+            self.profiler = profiler.SamplingProfiler()
+            self.profiler.start()
+            self.statusBar().showMessage(
+                f"Profiling the next {self.profile_remaining} boards.", 5000)
+        elif self.profiler:
+            self.save_profile()
+
+    def save_profile(self):
+        """Stops the profiler and writes the profile to the local profile
+        directory, not the report share, as it's written on the GUI
+        thread."""
+        self.profiler.stop()
+        timestamp = QDateTime.currentDateTime().toString("yyyy-MM-dd hh-mm-ss")
+        name = f"profile_{timestamp}.folded"
+        profile_dir = self.settings.value("profile_dir_path")
+        path = os.path.join(profile_dir, name)
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            self.profiler.write(path)
+            self.statusBar().showMessage(f"Profile saved to {path}.", 10000)
+        except OSError:
+            self.statusBar().showMessage("Can't write profile!", 10000)
+        self.profiler = None
+
+    def toggle_auto_detect(self, checked: bool):
+        """Enables or disables the fixture watcher."""
+        self.settings.setValue("auto_detect", checked)
+        self.set_watching(self.watching)
+
+    def set_watching(self, watching: bool):
+        """Starts or stops polling the fixture. Polling only runs while
+        auto-detect is on and no test commands can be in flight."""
+        self.watching = watching
+        if watching and self.auto_detect.isChecked():
+            self.fixture_timer.start()
+        else:
+            self.fixture_timer.stop()
+
+    def page_changed(self):
+        """Only watch the fixture on pages that don't use the serial port."""
+        page = self.procedure.currentPage()
+        self.set_watching(getattr(page, "watch_fixture", False))
+
+    def timing_mismatch(self, profile_version: str, version: str):
+        """Shows that the tuned serial delays aren't used for this board."""
+        self.statusBar().showMessage(
+            f"Timing profile is for firmware {profile_version}, board has "
+            f"{version}; using the default delays.", 10000)
+
+    def dut_detected(self, version: str):
+        """Handles a newly powered board by starting the test or moving the
+        current procedure on."""
+        if version:
+            self.statusBar().showMessage(
+                f"DUT detected, firmware {version}.", 5000)
+        else:
+            self.statusBar().showMessage("DUT detected.", 5000)
+
+        if not self.auto_detect.isChecked():
+            return
+
+        if self.procedure:
+            self.procedure.dut_detected(version)
+        elif self.tester_id_input.text() and self.pcba_sn_input.text():
+            self.parse_values()
+        else:
+            self.pcba_sn_input.setFocus()
+
+    def dut_removed(self):
+        """Handles a board being removed from the fixture."""
+        self.statusBar().showMessage("DUT removed.", 5000)
+        if self.procedure and self.auto_detect.isChecked():
+            self.procedure.dut_removed()
+
     def port_unavailable(self):
         """Displays warning message about unavailable port."""
         QMessageBox.warning(self, "Warning", "Port unavailable!")
 
     def parse_values(self):
         """Parses and validates input values from the start page."""
+        if self.sm is None:
+            self.statusBar().showMessage("Starting up...", 5000)
+            return
+
         self.tester_id = self.tester_id_input.text().upper()
         self.settings.setValue("user_id", self.tester_id)
         self.pcba_pn = self.pcba_pn_input.currentText()
@@ -275,13 +777,13 @@ class ThreadlinkUtility(QMainWindow):
 
         if (self.tester_id and self.pcba_pn and self.pcba_sn):
 
-            # The serial number should be seven characters long and start with
-            # the specific prefix for the given product.
-            if (self.pcba_sn[0:3] == self.product_data[self.pcba_pn][0] and
-                    len(self.pcba_sn) == 7):
+            if self.products.valid_serial(self.pcba_sn, self.pcba_pn):
+                # Each board gets its own report.
+                self.r = report.Report()
                 self.r.write_data("tester_id", self.tester_id, "PASS")
                 self.r.write_data("pcba_sn", self.pcba_sn, "PASS")
                 self.r.write_data("pcba_pn", self.pcba_pn, "PASS")
+                self.sm.new_session(self.pcba_sn)
             else:
                 self.err_msg = self.create_messagebox("Warning", "Error",
                                                       "Error",
@@ -294,47 +796,109 @@ class ThreadlinkUtility(QMainWindow):
             self.err_msg.show()
             return
 
-        self.start_procedure()
-
-    def start_procedure(self):
-        """Sets up procedure layout by creating test statuses and initializing
-        the appropriate board class (currently D505, potentially others in 
-        the future)."""
-        central_widget = QWidget()
-
-        status_lbl_stylesheet = ("QLabel {border: 2px solid grey;"
-                                 "color: black; font-size: 20px}")
-        status_style_pass = """QLabel {background: #8cff66;
-                                border: 2px solid grey; font-size: 20px}"""
-
+        skip_phases = self.check_retest()
+        self.start_procedure(skip_phases)
+        if skip_phases:
+            self.show_previous_results(skip_phases)
+
+    def check_retest(self) -> set:
+        """Looks up the board's last run. If it failed, offers to rerun only
+        the failed phases and the phases that depend on them, and merges the
+        earlier passing results into the new report. Returns the phases to
+        skip."""
+        if not self.report_index:
+            return set()
+
+        try:
+            runs = self.report_index.search(sn=self.pcba_sn)
+        except sqlite3.Error:
+            return set()
+        if not runs or runs[-1]["result"] != "FAIL":
+            return set()
+
+        # The report may not have left the spool yet.
+        path = runs[-1]["path"]
+        if not os.path.isfile(path):
+            path = os.path.join(self.settings.value("spool_dir_path"),
+                                os.path.basename(path))
+        try:
+            previous = retest.load_report(path)
+        except (OSError, ValueError):
+            return set()
+
+        rerun = retest.phases_to_rerun(previous)
+        skip_phases = set(retest.PHASES) - set(rerun)
+        if not skip_phases:
+            return set()
+
+        msg = (f"{self.pcba_sn} failed its last run. Rerun only: "
+               f"{', '.join(rerun)}?")
+        confirmation = QMessageBox.question(self, "Retest", msg,
+                                            QMessageBox.Yes, QMessageBox.No)
+        if confirmation != QMessageBox.Yes:
+            return set()
+
+        retest.merge(self.r.data, previous, skip_phases)
+        return skip_phases
+
+    def show_previous_results(self, skip_phases):
+        """Marks the status labels of skipped phases as passed earlier."""
+        labels = {
+            "setup": [self.input_i_status, self.supply_5v_status,
+                      self.output_2p5v_status, self.supply_1p8v_status],
+            "program": [self.xmega_prog_status, self.one_wire_prog_status],
+            "interfaces": [self.internal_5v_status, self.tac_id_status,
+                           self.hall_effect_status, self.led_test_status],
+        }
+        for phase in skip_phases:
+            for label in labels[phase]:
+                name = label.text().split(":")[0]
+                label.setText(f"{name}: PASS (previous run)")
+                label.setStyleSheet(self.procedure.status_style_pass)
+
+    def start_procedure(self, skip_phases=()):
+        """Shows the procedure page and starts the procedure for the part
+        number. Each part number's procedure is created on its first board
+        and reset for the boards after it."""
+        self.scan_timer.stop()
+        if not self.procedure_page:
+            self.create_procedure_page()
+        self.reset_statuses()
+
+        # Use the product data dictionary to find the procdure class that
+        # corresponds to the part number. Create an instance of it passing it
+        # the instances of test_utility, model, serial_manager and report.
+        if self.pcba_pn not in self.procedures:
+            procedure_class = self.procedure_class(self.pcba_pn)
+            procedure = procedure_class(self, self.m, self.sm, self.r)
+            procedure.currentIdChanged.connect(self.page_changed)
+            self.procedure_grid.addWidget(procedure, 0, 1)
+            self.procedures[self.pcba_pn] = procedure
+
+        self.procedure = self.procedures[self.pcba_pn]
+        for procedure in self.procedures.values():
+            procedure.setVisible(procedure is self.procedure)
+        self.procedure.new_board(self.r, skip_phases)
+
+        self.stack.setCurrentWidget(self.procedure_page)
+        self.page_changed()
+
+    def create_procedure_page(self):
+        """Creates the procedure page with its test statuses."""
         # ______Labels______
-        self.tester_id_status = QLabel(f"Tester ID: {self.tester_id}")
-        self.pcba_pn_status = QLabel(f"PCBA PN: {self.pcba_pn}")
-        self.pcba_sn_status = QLabel(f"PCBA SN: {self.pcba_sn}")
-        self.input_i_status = QLabel(f"Input Current: _____ mA")
-        self.supply_5v_status = QLabel("5V Supply: _____V")
-        self.output_2p5v_status = QLabel("2.5V Output: _____V")
-        self.supply_1p8v_status = QLabel("1.8V Supply: _____V")
-        self.xmega_prog_status = QLabel("XMega Programming: _____")
-        self.one_wire_prog_status = QLabel("1-Wire Programming:_____")
-        self.internal_5v_status = QLabel("Internal 5V: _____V")
-        self.tac_id_status = QLabel("TAC ID: _____")
-        self.hall_effect_status = QLabel("Hall Effect Sensor Test:_____")
-        self.led_test_status = QLabel("LED Test:_____")
-
-        self.tester_id_status.setStyleSheet(status_style_pass)
-        self.pcba_pn_status.setStyleSheet(status_style_pass)
-        self.pcba_sn_status.setStyleSheet(status_style_pass)
-        self.input_i_status.setStyleSheet(status_lbl_stylesheet)
-        self.supply_5v_status.setStyleSheet(status_lbl_stylesheet)
-        self.output_2p5v_status.setStyleSheet(status_lbl_stylesheet)
-        self.supply_1p8v_status.setStyleSheet(status_lbl_stylesheet)
-        self.xmega_prog_status.setStyleSheet(status_lbl_stylesheet)
-        self.one_wire_prog_status.setStyleSheet(status_lbl_stylesheet)
-        self.internal_5v_status.setStyleSheet(status_lbl_stylesheet)
-        self.tac_id_status.setStyleSheet(status_lbl_stylesheet)
-        self.hall_effect_status.setStyleSheet(status_lbl_stylesheet)
-        self.led_test_status.setStyleSheet(status_lbl_stylesheet)
+        self.tester_id_status = QLabel()
+        self.pcba_pn_status = QLabel()
+        self.pcba_sn_status = QLabel()
+        self.input_i_status = QLabel()
+        self.supply_5v_status = QLabel()
+        self.output_2p5v_status = QLabel()
+        self.supply_1p8v_status = QLabel()
+        self.xmega_prog_status = QLabel()
+        self.one_wire_prog_status = QLabel()
+        self.internal_5v_status = QLabel()
+        self.tac_id_status = QLabel()
+        self.hall_effect_status = QLabel()
+        self.led_test_status = QLabel()
 
         # ______Layout______
         status_vbox1 = QVBoxLayout()
@@ -358,30 +922,49 @@ class ThreadlinkUtility(QMainWindow):
         status_group.setFont(self.label_font)
         status_group.setLayout(status_vbox1)
 
-        # Use the product data dictionary to call the procdure class that
-        # corresponds to the part number. Create an instance of it passing it
-        # the instances of test_utility, model, serial_manager and report.
-        self.procedure = self.product_data[self.pcba_pn][1](self, self.m,
-                                                            self.sm, self.r)
-
-        grid = QGridLayout()
-        grid.setColumnStretch(0, 5)
-        grid.setColumnStretch(1, 15)
-        grid.addWidget(status_group, 0, 0, Qt.AlignTop)
-        grid.addWidget(self.procedure, 0, 1)
+        self.procedure_grid = QGridLayout()
+        self.procedure_grid.setColumnStretch(0, 5)
+        self.procedure_grid.setColumnStretch(1, 15)
+        self.procedure_grid.addWidget(status_group, 0, 0, Qt.AlignTop)
 
-        # layout = QHBoxLayout()
-        # layout.addWidget(self.procedure)
+        self.procedure_page = QWidget()
+        self.procedure_page.setLayout(self.procedure_grid)
+        self.stack.addWidget(self.procedure_page)
 
-        central_widget.setLayout(grid)
+    def reset_statuses(self):
+        """Sets the test statuses for a new board."""
+        status_lbl_stylesheet = ("QLabel {border: 2px solid grey;"
+                                 "color: black; font-size: 20px}")
+        status_style_pass = """QLabel {background: #8cff66;
+                                border: 2px solid grey; font-size: 20px}"""
 
-        self.setCentralWidget(central_widget)
+        statuses = [
+            (self.tester_id_status, f"Tester ID: {self.tester_id}"),
+            (self.pcba_pn_status, f"PCBA PN: {self.pcba_pn}"),
+            (self.pcba_sn_status, f"PCBA SN: {self.pcba_sn}"),
+            (self.input_i_status, "Input Current: _____ mA"),
+            (self.supply_5v_status, "5V Supply: _____V"),
+            (self.output_2p5v_status, "2.5V Output: _____V"),
+            (self.supply_1p8v_status, "1.8V Supply: _____V"),
+            (self.xmega_prog_status, "XMega Programming: _____"),
+            (self.one_wire_prog_status, "1-Wire Programming:_____"),
+            (self.internal_5v_status, "Internal 5V: _____V"),
+            (self.tac_id_status, "TAC ID: _____"),
+            (self.hall_effect_status, "Hall Effect Sensor Test:_____"),
+            (self.led_test_status, "LED Test:_____"),
+        ]
+        for i, (label, text) in enumerate(statuses):
+            label.setText(text)
+            # The board's identity is already known to be good.
+            label.setStyleSheet(
+                status_style_pass if i < 3 else status_lbl_stylesheet)
 
     def configuration(self):
         """Sets up configuration/settings window elements."""
         FILE_BTN_WIDTH = 30
 
         self.settings_widget = QDialog(self)
+        self.settings_widget.setAttribute(Qt.WA_DeleteOnClose)
 
         port1_lbl = QLabel("Port 1 TAC ID:")
         port1_lbl.setFont(self.config_font)
@@ -394,6 +977,93 @@ class ThreadlinkUtility(QMainWindow):
         port_group = QGroupBox("TAC IDs")
         port_group.setLayout(port_layout)
 
+        scanner_lbl = QLabel("Barcode scanner port:")
+        scanner_lbl.setFont(self.config_font)
+        self.scanner_port = QLineEdit(self.settings.value("scanner_port"))
+        dmm_lbl = QLabel("Meter port:")
+        dmm_lbl.setFont(self.config_font)
+        self.dmm_port = QLineEdit(self.settings.value("dmm_port"))
+
+        peripheral_layout = QGridLayout()
+        peripheral_layout.addWidget(scanner_lbl, 0, 0)
+        peripheral_layout.addWidget(self.scanner_port, 0, 1)
+        peripheral_layout.addWidget(dmm_lbl, 1, 0)
+        peripheral_layout.addWidget(self.dmm_port, 1, 1)
+
+        peripheral_group = QGroupBox("Peripherals")
+        peripheral_group.setLayout(peripheral_layout)
+
+        backend_lbl = QLabel("Instrument backend:")
+        backend_lbl.setFont(self.config_font)
+        self.instrument_backend = QComboBox()
+        self.instrument_backend.addItems(["None", "Simulated", "SCPI"])
+        self.instrument_backend.setCurrentText(
+            self.settings.value("instrument_backend"))
+        dmm_scpi_lbl = QLabel("DMM port:")
+        dmm_scpi_lbl.setFont(self.config_font)
+        self.dmm_scpi_port = QLineEdit(self.settings.value("dmm_scpi_port"))
+        psu_scpi_lbl = QLabel("Power supply port:")
+        psu_scpi_lbl.setFont(self.config_font)
+        self.psu_scpi_port = QLineEdit(self.settings.value("psu_scpi_port"))
+
+        instrument_layout = QGridLayout()
+        instrument_layout.addWidget(backend_lbl, 0, 0)
+        instrument_layout.addWidget(self.instrument_backend, 0, 1)
+        instrument_layout.addWidget(dmm_scpi_lbl, 1, 0)
+        instrument_layout.addWidget(self.dmm_scpi_port, 1, 1)
+        instrument_layout.addWidget(psu_scpi_lbl, 2, 0)
+        instrument_layout.addWidget(self.psu_scpi_port, 2, 1)
+
+        instrument_group = QGroupBox("Instruments")
+        instrument_group.setLayout(instrument_layout)
+
+        profile_lbl = QLabel("Boards to profile:")
+        profile_lbl.setFont(self.config_font)
+        self.profile_boards = QLineEdit(self.settings.value("profile_boards"))
+
+        profile_layout = QGridLayout()
+        profile_layout.addWidget(profile_lbl, 0, 0)
+        profile_layout.addWidget(self.profile_boards, 0, 1)
+
+        profile_group = QGroupBox("Profiling")
+        profile_group.setLayout(profile_layout)
+
+        fail_fast_lbl = QLabel("On a failed board:")
+        fail_fast_lbl.setFont(self.config_font)
+        self.fail_fast = QComboBox()
+        self.fail_fast.addItems(policy.MODES)
+        self.fail_fast.setCurrentText(self.settings.value("fail_fast"))
+        self.fail_fast.setToolTip(
+            "Off: run every phase.\n"
+            "Stop: skip the rest of the test.\n"
+            "Diagnose: skip programming and the tests that need it,\n"
+            "run the remaining tests.")
+
+        fail_fast_layout = QGridLayout()
+        fail_fast_layout.addWidget(fail_fast_lbl, 0, 0)
+        fail_fast_layout.addWidget(self.fail_fast, 0, 1)
+
+        fail_fast_group = QGroupBox("Fail-fast")
+        fail_fast_group.setLayout(fail_fast_layout)
+
+        record_bytes_lbl = QLabel("Bytes per record:")
+        record_bytes_lbl.setFont(self.config_font)
+        self.hex_record_bytes = QComboBox()
+        self.hex_record_bytes.addItems(
+            [str(size) for size in hexfile.RECORD_SIZES])
+        self.hex_record_bytes.setCurrentText(
+            self.settings.value("hex_record_bytes"))
+        self.hex_record_bytes.setToolTip(
+            "16 uploads the file as the toolchain wrote it. Longer records\n"
+            "upload faster, if the 1-wire master's bootloader takes them.")
+
+        upload_layout = QGridLayout()
+        upload_layout.addWidget(record_bytes_lbl, 0, 0)
+        upload_layout.addWidget(self.hex_record_bytes, 0, 1)
+
+        upload_group = QGroupBox("1-wire upload")
+        upload_group.setLayout(upload_layout)
+
         self.hex_btn = QPushButton("[...]")
         self.hex_btn.setFixedWidth(FILE_BTN_WIDTH)
         self.hex_btn.clicked.connect(self.set_hex_dir)
@@ -422,6 +1092,15 @@ class ThreadlinkUtility(QMainWindow):
         self.atprogram_path_lbl.setFont(self.config_path_font)
         self.atprogram_path_lbl.setStyleSheet("QLabel {color: blue}")
 
+        self.capture_btn = QPushButton("[...]")
+        self.capture_btn.setFixedWidth(FILE_BTN_WIDTH)
+        self.capture_btn.clicked.connect(self.set_capture_location)
+        self.capture_lbl = QLabel("Set serial capture location: ")
+        self.capture_lbl.setFont(self.config_font)
+        self.capture_path_lbl = QLabel(self.settings.value("capture_dir_path"))
+        self.capture_path_lbl.setFont(self.config_path_font)
+        self.capture_path_lbl.setStyleSheet("QLabel {color: blue}")
+
         save_loc_layout = QGridLayout()
         save_loc_layout.addWidget(self.hex_lbl, 0, 0)
         save_loc_layout.addWidget(self.hex_btn, 0, 1)
@@ -432,6 +1111,9 @@ class ThreadlinkUtility(QMainWindow):
         save_loc_layout.addWidget(self.atprogram_lbl, 4, 0)
         save_loc_layout.addWidget(self.atprogram_btn, 4, 1)
         save_loc_layout.addWidget(self.atprogram_path_lbl, 5, 0)
+        save_loc_layout.addWidget(self.capture_lbl, 6, 0)
+        save_loc_layout.addWidget(self.capture_btn, 6, 1)
+        save_loc_layout.addWidget(self.capture_path_lbl, 7, 0)
 
         save_loc_group = QGroupBox("Save Locations")
         save_loc_group.setLayout(save_loc_layout)
@@ -448,6 +1130,11 @@ class ThreadlinkUtility(QMainWindow):
 
         hbox_top = QHBoxLayout()
         hbox_top.addWidget(port_group)
+        hbox_top.addWidget(peripheral_group)
+        hbox_top.addWidget(instrument_group)
+        hbox_top.addWidget(profile_group)
+        hbox_top.addWidget(fail_fast_group)
+        hbox_top.addWidget(upload_group)
 
         hbox_bottom = QHBoxLayout()
         # hbox_bottom.addStretch()
@@ -472,6 +1159,82 @@ class ThreadlinkUtility(QMainWindow):
         # frameGm.moveCenter(centerPoint)
         # self.settings_widget.move(frameGm.topLeft())
 
+    def procedure_class(self, pcba_pn: str):
+        """Imports and returns the procedure class for a part number."""
+        module_name, class_name = self.product_data[pcba_pn][1].split(".")
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def search_reports(self):
+        """Sets up the report search window."""
+        if not self.report_index:
+            QMessageBox.warning(self, "Warning", "Report index unavailable!")
+            return
+
+        self.search_widget = QDialog(self)
+        self.search_widget.setAttribute(Qt.WA_DeleteOnClose)
+
+        self.search_sn = QLineEdit()
+        self.search_tester = QLineEdit()
+        self.search_dates = QCheckBox("Between dates:")
+        self.search_start = QDateEdit(QDate.currentDate().addDays(-7))
+        self.search_start.setCalendarPopup(True)
+        self.search_end = QDateEdit(QDate.currentDate())
+        self.search_end.setCalendarPopup(True)
+
+        search_btn = QPushButton("Search")
+        search_btn.setAutoDefault(True)
+        search_btn.clicked.connect(self.run_search)
+        self.search_sn.returnPressed.connect(self.run_search)
+        self.search_tester.returnPressed.connect(self.run_search)
+
+        self.search_table = QTableWidget(0, 5)
+        self.search_table.setHorizontalHeaderLabels(
+            ["Time", "PCBA SN", "Tester ID", "Result", "Report"])
+        self.search_table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeToContents)
+        self.search_table.horizontalHeader().setStretchLastSection(True)
+
+        criteria_layout = QGridLayout()
+        criteria_layout.addWidget(QLabel("PCBA SN:"), 0, 0)
+        criteria_layout.addWidget(self.search_sn, 0, 1)
+        criteria_layout.addWidget(QLabel("Tester ID:"), 0, 2)
+        criteria_layout.addWidget(self.search_tester, 0, 3)
+        criteria_layout.addWidget(self.search_dates, 1, 0)
+        criteria_layout.addWidget(self.search_start, 1, 1)
+        criteria_layout.addWidget(self.search_end, 1, 3)
+        criteria_layout.addWidget(search_btn, 1, 4)
+
+        vbox = QVBoxLayout()
+        vbox.addLayout(criteria_layout)
+        vbox.addWidget(self.search_table)
+
+        self.search_widget.setLayout(vbox)
+        self.search_widget.setWindowTitle("Search Reports")
+        self.search_widget.resize(1000, 600)
+        self.search_widget.show()
+
+    def run_search(self):
+        """Searches the report index and lists the matching runs."""
+        start = end = None
+        if self.search_dates.isChecked():
+            start = QDateTime(self.search_start.date(),
+                              QTime(0, 0)).toSecsSinceEpoch()
+            end = QDateTime(self.search_end.date().addDays(1),
+                            QTime(0, 0)).toSecsSinceEpoch() - 0.001
+
+        runs = self.report_index.search(
+            self.search_sn.text().strip().upper(),
+            self.search_tester.text().strip().upper(), start, end)
+
+        self.search_table.setRowCount(len(runs))
+        for row, run in enumerate(runs):
+            ts = QDateTime.fromSecsSinceEpoch(int(run["time"]))
+            values = [ts.toString("yyyy-MM-dd hh:mm:ss"), run["sn"],
+                      run["tester_id"], run["result"], run["path"]]
+            for column, value in enumerate(values):
+                self.search_table.setItem(row, column,
+                                          QTableWidgetItem(value or ""))
+
     def set_hex_dir(self):
         """Opens file dialog for selecting the hex files directory."""
 
@@ -490,6 +1253,15 @@ class ThreadlinkUtility(QMainWindow):
         )
         self.report_path_lbl.setText(report_dir)
 
+    def set_capture_location(self):
+        """Opens file dialog for setting the raw serial capture location."""
+
+        capture_dir = QFileDialog.getExistingDirectory(
+            self,
+            "Select serial capture location."
+        )
+        self.capture_path_lbl.setText(capture_dir)
+
     def choose_atprogram_file(self):
         """Opens file dialog for selecting the atprogram executable."""
 
@@ -524,10 +1296,37 @@ class ThreadlinkUtility(QMainWindow):
                                 "E.g.: 000a5296")
             return
 
+        profile_boards = self.profile_boards.text().strip()
+        if not profile_boards.isdigit() or int(profile_boards) < 1:
+            QMessageBox.warning(self.settings_widget, "Warning!",
+                                "Boards to profile must be a positive "
+                                "number.")
+            return
+        self.settings.setValue("profile_boards", profile_boards)
+        self.settings.setValue("fail_fast", self.fail_fast.currentText())
+        self.settings.setValue("hex_record_bytes",
+                               self.hex_record_bytes.currentText())
+
         self.settings.setValue("hex_files_path", self.hex_path_lbl.text())
         self.settings.setValue("report_dir_path", self.report_path_lbl.text())
+        self.report_dest_signal.emit(self.report_path_lbl.text())
         self.settings.setValue("atprogram_file_path",
                                self.atprogram_path_lbl.text())
+        self.settings.setValue("capture_dir_path",
+                               self.capture_path_lbl.text())
+        if self.sm:
+            self.sm.set_capture_dir(self.capture_path_lbl.text())
+        self.settings.setValue("scanner_port",
+                               self.scanner_port.text().strip())
+        self.settings.setValue("dmm_port", self.dmm_port.text().strip())
+        self.start_peripherals()
+        self.settings.setValue("instrument_backend",
+                               self.instrument_backend.currentText())
+        self.settings.setValue("dmm_scpi_port",
+                               self.dmm_scpi_port.text().strip())
+        self.settings.setValue("psu_scpi_port",
+                               self.psu_scpi_port.text().strip())
+        self.set_bench()
 
         QMessageBox.information(self.settings_widget, "Information",
                                 "Settings applied!")
@@ -546,6 +1345,24 @@ class ThreadlinkUtility(QMainWindow):
                                             QMessageBox.No)
 
         if confirmation == QMessageBox.Yes:
+            self.fixture_timer.stop()
+            if self.profiler:
+                self.save_profile()
+            for procedure in self.procedures.values():
+                procedure.shutdown()
+            if not self.sm:
+                # Closed before the services started.
+                event.accept()
+                return
+            self.stop_peripherals()
+            QMetaObject.invokeMethod(self.bench_worker, "close",
+                                     Qt.BlockingQueuedConnection)
+            self.bench_thread.quit()
+            self.bench_thread.wait()
+            QMetaObject.invokeMethod(self.report_writer, "stop",
+                                     Qt.BlockingQueuedConnection)
+            self.report_thread.quit()
+            self.report_thread.wait()
             self.serial_thread.quit()
             self.serial_thread.wait()
             event.accept()